@@ -0,0 +1,48 @@
+"""Add keycloak_outbox table and make user.kc_id nullable
+
+Revision ID: 3f2a9c1d7e54
+Revises: b861b032e58a
+Create Date: 2026-10-17 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7e54'
+down_revision: Union[str, None] = 'b861b032e58a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('keycloak_outbox',
+    sa.Column('outbox_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('operation', sa.Enum('create_user', 'update_user', 'delete_user', 'assign_role', 'remove_role', name='keycloakoperation'), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('status', sa.Enum('pending', 'processing', 'done', 'failed', name='outboxstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('outbox_id')
+    )
+    op.create_index('ix_keycloak_outbox_status_next_attempt', 'keycloak_outbox', ['status', 'next_attempt_at'], unique=False)
+    op.create_index('ix_keycloak_outbox_user', 'keycloak_outbox', ['user_id', 'outbox_id'], unique=False)
+    # Users are inserted before their Keycloak account exists
+    op.alter_column('user', 'kc_id',
+               existing_type=sa.String(length=50),
+               nullable=True)
+
+
+def downgrade() -> None:
+    op.alter_column('user', 'kc_id',
+               existing_type=sa.String(length=50),
+               nullable=False)
+    op.drop_index('ix_keycloak_outbox_user', table_name='keycloak_outbox')
+    op.drop_index('ix_keycloak_outbox_status_next_attempt', table_name='keycloak_outbox')
+    op.drop_table('keycloak_outbox')
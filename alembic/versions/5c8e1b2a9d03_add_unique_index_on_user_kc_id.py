@@ -0,0 +1,29 @@
+"""Add unique index on user.kc_id
+
+Revision ID: 5c8e1b2a9d03
+Revises: 3f2a9c1d7e54
+Create Date: 2026-10-17 10:41:07.553920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8e1b2a9d03'
+down_revision: Union[str, None] = '3f2a9c1d7e54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rows whose Keycloak lookup failed when kc_id was added hold an empty string,
+    # which would collide under the unique index
+    op.execute(sa.text("UPDATE user SET kc_id = NULL WHERE kc_id = ''"))
+    op.create_index('ix_user_kc_id', 'user', ['kc_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_kc_id', table_name='user')
@@ -0,0 +1,42 @@
+"""Add active_slot_id to appointment_time_slots
+
+Revision ID: 8d41f6c2b7a9
+Revises: 5c8e1b2a9d03
+Create Date: 2026-10-17 11:26:43.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41f6c2b7a9'
+down_revision: Union[str, None] = '5c8e1b2a9d03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('appointment_time_slots', sa.Column('active_slot_id', sa.Integer(), nullable=True))
+    # Existing links are all active; if a slot was double booked, the oldest appointment keeps it
+    op.execute(sa.text(
+        """
+        UPDATE appointment_time_slots ats
+        JOIN (
+            SELECT slot_id, MIN(appointment_id) AS appointment_id
+            FROM appointment_time_slots
+            GROUP BY slot_id
+        ) first_booking
+            ON first_booking.slot_id = ats.slot_id
+            AND first_booking.appointment_id = ats.appointment_id
+        SET ats.active_slot_id = ats.slot_id
+        """
+    ))
+    op.create_unique_constraint('uq_active_slot', 'appointment_time_slots', ['active_slot_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_active_slot', 'appointment_time_slots', type_='unique')
+    op.drop_column('appointment_time_slots', 'active_slot_id')
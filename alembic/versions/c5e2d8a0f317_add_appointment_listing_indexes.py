@@ -0,0 +1,42 @@
+"""Add composite indexes for appointment listings
+
+Revision ID: c5e2d8a0f317
+Revises: a7c3e9f14b62
+Create Date: 2026-10-17 13:15:52.207391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2d8a0f317'
+down_revision: Union[str, None] = 'a7c3e9f14b62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Appointments created before appointment_date existed take the date of their first slot
+    op.execute(sa.text(
+        """
+        UPDATE appointment
+        SET appointment_date = (
+            SELECT MIN(schedule.date)
+            FROM appointment_time_slots
+            JOIN time_slots ON time_slots.slot_id = appointment_time_slots.slot_id
+            JOIN schedule ON schedule.schedule_id = time_slots.schedule_id
+            WHERE appointment_time_slots.appointment_id = appointment.appointment_id
+        )
+        WHERE appointment_date IS NULL
+        """
+    ))
+    op.create_index('ix_appointment_user_date', 'appointment', ['user_id', 'appointment_date'], unique=False)
+    op.create_index('ix_appointment_barber_date', 'appointment', ['barber_id', 'appointment_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_appointment_barber_date', table_name='appointment')
+    op.drop_index('ix_appointment_user_date', table_name='appointment')
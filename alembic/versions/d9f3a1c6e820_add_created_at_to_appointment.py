@@ -0,0 +1,27 @@
+"""Add created_at to appointment
+
+Revision ID: d9f3a1c6e820
+Revises: c5e2d8a0f317
+Create Date: 2026-10-17 19:02:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f3a1c6e820'
+down_revision: Union[str, None] = 'c5e2d8a0f317'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing appointments stay NULL, their booking time was never recorded
+    op.add_column('appointment', sa.Column('created_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('appointment', 'created_at')
@@ -0,0 +1,36 @@
+"""Add schedule_template table
+
+Revision ID: e4b7c2d91a58
+Revises: d9f3a1c6e820
+Create Date: 2026-10-17 19:48:10.552917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c2d91a58'
+down_revision: Union[str, None] = 'd9f3a1c6e820'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('schedule_template',
+    sa.Column('template_id', sa.Integer(), nullable=False),
+    sa.Column('barber_id', sa.Integer(), nullable=False),
+    sa.Column('weekday', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.Column('slot_minutes', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['barber_id'], ['barber.barber_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('template_id'),
+    sa.UniqueConstraint('barber_id', 'weekday', 'start_time', name='uq_template_window')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('schedule_template')
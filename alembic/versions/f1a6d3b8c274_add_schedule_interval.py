@@ -0,0 +1,70 @@
+"""Add schedule_interval table
+
+Revision ID: f1a6d3b8c274
+Revises: e4b7c2d91a58
+Create Date: 2026-10-17 21:12:37.408215
+
+"""
+from datetime import date, datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a6d3b8c274'
+down_revision: Union[str, None] = 'e4b7c2d91a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('schedule_interval',
+    sa.Column('interval_id', sa.Integer(), nullable=False),
+    sa.Column('schedule_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.Column('slot_minutes', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['schedule_id'], ['schedule.schedule_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('interval_id'),
+    sa.UniqueConstraint('schedule_id', 'start_time', name='uq_schedule_interval')
+    )
+
+
+def downgrade() -> None:
+    # Turn the slots of interval schedules back into time_slots rows before dropping them
+    bind = op.get_bind()
+    intervals = sa.table(
+        'schedule_interval',
+        sa.column('schedule_id'), sa.column('start_time'), sa.column('end_time'), sa.column('slot_minutes'),
+    )
+    time_slots = sa.table(
+        'time_slots',
+        sa.column('schedule_id'), sa.column('start_time'), sa.column('end_time'),
+        sa.column('is_available'), sa.column('is_booked'),
+    )
+    rows = bind.execute(sa.select(intervals)).all()
+    if rows:
+        existing = set(
+            bind.execute(
+                sa.select(time_slots.c.schedule_id, time_slots.c.start_time).where(
+                    time_slots.c.schedule_id.in_({row.schedule_id for row in rows})
+                )
+            ).tuples().all()
+        )
+        new_slots = []
+        for row in rows:
+            start = datetime.combine(date.min, row.start_time)
+            end = datetime.combine(date.min, row.end_time)
+            step = timedelta(minutes=row.slot_minutes)
+            while start + step <= end:
+                if (row.schedule_id, start.time()) not in existing:
+                    new_slots.append(dict(
+                        schedule_id=row.schedule_id, start_time=start.time(), end_time=(start + step).time(),
+                        is_available=True, is_booked=False,
+                    ))
+                start += step
+        if new_slots:
+            op.bulk_insert(time_slots, new_slots)
+    op.drop_table('schedule_interval')
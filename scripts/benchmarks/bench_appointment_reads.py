@@ -0,0 +1,145 @@
+'''
+Benchmark of appointment listings read through column projections against ORM loading.
+Seeds one client with many appointments, then reads pages of them both ways: hydrating
+Appointment objects with the APPOINTMENT_CARD loader profile and calling
+to_response_schema, and with AppointmentReadOperations as the listing endpoints do.
+Reports statements, time and peak Python allocations per page and checks that both
+produce the same responses.
+
+Run from the repository root:
+    PYTHONPATH=src python scripts/benchmarks/bench_appointment_reads.py [--appointments N] [--page-size N]
+'''
+import argparse
+import asyncio
+import statistics
+from datetime import date, time, timedelta
+
+from sqlalchemy.future import select
+
+from common import measure, temp_database
+from modules.user.loader_profiles import APPOINTMENT_CARD
+from modules.user.models import (
+    Appointment,
+    AppointmentService,
+    AppointmentStatus,
+    Appointment_TimeSlot,
+    Barber,
+    Schedule,
+    Service,
+    TimeSlot,
+    User,
+)
+from operations.appointment_read_operations import AppointmentReadOperations
+
+CLIENT_ID = 1
+
+
+async def seed(manager, appointments: int):
+    async with manager.session() as db:
+        db.add_all(
+            [
+                User(user_id=CLIENT_ID, firstName="Ada", lastName="Client", email="ada@example.com",
+                     password="x", phoneNumber="5550000001", is_admin=False),
+                User(user_id=2, firstName="Cy", lastName="Barber", email="cy@example.com",
+                     password="x", phoneNumber="5550000002", is_admin=False),
+                Barber(barber_id=1, user_id=2),
+            ]
+            + [
+                Service(service_id=service_id, name=f"Service {service_id}", duration=30, price=20.0,
+                        category="Hair", description="Bench service", popularity_score=1)
+                for service_id in (1, 2)
+            ]
+        )
+        for index in range(appointments):
+            day = date(2030, 1, 1) + timedelta(days=index)
+            schedule = Schedule(barber_id=1, date=day, is_working=True)
+            db.add(schedule)
+            await db.flush()
+            slots = [
+                TimeSlot(schedule_id=schedule.schedule_id, start_time=time(9, 30 * half), end_time=time(9 + half, 30 * (1 - half)),
+                         is_available=True, is_booked=True)
+                for half in (0, 1)
+            ]
+            appointment = Appointment(user_id=CLIENT_ID, barber_id=1, appointment_date=day, status=AppointmentStatus.confirmed)
+            db.add_all(slots + [appointment])
+            await db.flush()
+            db.add_all(
+                [
+                    Appointment_TimeSlot(appointment_id=appointment.appointment_id, slot_id=slot.slot_id, active_slot_id=slot.slot_id)
+                    for slot in slots
+                ]
+                + [AppointmentService(appointment_id=appointment.appointment_id, service_id=service_id) for service_id in (1, 2)]
+            )
+        await db.commit()
+
+
+def page_query(select_from, page_size: int):
+    return (
+        select_from.filter(Appointment.user_id == CLIENT_ID)
+        .order_by(Appointment.appointment_date, Appointment.appointment_id)
+        .limit(page_size)
+    )
+
+
+async def read_orm(manager, page_size: int) -> list:
+    async with manager.session() as db:
+        result = await db.execute(page_query(select(Appointment), page_size).options(*APPOINTMENT_CARD))
+        return [appointment.to_response_schema() for appointment in result.scalars().all()]
+
+
+async def read_projection(manager, page_size: int) -> list:
+    async with manager.session() as db:
+        read_ops = AppointmentReadOperations(db)
+        cards = await read_ops.fetch_cards(page_query(read_ops.select_cards(), page_size))
+        return [card.to_response_schema() for card in cards]
+
+
+# Slots and services come back in a stable order from the projection only
+def normalized(responses: list) -> list:
+    return [
+        response.model_copy(
+            update={
+                "time_slots": sorted(response.time_slots, key=lambda slot: slot.start_time),
+                "services": sorted(response.services, key=lambda service: service.service_id),
+            }
+        ).model_dump()
+        for response in responses
+    ]
+
+
+async def run(appointments: int, page_size: int, repeats: int):
+    manager = await temp_database()
+    await seed(manager, appointments)
+
+    orm_responses = await read_orm(manager, page_size)
+    projected_responses = await read_projection(manager, page_size)
+    assert normalized(orm_responses) == normalized(projected_responses), "responses differ"
+
+    for name, read in (("orm", read_orm), ("projection", read_projection)):
+        timings, peaks = [], []
+        for _ in range(repeats):
+            with measure(manager, trace_memory=False) as timed:
+                await read(manager, page_size)
+            timings.append(timed.seconds)
+        for _ in range(3):
+            with measure(manager) as traced:
+                await read(manager, page_size)
+            peaks.append(traced.peak_bytes)
+        print(
+            f"{name:>10}: {timed.statements} statements, median {statistics.median(timings) * 1000:.1f}ms, "
+            f"peak {min(peaks) / 1024:.0f} KiB per page of {page_size}"
+        )
+    await manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--appointments", type=int, default=500)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=30)
+    args = parser.parse_args()
+    asyncio.run(run(args.appointments, args.page_size, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
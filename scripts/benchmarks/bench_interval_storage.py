@@ -0,0 +1,196 @@
+'''
+Benchmark of schedules stored as working intervals against one TimeSlot row per slot.
+Generates a year of schedules from the same weekly template once with
+SCHEDULE_SLOT_STORAGE=rows and once with SCHEDULE_SLOT_STORAGE=intervals, then compares
+the rows stored, the database size and the time of uncached schedule reads, cold
+availability searches, bookings and the yearly utilisation report. Checks that both
+modes return the same slots, openings and utilisation.
+
+Run from the repository root:
+    PYTHONPATH=src python scripts/benchmarks/bench_interval_storage.py [--barbers N]
+'''
+import argparse
+import asyncio
+import json
+import os
+import statistics
+from datetime import date, time, timedelta
+
+from sqlalchemy import func, insert
+from sqlalchemy.future import select
+
+from common import measure, temp_database
+from modules.appointment_schema import AppointmentCreate, AppointmentStatus
+from modules.availability.availability_index import availability_index
+from modules.schedule_cache import schedule_cache
+from modules.user.models import Barber, ScheduleInterval, ScheduleTemplate, Service, TimeSlot, User
+from operations.appointment_operations import AppointmentOperations
+from operations.availability_operations import AvailabilityOperations
+from operations.report_operations import ReportOperations
+from operations.schedule_operations import ScheduleOperations
+from operations.schedule_template_operations import ScheduleTemplateOperations
+
+# Starts tomorrow, availability searches skip days that have passed
+YEAR_START = date.today() + timedelta(days=1)
+YEAR_END = YEAR_START + timedelta(days=364)
+SEARCH_DAYS = 14
+SERVICE_ID = 1
+CLIENT_USER_ID = 1
+# Schedules read and appointments booked per mode
+SAMPLES = 50
+
+
+async def seed(manager, barbers: int):
+    users = [dict(user_id=CLIENT_USER_ID, firstName="Client", lastName="1", email="client@example.com",
+                  password="x", phoneNumber="5550000000", is_admin=False)]
+    barber_rows, templates = [], []
+    for barber_id in range(1, barbers + 1):
+        user_id = barber_id + 1
+        users.append(dict(user_id=user_id, firstName="Barber", lastName=str(barber_id), email=f"b{barber_id}@example.com",
+                          password="x", phoneNumber=f"555{user_id:07d}", is_admin=False))
+        barber_rows.append(dict(barber_id=barber_id, user_id=user_id))
+        # Tuesday to Saturday, 09:00-19:00 in 30 minute slots
+        templates.extend(
+            dict(barber_id=barber_id, weekday=weekday, start_time=time(9), end_time=time(19), slot_minutes=30)
+            for weekday in range(1, 6)
+        )
+    async with manager.session() as db:
+        await db.execute(insert(User), users)
+        await db.execute(insert(Barber), barber_rows)
+        await db.execute(insert(Service), [dict(service_id=SERVICE_ID, name="Cut", duration=30, price=20.0,
+                                                category="Hair", description="Haircut", popularity_score=1)])
+        await db.execute(insert(ScheduleTemplate), templates)
+        await db.commit()
+
+
+async def generate(manager, storage: str):
+    os.environ["SCHEDULE_SLOT_STORAGE"] = storage
+    async with manager.session() as db:
+        return await ScheduleTemplateOperations(db).generate_schedules(YEAR_START, YEAR_END)
+
+
+async def stored_rows(manager) -> tuple[int, int]:
+    async with manager.session() as db:
+        slots = await db.execute(select(func.count(TimeSlot.slot_id)))
+        intervals = await db.execute(select(func.count(ScheduleInterval.interval_id)))
+        return slots.scalar_one(), intervals.scalar_one()
+
+
+async def read_schedules(manager, schedule_ids: list[int]) -> tuple[list[float], list[bytes]]:
+    times, bodies = [], []
+    for schedule_id in schedule_ids:
+        schedule_cache.clear()
+        with measure(manager, trace_memory=False) as timed:
+            async with manager.session() as db:
+                body = await ScheduleOperations(db).get_schedule_json(schedule_id)
+        times.append(timed.seconds)
+        bodies.append(body)
+    return times, bodies
+
+
+async def search(manager, from_date: date):
+    availability_index.clear()
+    with measure(manager, trace_memory=False) as timed:
+        async with manager.session() as db:
+            openings = await AvailabilityOperations(db).find_openings(
+                SERVICE_ID, from_date, from_date + timedelta(days=SEARCH_DAYS - 1), limit=SAMPLES
+            )
+    return timed.seconds, openings
+
+
+async def book(manager, openings) -> list[float]:
+    times = []
+    for opening in openings:
+        appointment = AppointmentCreate(
+            user_id=CLIENT_USER_ID,
+            barber_id=opening.barber_id,
+            status=AppointmentStatus.confirmed,
+            time_slot=opening.time_slot,
+            service_id=[SERVICE_ID],
+        )
+        with measure(manager, trace_memory=False) as timed:
+            async with manager.session() as db:
+                await AppointmentOperations(db).create_appointment(appointment)
+        times.append(timed.seconds)
+    return times
+
+
+async def utilization(manager):
+    with measure(manager, trace_memory=False) as timed:
+        async with manager.session() as db:
+            rows = await ReportOperations(db).get_utilization(YEAR_START, YEAR_END)
+    return timed.seconds, {row.barber_id: (row.open_minutes, row.booked_minutes) for row in rows}
+
+
+# Slot times of a schedule response, derived slot ids differ from row ids
+def slot_times(body: bytes) -> list:
+    schedule = json.loads(body)
+    return [(slot["start_time"], slot["end_time"], slot["is_available"], slot["is_booked"]) for slot in schedule["time_slots"]]
+
+
+async def run_mode(storage: str, barbers: int) -> dict:
+    manager = await temp_database()
+    await seed(manager, barbers)
+    with measure(manager, trace_memory=False) as generation:
+        generated = await generate(manager, storage)
+    slots, intervals = await stored_rows(manager)
+
+    step = max(1, generated.schedules_created // SAMPLES)
+    read_times, bodies = await read_schedules(manager, list(range(1, generated.schedules_created + 1, step)))
+    search_seconds, openings = await search(manager, YEAR_START)
+    # One opening per barber and day, so the bookings don't compete for slots
+    chosen = list({(opening.barber_id, opening.date): opening for opening in openings}.values())
+    booking_times = await book(manager, chosen)
+    report_seconds, report = await utilization(manager)
+
+    result = dict(
+        storage=storage,
+        schedules=generated.schedules_created,
+        slots=slots,
+        intervals=intervals,
+        size=os.path.getsize(manager.path),
+        generation=generation.seconds,
+        read=statistics.median(read_times),
+        search=search_seconds,
+        booking=statistics.median(booking_times) if booking_times else 0.0,
+        report=report_seconds,
+        bodies=[slot_times(body) for body in bodies],
+        openings=[(opening.barber_id, opening.date, opening.start_time) for opening in openings],
+        utilization=report,
+    )
+    await manager.close()
+    return result
+
+
+async def run(barbers: int):
+    modes = [await run_mode(storage, barbers) for storage in ("rows", "intervals")]
+    print(f"{barbers} barbers, {modes[0]['schedules']:,} schedules from {YEAR_START} to {YEAR_END}")
+    print(f"{'':>24} {'rows':>12} {'intervals':>12}")
+    for label, key in (("slot rows", "slots"), ("interval rows", "intervals")):
+        print(f"{label:>24} {modes[0][key]:>12,} {modes[1][key]:>12,}")
+    print(f"{'database size':>24} {modes[0]['size'] / 2**20:>10.1f}MB {modes[1]['size'] / 2**20:>10.1f}MB")
+    for label, key in (
+        ("generation", "generation"),
+        ("uncached schedule read", "read"),
+        (f"cold search ({SEARCH_DAYS} days)", "search"),
+        ("booking", "booking"),
+        ("yearly utilisation", "report"),
+    ):
+        print(f"{label:>24} {modes[0][key] * 1000:>10.1f}ms {modes[1][key] * 1000:>10.1f}ms")
+
+    rows, intervals = modes
+    assert rows["bodies"] == intervals["bodies"], "schedule responses differ"
+    assert rows["openings"] == intervals["openings"], "availability openings differ"
+    assert rows["utilization"] == intervals["utilization"], "utilisation differs"
+    print("both storage modes return the same slots, openings and utilisation")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--barbers", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.barbers))
+
+
+if __name__ == "__main__":
+    main()
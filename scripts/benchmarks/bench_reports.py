@@ -0,0 +1,145 @@
+'''
+Benchmark of the utilisation reports over a synthetic year.
+Seeds barbers with a schedule of 30 minute slots on five days a week for a year, books
+about half of the slots, then times each report endpoint's operation and the ORM
+row-by-row computation of utilisation and idle gaps it replaced, checking that both agree.
+
+Run from the repository root:
+    PYTHONPATH=src python scripts/benchmarks/bench_reports.py [--barbers N]
+'''
+import argparse
+import asyncio
+import random
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.future import select
+
+from common import measure, temp_database
+from modules.availability.availability_index import to_minutes
+from modules.user.models import (
+    Appointment,
+    AppointmentStatus,
+    Appointment_TimeSlot,
+    Barber,
+    Schedule,
+    TimeSlot,
+    User,
+)
+from operations.report_operations import ReportOperations
+
+YEAR_START = date(2030, 1, 1)
+YEAR_END = date(2030, 12, 31)
+SLOTS_PER_DAY = 20
+
+
+async def seed(manager, barbers: int) -> dict:
+    generator = random.Random(7)
+    users, barber_rows, schedules, slots, appointments, links = [], [], [], [], [], []
+    for barber_id in range(1, barbers + 1):
+        users.append(dict(user_id=barber_id, firstName="Barber", lastName=str(barber_id), email=f"b{barber_id}@example.com",
+                          password="x", phoneNumber=f"555{barber_id:07d}", is_admin=False))
+        barber_rows.append(dict(barber_id=barber_id, user_id=barber_id))
+        day = YEAR_START
+        while day <= YEAR_END:
+            # Closed on Sundays and Mondays
+            if day.weekday() not in (6, 0):
+                schedule_id = len(schedules) + 1
+                schedules.append(dict(schedule_id=schedule_id, barber_id=barber_id, date=day, is_working=True))
+                for index in range(SLOTS_PER_DAY):
+                    start = 9 * 60 + 30 * index
+                    booked = generator.random() < 0.5
+                    slot_id = len(slots) + 1
+                    slots.append(dict(
+                        slot_id=slot_id, schedule_id=schedule_id,
+                        start_time=time(start // 60, start % 60), end_time=time((start + 30) // 60, (start + 30) % 60),
+                        is_available=booked or generator.random() > 0.05, is_booked=booked,
+                    ))
+                    if booked:
+                        appointment_id = len(appointments) + 1
+                        appointments.append(dict(
+                            appointment_id=appointment_id, user_id=barber_id, barber_id=barber_id, appointment_date=day,
+                            status=AppointmentStatus.confirmed,
+                            created_at=datetime.combine(day, time(8)) - timedelta(hours=generator.randint(1, 720)),
+                        ))
+                        links.append(dict(appointment_id=appointment_id, slot_id=slot_id, active_slot_id=slot_id))
+            day += timedelta(days=1)
+
+    async with manager.session() as db:
+        for model, rows in ((User, users), (Barber, barber_rows), (Schedule, schedules), (TimeSlot, slots),
+                            (Appointment, appointments), (Appointment_TimeSlot, links)):
+            for chunk_start in range(0, len(rows), 5000):
+                await db.execute(insert(model), rows[chunk_start:chunk_start + 5000])
+        await db.commit()
+    return {"slots": len(slots), "appointments": len(appointments)}
+
+
+# Utilisation and idle gaps computed from ORM objects one row at a time
+async def orm_reports(manager) -> tuple[dict, dict]:
+    async with manager.session() as db:
+        result = await db.execute(
+            select(TimeSlot, Schedule)
+            .join(Schedule, Schedule.schedule_id == TimeSlot.schedule_id)
+            .filter(Schedule.date >= YEAR_START, Schedule.date <= YEAR_END, Schedule.is_working.is_(True))
+        )
+        utilization, booked_by_day = {}, {}
+        for slot, schedule in result.all():
+            minutes = to_minutes(slot.end_time) - to_minutes(slot.start_time)
+            totals = utilization.setdefault(schedule.barber_id, [0, 0])
+            if slot.is_available or slot.is_booked:
+                totals[0] += minutes
+            if slot.is_booked:
+                totals[1] += minutes
+                booked_by_day.setdefault((schedule.barber_id, schedule.date), []).append(
+                    (to_minutes(slot.start_time), to_minutes(slot.end_time))
+                )
+        gaps = {}
+        for (barber_id, _), booked in booked_by_day.items():
+            booked.sort()
+            for (_, previous_end), (start, _) in zip(booked, booked[1:]):
+                if start > previous_end:
+                    gaps.setdefault(barber_id, []).append(start - previous_end)
+        return utilization, gaps
+
+
+async def run(barbers: int):
+    manager = await temp_database()
+    sizes = await seed(manager, barbers)
+    print(f"seeded {barbers} barbers, {sizes['slots']:,} slots, {sizes['appointments']:,} appointments")
+
+    async def report(name: str):
+        async with manager.session() as db:
+            return await getattr(ReportOperations(db), name)(YEAR_START, YEAR_END)
+
+    for name in ("get_utilization", "get_idle_gaps", "get_heatmap", "get_lead_time"):
+        with measure(manager, trace_memory=False) as timed:
+            await report(name)
+        with measure(manager) as traced:
+            await report(name)
+        print(f"{name:>16}: {timed.seconds * 1000:6.0f}ms, peak {traced.peak_bytes / 2**20:5.1f} MiB")
+
+    with measure(manager, trace_memory=False) as timed:
+        await orm_reports(manager)
+    with measure(manager) as traced:
+        utilization, gaps = await orm_reports(manager)
+    print(f"{'orm row by row':>16}: {timed.seconds * 1000:6.0f}ms, peak {traced.peak_bytes / 2**20:5.1f} MiB (utilization and idle gaps)")
+
+    vectorised_utilization = await report("get_utilization")
+    vectorised_gaps = await report("get_idle_gaps")
+    assert {row.barber_id: [row.open_minutes, row.booked_minutes] for row in vectorised_utilization} == utilization
+    assert {row.barber_id: (row.gaps, row.idle_minutes, row.longest_gap_minutes) for row in vectorised_gaps} == {
+        barber_id: (len(barber_gaps), sum(barber_gaps), max(barber_gaps)) for barber_id, barber_gaps in gaps.items()
+    }
+    print("vectorised and row-by-row results match")
+    await manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--barbers", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.barbers))
+
+
+if __name__ == "__main__":
+    main()
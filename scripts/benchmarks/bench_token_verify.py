@@ -0,0 +1,72 @@
+'''
+Benchmark of local access token verification against a cached JWKS.
+Signs tokens with a throwaway RSA key, loads the public half into a JWKSTokenVerifier the
+way a JWKS refresh does, and times `verify` one token at a time on a single core.
+
+Run from the repository root:
+    PYTHONPATH=src python scripts/benchmarks/bench_token_verify.py [--tokens N]
+'''
+import argparse
+import json
+import statistics
+import time
+import uuid
+
+from jwcrypto import jwk, jwt
+
+from auth.token_verifier import JWKSTokenVerifier
+
+ISSUER = "http://keycloak.local/realms/bench"
+AUDIENCE = "bench-api"
+KID = "bench-key"
+
+
+def sign_tokens(key: jwk.JWK, count: int) -> list[str]:
+    now = int(time.time())
+    tokens = []
+    for _ in range(count):
+        token = jwt.JWT(
+            header={"alg": "RS256", "kid": KID, "typ": "JWT"},
+            claims={
+                "iss": ISSUER,
+                "aud": AUDIENCE,
+                "sub": str(uuid.uuid4()),
+                "iat": now,
+                "exp": now + 300,
+                "realm_access": {"roles": ["client"]},
+            },
+        )
+        token.make_signed_token(key)
+        tokens.append(token.serialize())
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=5000)
+    args = parser.parse_args()
+
+    key = jwk.JWK.generate(kty="RSA", size=2048, kid=KID, use="sig", alg="RS256")
+    verifier = JWKSTokenVerifier("http://keycloak.local", "bench", [AUDIENCE])
+    # What refresh() stores after fetching the realm's certs
+    verifier._keys = {KID: jwk.JWK(**json.loads(key.export_public()))}
+
+    tokens = sign_tokens(key, args.tokens)
+    latencies = []
+    started = time.perf_counter()
+    for token in tokens:
+        token_started = time.perf_counter()
+        verifier.verify(token)
+        latencies.append(time.perf_counter() - token_started)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"verified {len(tokens)} RS256 tokens in {elapsed:.2f}s: {len(tokens) / elapsed:,.0f} tokens/s")
+    print(
+        f"per token: median {statistics.median(latencies) * 1e6:.0f}us, "
+        f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e6:.0f}us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from core.db import AsyncDatabaseSessionManager
+from modules.user.models import Base
+
+'''
+Helpers shared by the benchmarks: a throwaway SQLite database and timing with statement
+counts and peak allocations.
+'''
+
+
+async def temp_database() -> AsyncDatabaseSessionManager:
+    '''
+    A session manager on a fresh SQLite file with every table created.
+    '''
+    path = os.path.join(tempfile.mkdtemp(prefix="barbershop-bench-"), "bench.db")
+    manager = AsyncDatabaseSessionManager(f"sqlite+aiosqlite:///{path}")
+    manager.path = path
+    async with manager._engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    return manager
+
+
+class Measurement:
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.peak_bytes = 0
+
+
+@contextmanager
+def measure(manager: AsyncDatabaseSessionManager, trace_memory: bool = True):
+    '''
+    Count the statements run, the wall time and, when traced, the peak Python allocations.
+    '''
+    measurement = Measurement()
+
+    def count(*args):
+        measurement.statements += 1
+
+    event.listen(manager._engine.sync_engine, "before_cursor_execute", count)
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        yield measurement
+    finally:
+        measurement.seconds = time.perf_counter() - started
+        if trace_memory:
+            measurement.peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        event.remove(manager._engine.sync_engine, "before_cursor_execute", count)
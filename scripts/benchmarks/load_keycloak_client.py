@@ -0,0 +1,92 @@
+'''
+Load test of the pooled Keycloak client against a stub Keycloak with a fixed latency.
+Fires concurrent admin calls through AsyncKeycloakClient while a ticker measures how late
+the event loop wakes up, then does the same with a blocking call per request the way the
+synchronous python-keycloak admin client behaved.
+
+Run from the repository root:
+    PYTHONPATH=src python scripts/benchmarks/load_keycloak_client.py [--calls N] [--latency S]
+'''
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from auth.keycloak_client import AsyncKeycloakClient
+
+
+# Stub of the token and user lookup endpoints, answering after `latency` seconds
+def stub_transport(latency: float, counts: dict) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        if request.url.path.endswith("/token"):
+            counts["token"] += 1
+            return httpx.Response(200, json={"access_token": "admin", "expires_in": 300})
+        counts["admin"] += 1
+        return httpx.Response(200, json=[{"id": "kc-id"}])
+
+    return httpx.MockTransport(handler)
+
+
+# Run `work` while sampling how late a 10ms ticker fires, returning (seconds, worst lag)
+async def measure(work) -> tuple[float, float]:
+    worst_lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst_lag
+        while not done.is_set():
+            expected = time.perf_counter() + 0.01
+            await asyncio.sleep(0.01)
+            worst_lag = max(worst_lag, time.perf_counter() - expected)
+
+    ticker_task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker_task
+    return elapsed, worst_lag
+
+
+async def run(calls: int, latency: float, max_concurrency: int):
+    counts = {"token": 0, "admin": 0}
+    client = AsyncKeycloakClient(
+        "http://keycloak.local", "bench", "api", "secret", "admin", "admin",
+        max_concurrency=max_concurrency,
+    )
+    await client.aclose()
+    client._http = httpx.AsyncClient(base_url="http://keycloak.local", transport=stub_transport(latency, counts))
+
+    async def pooled():
+        await asyncio.gather(*[client.get_user_id(f"user{index}") for index in range(calls)])
+
+    elapsed, lag = await measure(pooled)
+    await client.aclose()
+    print(
+        f"pooled:   {calls} calls in {elapsed:.2f}s, {counts['token']} admin token fetch(es), "
+        f"worst event loop lag {lag * 1000:.0f}ms"
+    )
+
+    async def blocking():
+        for _ in range(calls):
+            # One synchronous round trip per call, as the blocking admin client made
+            time.sleep(latency)
+            await asyncio.sleep(0)
+
+    elapsed, lag = await measure(blocking)
+    print(f"blocking: {calls} calls in {elapsed:.2f}s, worst event loop lag {lag * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--max-concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.latency, args.max_concurrency))
+
+
+if __name__ == "__main__":
+    main()
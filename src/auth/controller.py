@@ -12,7 +12,7 @@ class AuthController:
     Controller for handling authentication logic.
     """
 
-    def login(username: str = Form(...), password: str = Form(...)) -> TokenResponse:
+    async def login(username: str = Form(...), password: str = Form(...)) -> TokenResponse:
         """
         Authenticate user and return access token.
 
@@ -27,7 +27,7 @@ class AuthController:
             TokenResponse: Contains the access token upon successful authentication.
         """
         # Authenticate the user using the AuthService
-        access_token = AuthService.authenticate_user(username, password)
+        access_token = await AuthService.authenticate_user(username, password)
 
         if not access_token:
             raise HTTPException(
@@ -37,7 +37,7 @@ class AuthController:
 
         return TokenResponse(access_token=access_token)
 
-    def protected_endpoint(
+    async def protected_endpoint(
         credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
         required_role: str = None  # Optional parameter to enforce role-based access
     ) -> UserInfo:
@@ -57,7 +57,7 @@ class AuthController:
         token = credentials.credentials
 
         # Verify the token and get user information
-        user_info = AuthService.verify_token(token)
+        user_info = await AuthService.verify_token(token)
 
         if not user_info:
             raise HTTPException(
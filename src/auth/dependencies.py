@@ -0,0 +1,108 @@
+from typing import Annotated, Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from auth.controller import AuthController, bearer_scheme
+from auth.identity_cache import identity_cache
+from auth.models import UserInfo
+from core.dependencies import DBSessionDep
+from modules.user.models import Barber, User
+
+
+class Principal:
+    """
+    The authenticated caller of the current request.
+
+    The token is verified once when the principal is built. The caller's database
+    identity is only looked up the first time it is asked for, from the shared
+    identity cache when possible, then kept for the rest of the request.
+    """
+
+    def __init__(self, user_info: UserInfo, db: AsyncSession):
+        self.user_info = user_info
+        self.roles = frozenset(user_info.roles)
+        self._db = db
+        self._identity: Optional[tuple[int, Optional[int], bool]] = None
+        self._user: Optional[User] = None
+
+    @property
+    def kc_id(self) -> str:
+        return self.user_info.id
+
+    def has_role(self, role: str) -> bool:
+        return role in self.roles
+
+    async def _get_identity(self) -> tuple[int, Optional[int], bool]:
+        if self._identity is None:
+            self._identity = identity_cache.get(self.kc_id)
+        if self._identity is None:
+            result = await self._db.execute(
+                select(User.user_id, Barber.barber_id, User.is_admin)
+                .outerjoin(Barber, Barber.user_id == User.user_id)
+                .filter(User.kc_id == self.kc_id)
+            )
+            row = result.first()
+            if not row:
+                raise HTTPException(status_code=404, detail="User not found with ID provided")
+            self._identity = (row.user_id, row.barber_id, row.is_admin)
+            identity_cache.set(self.kc_id, self._identity)
+        return self._identity
+
+    async def get_user_id(self) -> int:
+        user_id, _, _ = await self._get_identity()
+        return user_id
+
+    async def get_barber_id(self) -> Optional[int]:
+        """
+        The caller's barber ID, or None if the caller is not a barber.
+        """
+        _, barber_id, _ = await self._get_identity()
+        return barber_id
+
+    async def get_user(self) -> User:
+        """
+        The caller's full User row.
+        """
+        if self._user is None:
+            result = await self._db.execute(select(User).filter(User.kc_id == self.kc_id))
+            self._user = result.scalars().first()
+            if not self._user:
+                raise HTTPException(status_code=404, detail="User not found with ID provided")
+        return self._user
+
+
+async def get_principal(
+    request: Request,
+    db_session: DBSessionDep,
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+) -> Principal:
+    """
+    Resolve the caller once per request, however many dependencies ask for it.
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is None:
+        user_info = await AuthController.protected_endpoint(credentials)
+        principal = Principal(user_info, db_session)
+        request.state.principal = principal
+    return principal
+
+
+PrincipalDep = Annotated[Principal, Depends(get_principal)]
+
+
+def require_role(role: str):
+    """
+    Dependency factory that only lets callers holding `role` through.
+    """
+    async def check_role(principal: PrincipalDep) -> Principal:
+        if not principal.has_role(role):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"***Access denied. Requires '{role}'.",
+            )
+        return principal
+
+    return check_role
@@ -0,0 +1,16 @@
+from core.cache import LRUCache
+from core.config import settings
+
+# Maps a Keycloak user ID (token `sub`) to the caller's (user_id, barber_id, is_admin).
+# Writes in this process invalidate entries directly; the TTL bounds how long a change
+# made by another worker process can go unnoticed.
+identity_cache = LRUCache(
+    max_size=settings.get_config()["identity_cache_size"],
+    default_ttl=settings.get_config()["identity_cache_ttl"],
+)
+
+
+def invalidate_identity(*kc_ids: str):
+    for kc_id in kc_ids:
+        if kc_id:
+            identity_cache.pop(kc_id)
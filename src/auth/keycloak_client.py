@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+import httpx
+
+logger = logging.getLogger("keycloak_client")
+logger.setLevel(logging.ERROR)
+
+
+class KeycloakClientError(Exception):
+    """
+    Raised when a Keycloak call fails, times out or returns an error status.
+    """
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+class AsyncKeycloakClient:
+    """
+    Non-blocking client for the Keycloak token and admin REST endpoints.
+
+    All calls share one keep-alive connection pool, are bounded by a per-call timeout
+    and go through a semaphore so a slow Keycloak cannot pile up unbounded requests.
+    The admin access token is cached and renewed shortly before it expires.
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        realm: str,
+        client_id: str,
+        client_secret: str,
+        admin_username: str,
+        admin_password: str,
+        timeout: float = 5.0,
+        max_connections: int = 20,
+        max_concurrency: int = 10,
+    ):
+        self.realm = realm
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.admin_username = admin_username
+        self.admin_password = admin_password
+        self.timeout = timeout
+        self._http = httpx.AsyncClient(
+            base_url=server_url.rstrip("/"),
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._admin_token: Optional[str] = None
+        self._admin_token_expires_at = 0.0
+        self._admin_token_lock = asyncio.Lock()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def _send(self, method: str, url: str, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        try:
+            async with self._semaphore:
+                return await self._http.request(
+                    method, url, timeout=timeout or self.timeout, **kwargs
+                )
+        except httpx.TimeoutException:
+            raise KeycloakClientError(504, f"Keycloak timed out on {method} {url}")
+        except httpx.HTTPError as e:
+            raise KeycloakClientError(502, f"Keycloak request failed: {e}")
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response):
+        if response.is_error:
+            raise KeycloakClientError(response.status_code, response.text)
+
+    # Exchange username and password for tokens using the API client
+    async def token(self, username: str, password: str, timeout: Optional[float] = None) -> dict:
+        response = await self._send(
+            "POST",
+            f"/realms/{self.realm}/protocol/openid-connect/token",
+            timeout=timeout,
+            data={
+                "grant_type": "password",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "username": username,
+                "password": password,
+            },
+        )
+        self._raise_for_status(response)
+        return response.json()
+
+    async def _get_admin_token(self, force: bool = False) -> str:
+        async with self._admin_token_lock:
+            # Renew a little early so in-flight calls don't race the expiry
+            if force or self._admin_token is None or time.monotonic() >= self._admin_token_expires_at - 30:
+                token = await self.token(self.admin_username, self.admin_password)
+                self._admin_token = token["access_token"]
+                self._admin_token_expires_at = time.monotonic() + token.get("expires_in", 60)
+            return self._admin_token
+
+    async def _admin_request(self, method: str, path: str, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        url = f"/admin/realms/{self.realm}{path}"
+        token = await self._get_admin_token()
+        response = await self._send(
+            method, url, timeout=timeout, headers={"Authorization": f"Bearer {token}"}, **kwargs
+        )
+        if response.status_code == 401:
+            # The admin session may have been revoked server side; retry once with a new token
+            token = await self._get_admin_token(force=True)
+            response = await self._send(
+                method, url, timeout=timeout, headers={"Authorization": f"Bearer {token}"}, **kwargs
+            )
+        self._raise_for_status(response)
+        return response
+
+    async def create_user(self, payload: dict, timeout: Optional[float] = None) -> str:
+        response = await self._admin_request("POST", "/users", timeout=timeout, json=payload)
+        # Keycloak returns the new user's location rather than a body
+        return response.headers["Location"].rstrip("/").rsplit("/", 1)[-1]
+
+    async def get_user_id(self, username: str, timeout: Optional[float] = None) -> Optional[str]:
+        response = await self._admin_request(
+            "GET", "/users", timeout=timeout, params={"username": username, "exact": "true"}
+        )
+        users = response.json()
+        return users[0]["id"] if users else None
+
+    async def update_user(self, user_id: str, payload: dict, timeout: Optional[float] = None):
+        await self._admin_request("PUT", f"/users/{user_id}", timeout=timeout, json=payload)
+
+    async def delete_user(self, user_id: str, timeout: Optional[float] = None):
+        await self._admin_request("DELETE", f"/users/{user_id}", timeout=timeout)
+
+    async def set_user_password(self, user_id: str, password: str, temporary: bool = False, timeout: Optional[float] = None):
+        await self._admin_request(
+            "PUT",
+            f"/users/{user_id}/reset-password",
+            timeout=timeout,
+            json={"type": "password", "value": password, "temporary": temporary},
+        )
+
+    async def get_realm_roles(self, timeout: Optional[float] = None) -> list[dict[str, Any]]:
+        response = await self._admin_request("GET", "/roles", timeout=timeout)
+        return response.json()
+
+    async def assign_realm_roles(self, user_id: str, roles: list[dict], timeout: Optional[float] = None):
+        await self._admin_request(
+            "POST", f"/users/{user_id}/role-mappings/realm", timeout=timeout, json=roles
+        )
+
+    async def delete_realm_roles_of_user(self, user_id: str, roles: list[dict], timeout: Optional[float] = None):
+        await self._admin_request(
+            "DELETE", f"/users/{user_id}/role-mappings/realm", timeout=timeout, json=roles
+        )
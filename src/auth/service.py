@@ -1,10 +1,14 @@
+import asyncio
+import hashlib
 import time
 
 from fastapi import HTTPException, status, Security
-from keycloak.exceptions import KeycloakAuthenticationError
 from core.config import settings
 from auth.models import UserInfo
-from keycloak import KeycloakOpenID, KeycloakOpenIDConnection, KeycloakAdmin
+from auth.keycloak_client import AsyncKeycloakClient, KeycloakClientError
+from auth.token_verifier import JWKSTokenVerifier, UnknownSigningKeyError
+from core.cache import LRUCache
+from keycloak import KeycloakOpenID
 from modules.user.user_schema import UserCreate, UserUpdate
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -21,39 +25,80 @@ class AuthService:
         client_secret_key=settings.get_config()["keycloak_api_secret"],
     )
 
-    # Keycloak Admin (For User Management)
-    keycloak_admin_connection = KeycloakOpenIDConnection(
+    # Non-blocking Keycloak client (For login and User Management), sharing one connection pool
+    keycloak_client = AsyncKeycloakClient(
         server_url=settings.get_config()["keycloak_server_url"],
-        username=settings.get_config()["keycloak_admin_username"],
-        password=settings.get_config()["keycloak_admin_password"],
-        realm_name=settings.get_config()["keycloak_realm"],
+        realm=settings.get_config()["keycloak_realm"],
         client_id=settings.get_config()["keycloak_api_client_id"],
-        client_secret_key=settings.get_config()["keycloak_api_secret"],
-        verify=True,
+        client_secret=settings.get_config()["keycloak_api_secret"],
+        admin_username=settings.get_config()["keycloak_admin_username"],
+        admin_password=settings.get_config()["keycloak_admin_password"],
+        timeout=settings.get_config()["keycloak_timeout"],
+        max_connections=settings.get_config()["keycloak_max_connections"],
+        max_concurrency=settings.get_config()["keycloak_max_concurrency"],
+    )
+
+    # Local verifier for access tokens, backed by a cached copy of the realm's JWKS
+    token_verifier = JWKSTokenVerifier(
+        server_url=settings.get_config()["keycloak_server_url"],
+        realm=settings.get_config()["keycloak_realm"],
+        audiences=settings.get_config()["keycloak_token_audiences"],
+        issuer=settings.get_config()["keycloak_issuer"],
+        ttl=settings.get_config()["keycloak_jwks_ttl"],
     )
-    keycloak_admin = KeycloakAdmin(connection=keycloak_admin_connection)
+
+    # Verified tokens, keyed by a digest of the raw token and evicted at the token's `exp`
+    token_cache = LRUCache(max_size=settings.get_config()["token_cache_size"])
+
+    # Realm role representations by name, warmed at startup and reloaded after the TTL
+    role_cache = LRUCache(max_size=256, default_ttl=settings.get_config()["role_cache_ttl"])
+    role_cache_lock = asyncio.Lock()
 
     # Checks username and password against Keycloak DB and return JWT
-    def authenticate_user(username: str, password: str) -> str:
+    async def authenticate_user(username: str, password: str) -> str:
         """
         Authenticate the user using Keycloak and return an access token.
         """
         try:
-            token = AuthService.keycloak_openid.token(username, password)
+            token = await AuthService.keycloak_client.token(username, password)
             return token["access_token"]
-        except KeycloakAuthenticationError as e:
+        except KeycloakClientError as e:
+            # Keycloak answers a bad username/password with 401 (invalid_grant)
+            if e.status_code in (status.HTTP_400_BAD_REQUEST, status.HTTP_401_UNAUTHORIZED):
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid username or password",
+                )
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid username or password",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service unavailable",
             )
 
-    # Verifies token against Keycloak and UserInfo model and returns user info
-    def verify_token(token: str) -> UserInfo:
+    def token_digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    # Verifies token against the cached Keycloak signing keys and returns user info
+    async def verify_token(token: str) -> UserInfo:
+        digest = AuthService.token_digest(token)
+        cached_user = AuthService.token_cache.get(digest)
+        if cached_user is not None:
+            return cached_user
+
         try:
-            token_info = AuthService.keycloak_openid.decode_token(
-                token,
-                validate=True,
-            )
+            if AuthService.token_verifier.is_ready():
+                try:
+                    token_info = AuthService.token_verifier.verify(token)
+                except UnknownSigningKeyError:
+                    # The realm may have rotated its keys, fetch them once and try again
+                    if not await AuthService.token_verifier.refresh_unknown_key():
+                        raise
+                    token_info = AuthService.token_verifier.verify(token)
+            else:
+                # No keys loaded yet (e.g. Keycloak was down at startup), fall back to Keycloak
+                token_info = AuthService.keycloak_openid.decode_token(
+                    token,
+                    validate=True,
+                )
             # Check if the token is expired
             if token_info["exp"] < int(time.time()):
                 raise HTTPException(
@@ -75,6 +120,7 @@ class AuthService:
                 roles=roles,
             )
 
+            AuthService.token_cache.set(digest, this_user, expires_at=token_info["exp"])
             return this_user
         except Exception:
             raise HTTPException(
@@ -82,8 +128,14 @@ class AuthService:
                 detail="Could not validate credentials",
             )
 
+    def revoke_token(token: str) -> bool:
+        """
+        Drop a token from the verified token cache so it is re-validated on next use.
+        """
+        return AuthService.token_cache.pop(AuthService.token_digest(token))
+
     # Register a new user in Keycloak
-    def register_kc_user(user: UserCreate):
+    async def register_kc_user(user: UserCreate):
         """
         Register a new user in Keycloak.
         """
@@ -101,7 +153,7 @@ class AuthService:
         }
 
         try:
-            kc_user_id = AuthService.keycloak_admin.create_user(user_representation)
+            kc_user_id = await AuthService.keycloak_client.create_user(user_representation)
             return kc_user_id
         except Exception as e:
             raise HTTPException(
@@ -110,7 +162,7 @@ class AuthService:
 
             
 
-    def update_kc_user(user: UserUpdate):
+    async def update_kc_user(user: UserUpdate):
 
         user_representation = {
             "username": user.email,
@@ -120,8 +172,9 @@ class AuthService:
         }
 
         try:
-            user_id = AuthService.keycloak_admin.get_user_id(username=user.email)
-            AuthService.keycloak_admin.update_user(
+            # Prefer the stored Keycloak ID, the email may be the value being changed
+            user_id = getattr(user, "kc_id", None) or await AuthService.keycloak_client.get_user_id(username=user.email)
+            await AuthService.keycloak_client.update_user(
                 user_id=user_id, payload=user_representation
             )
             return {"message": "User updated successfully"}
@@ -130,7 +183,7 @@ class AuthService:
                 status_code=500, detail=f"Error updating user: {str(e)}"
             )
         
-    def update_kc_user_password(kc_id: str, new_password: str):
+    async def update_kc_user_password(kc_id: str, new_password: str):
         """
         Update the password of a user in Keycloak.
         Args:
@@ -138,7 +191,7 @@ class AuthService:
             new_password (str): The new password to set for the user.
         """
         try:
-            AuthService.keycloak_admin.set_user_password(
+            await AuthService.keycloak_client.set_user_password(
                 user_id=kc_id, password=new_password, temporary=False
             )
             return {"message": "Password updated successfully"}
@@ -147,59 +200,121 @@ class AuthService:
                 status_code=500, detail=f"Error updating password: {str(e)}"
             )
 
-    def delete_kc_user(user_email):
+    async def delete_kc_user(user_email):
         try:
-            user_id = AuthService.keycloak_admin.get_user_id(username=user_email)
-            AuthService.keycloak_admin.delete_user(user_id=user_id)
+            user_id = await AuthService.keycloak_client.get_user_id(username=user_email)
+            await AuthService.keycloak_client.delete_user(user_id=user_id)
             return {"message": "User deleted successfully"}
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Error deleting user: {str(e)}"
             )
 
-    def get_current_user(
+    async def get_current_user(
         credentials: HTTPAuthorizationCredentials = Security(bearer_scheme),
     ) -> UserInfo:
         """Extract and verify the token to retrieve user info."""
         token = credentials.credentials
-        user_info = AuthService.verify_token(token)
+        user_info = await AuthService.verify_token(token)
 
         if not user_info:
             raise HTTPException(status_code=401, detail="Invalid or expired token")
 
         return user_info
     
-    def add_role_to_user(user_id: str, role_name: str):
+    async def refresh_realm_roles():
         """
-        Add a role to a user in Keycloak.
+        Reload every realm role representation into the role cache with one Keycloak call.
         """
-        try:
-            # Check if the role exists
-            roles = AuthService.keycloak_admin.get_realm_roles()
-            role_object = next(
-                (role for role in roles if role["name"] == role_name), None
+        async with AuthService.role_cache_lock:
+            roles = await AuthService.keycloak_client.get_realm_roles()
+            for role in roles:
+                AuthService.role_cache.set(role["name"], role)
+
+    async def get_realm_role(role_name: str):
+        """
+        Look a realm role up by name, reloading the cache on a miss or after its TTL.
+        """
+        role_object = AuthService.role_cache.get(role_name)
+        if role_object is None:
+            await AuthService.refresh_realm_roles()
+            role_object = AuthService.role_cache.get(role_name)
+        return role_object
+
+    async def add_role_to_users(user_ids: list[str], role_name: str) -> dict[str, str]:
+        """
+        Add a role to many Keycloak users at once.
+
+        Returns:
+            dict: Error messages keyed by the Keycloak user IDs the role could not be added to.
+        """
+        role_object = await AuthService.get_realm_role(role_name)
+        if not role_object:
+            raise HTTPException(
+                status_code=404, detail=f"Role '{role_name}' not found"
             )
-            if not role_object:
-                raise HTTPException(
-                    status_code=404, detail=f"Role '{role_name}' not found"
-                )
-            # Assign the role to the user
-            AuthService.keycloak_admin.assign_realm_roles(
-                user_id=user_id, roles=[role_object]
+        results = await asyncio.gather(
+            *[
+                AuthService.keycloak_client.assign_realm_roles(user_id=user_id, roles=[role_object])
+                for user_id in user_ids
+            ],
+            return_exceptions=True,
+        )
+        return {
+            user_id: str(result)
+            for user_id, result in zip(user_ids, results)
+            if isinstance(result, BaseException)
+        }
+
+    async def remove_role_from_users(user_ids: list[str], role_name: str) -> dict[str, str]:
+        """
+        Remove a role from many Keycloak users at once.
+
+        Returns:
+            dict: Error messages keyed by the Keycloak user IDs the role could not be removed from.
+        """
+        role_object = await AuthService.get_realm_role(role_name)
+        if not role_object:
+            raise HTTPException(
+                status_code=404, detail=f"Role '{role_name}' not found"
             )
-            
+        results = await asyncio.gather(
+            *[
+                AuthService.keycloak_client.delete_realm_roles_of_user(user_id=user_id, roles=[role_object])
+                for user_id in user_ids
+            ],
+            return_exceptions=True,
+        )
+        return {
+            user_id: str(result)
+            for user_id, result in zip(user_ids, results)
+            if isinstance(result, BaseException)
+        }
+
+    async def add_role_to_user(user_id: str, role_name: str):
+        """
+        Add a role to a user in Keycloak.
+        """
+        try:
+            failures = await AuthService.add_role_to_users([user_id], role_name)
+            if failures:
+                raise Exception(failures[user_id])
+
             return {"message": "Role added successfully"}
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Error adding role to user: {str(e)}"
             )
         
-    def remove_role_from_user(user_id: str, role_name: str):
+    async def remove_role_from_user(user_id: str, role_name: str):
         """
         Remove a role from a user in Keycloak.
         """
         try:
-            AuthService.keycloak_admin.delete_realm_roles_of_user(user_id=user_id, roles=[role_name])
+            failures = await AuthService.remove_role_from_users([user_id], role_name)
+            if failures:
+                raise Exception(failures[user_id])
+
             return {"message": "Role removed successfully"}
         except Exception as e:
             raise HTTPException(
@@ -0,0 +1,171 @@
+import asyncio
+import base64
+import json
+import logging
+import time
+from typing import Optional
+
+import httpx
+from jwcrypto import jwk, jwt
+
+logger = logging.getLogger("token_verifier")
+logger.setLevel(logging.ERROR)
+
+
+class UnknownSigningKeyError(Exception):
+    """
+    Raised when a token is signed with a key id that is not in the cached key set.
+    """
+
+
+class JWKSTokenVerifier:
+    """
+    Verifies Keycloak access tokens locally against the realm's published signing keys.
+
+    The key set is fetched once, kept in memory and refreshed in the background every
+    `ttl` seconds. A token carrying an unknown `kid` can trigger an early refresh through
+    `refresh_unknown_key`, so key rotations are picked up without waiting for the next
+    scheduled one.
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        realm: str,
+        audiences: list[str],
+        issuer: Optional[str] = None,
+        ttl: int = 300,
+        leeway: int = 10,
+        min_refresh_interval: int = 30,
+        algorithms: tuple[str, ...] = ("RS256",),
+    ):
+        realm_url = f"{server_url.rstrip('/')}/realms/{realm}"
+        self.issuer = issuer or realm_url
+        self.jwks_url = f"{realm_url}/protocol/openid-connect/certs"
+        self.audiences = set(audiences)
+        self.ttl = ttl
+        self.leeway = leeway
+        self.min_refresh_interval = min_refresh_interval
+        self.algorithms = list(algorithms)
+        self._keys: dict = {}
+        self._last_refresh = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._pending_refresh: Optional[asyncio.Task] = None
+
+    def is_ready(self) -> bool:
+        """
+        Whether a key set has been loaded and local verification can be used.
+        """
+        return bool(self._keys)
+
+    async def start(self):
+        """
+        Load the key set and start the background refresh loop.
+        """
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Keycloak may not be up yet; the loop below keeps retrying
+            logger.error(f"Initial JWKS fetch failed: {e}")
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """
+        Cancel the background refresh loop.
+        """
+        for task in (self._refresh_task, self._pending_refresh):
+            if task is not None and not task.done():
+                task.cancel()
+        self._refresh_task = None
+        self._pending_refresh = None
+
+    async def refresh(self):
+        """
+        Fetch the realm's JWKS and replace the cached keys.
+        """
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            response = await client.get(self.jwks_url)
+            response.raise_for_status()
+            jwks = response.json()
+
+        keys = {}
+        for key in jwks.get("keys", []):
+            # Keycloak also publishes encryption keys; only signing keys are relevant here
+            if key.get("use", "sig") != "sig" or "kid" not in key:
+                continue
+            keys[key["kid"]] = jwk.JWK(**key)
+
+        self._keys = keys
+        self._last_refresh = time.monotonic()
+
+    async def _refresh_loop(self):
+        while True:
+            # Retry quickly while no keys are loaded, otherwise wait for the TTL
+            await asyncio.sleep(self.ttl if self._keys else self.min_refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"JWKS refresh failed: {e}")
+
+    async def refresh_unknown_key(self) -> bool:
+        """
+        Refresh the key set for a token signed with an unknown key, at most once per
+        `min_refresh_interval`. Callers arriving while such a refresh runs wait for it
+        instead of starting another one.
+
+        Returns:
+            bool: Whether the key set was refreshed, so verifying again may succeed.
+        """
+        if self._pending_refresh is None or self._pending_refresh.done():
+            if time.monotonic() - self._last_refresh < self.min_refresh_interval:
+                return False
+            self._pending_refresh = asyncio.create_task(self.refresh())
+        # A caller that goes away must not cancel the refresh the others wait for
+        await asyncio.shield(self._pending_refresh)
+        return True
+
+    @staticmethod
+    def _get_kid(token: str) -> Optional[str]:
+        header_segment = token.split(".", 1)[0]
+        padded = header_segment + "=" * (-len(header_segment) % 4)
+        header = json.loads(base64.urlsafe_b64decode(padded))
+        return header.get("kid")
+
+    def verify(self, token: str) -> dict:
+        """
+        Verify the token signature, `exp`, `iss` and `aud` and return its claims.
+
+        Args:
+            token (str): The encoded JWT.
+
+        Raises:
+            UnknownSigningKeyError: If the token's `kid` is not in the cached key set.
+            jwcrypto.common.JWException: If the signature or a claim is invalid.
+            ValueError: If the token is malformed or its audience is not accepted.
+
+        Returns:
+            dict: The verified token claims.
+        """
+        kid = self._get_kid(token)
+        key = self._keys.get(kid)
+        if key is None:
+            raise UnknownSigningKeyError(f"Unknown signing key: {kid}")
+
+        verified = jwt.JWT(
+            algs=self.algorithms,
+            check_claims={"iss": self.issuer, "exp": None},
+            expected_type="JWS",
+        )
+        verified.leeway = self.leeway
+        verified.deserialize(token, key)
+        claims = json.loads(verified.claims)
+
+        # Keycloak puts the client the token was issued to in `azp`, and any
+        # resolved audiences in `aud` (a string or a list)
+        token_audiences = claims.get("aud") or []
+        if isinstance(token_audiences, str):
+            token_audiences = [token_audiences]
+        if not self.audiences.intersection(token_audiences) and claims.get("azp") not in self.audiences:
+            raise ValueError("Token audience not accepted")
+
+        return claims
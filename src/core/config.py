@@ -34,6 +34,9 @@ required_environment_variables = [
     "USE_CREDENTIALS",
 ]
 
+# The rolling schedule generation covers at most a year, the most generate_schedules takes at once
+MAX_SCHEDULE_HORIZON_WEEKS = 52
+
 class BaseSettings(TypedDict):
     secret_key: str
     mysql_user: str
@@ -61,15 +64,45 @@ class BaseSettings(TypedDict):
     mail_tls: bool
     mail_ssl: bool
     use_credentials: bool
+    keycloak_issuer: str
+    keycloak_token_audiences: list[str]
+    keycloak_jwks_ttl: int
+    token_cache_size: int
+    role_cache_ttl: int
+    identity_cache_size: int
+    identity_cache_ttl: int
+    availability_cache_size: int
+    availability_cache_ttl: int
+    schedule_cache_size: int
+    schedule_cache_ttl: int
+    schedule_horizon_weeks: int
+    schedule_horizon_interval: int
+    schedule_slot_storage: str
+    keycloak_timeout: float
+    keycloak_max_connections: int
+    keycloak_max_concurrency: int
+    provisioning_batch_size: int
+    provisioning_max_attempts: int
+    notification_batch_size: int
+    notification_max_attempts: int
+    notification_max_concurrency: int
 
 class Settings:
     def __init__(self):
         self.check_environment_variables()
+        self.check_schedule_horizon()
 
     def check_environment_variables(self):
         for env_var in required_environment_variables:
             if env_var not in os.environ:
                 raise EnvironmentError(f"Missing environment variable: {env_var}")
+
+    def check_schedule_horizon(self):
+        weeks = int(os.getenv("SCHEDULE_HORIZON_WEEKS", "0"))
+        if not 0 <= weeks <= MAX_SCHEDULE_HORIZON_WEEKS:
+            raise EnvironmentError(
+                f"SCHEDULE_HORIZON_WEEKS must be between 0 and {MAX_SCHEDULE_HORIZON_WEEKS}, got {weeks}"
+            )
             
     def get_config(self) -> BaseSettings:
         return {
@@ -99,6 +132,34 @@ class Settings:
             "mail_tls": self.check_boolean(os.getenv("MAIL_TLS")),
             "mail_ssl": self.check_boolean(os.getenv("MAIL_SSL")),
             "use_credentials": self.check_boolean(os.getenv("USE_CREDENTIALS")),
+            # Optional settings, defaults are derived from the required ones
+            "keycloak_issuer": os.getenv("KEYCLOAK_ISSUER"),
+            "keycloak_token_audiences": os.getenv(
+                "KEYCLOAK_TOKEN_AUDIENCES",
+                f"account,{os.getenv('KEYCLOAK_API_CLIENT_ID')},{os.getenv('KEYCLOAK_FRONT_END_CLIENT_ID')}",
+            ).split(","),
+            "keycloak_jwks_ttl": int(os.getenv("KEYCLOAK_JWKS_TTL", "300")),
+            "token_cache_size": int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+            "role_cache_ttl": int(os.getenv("ROLE_CACHE_TTL", "600")),
+            "identity_cache_size": int(os.getenv("IDENTITY_CACHE_SIZE", "10000")),
+            "identity_cache_ttl": int(os.getenv("IDENTITY_CACHE_TTL", "300")),
+            "availability_cache_size": int(os.getenv("AVAILABILITY_CACHE_SIZE", "5000")),
+            "availability_cache_ttl": int(os.getenv("AVAILABILITY_CACHE_TTL", "60")),
+            "schedule_cache_size": int(os.getenv("SCHEDULE_CACHE_SIZE", "5000")),
+            "schedule_cache_ttl": int(os.getenv("SCHEDULE_CACHE_TTL", "30")),
+            # 0 turns the rolling schedule generation off
+            "schedule_horizon_weeks": int(os.getenv("SCHEDULE_HORIZON_WEEKS", "0")),
+            "schedule_horizon_interval": int(os.getenv("SCHEDULE_HORIZON_INTERVAL", "3600")),
+            # "intervals" stores generated schedules as working intervals instead of slot rows
+            "schedule_slot_storage": os.getenv("SCHEDULE_SLOT_STORAGE", "rows"),
+            "keycloak_timeout": float(os.getenv("KEYCLOAK_TIMEOUT", "5")),
+            "keycloak_max_connections": int(os.getenv("KEYCLOAK_MAX_CONNECTIONS", "20")),
+            "keycloak_max_concurrency": int(os.getenv("KEYCLOAK_MAX_CONCURRENCY", "10")),
+            "provisioning_batch_size": int(os.getenv("PROVISIONING_BATCH_SIZE", "20")),
+            "provisioning_max_attempts": int(os.getenv("PROVISIONING_MAX_ATTEMPTS", "8")),
+            "notification_batch_size": int(os.getenv("NOTIFICATION_BATCH_SIZE", "20")),
+            "notification_max_attempts": int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "6")),
+            "notification_max_concurrency": int(os.getenv("NOTIFICATION_MAX_CONCURRENCY", "4")),
         }
     
     def get_mail_config(self) -> ConnectionConfig:
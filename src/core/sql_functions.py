@@ -0,0 +1,33 @@
+from sqlalchemy import Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class time_to_seconds(FunctionElement):
+    """
+    Seconds since midnight of a TIME column, compiled for the database in use.
+    """
+    type = Integer()
+    inherit_cache = True
+    name = "time_to_seconds"
+
+
+@compiles(time_to_seconds)
+def compile_time_to_seconds(element, compiler, **kw):
+    return f"TIME_TO_SEC({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(time_to_seconds, "sqlite")
+def compile_time_to_seconds_sqlite(element, compiler, **kw):
+    # SQLite stores times as 'HH:MM:SS[.ffffff]' text
+    value = compiler.process(element.clauses, **kw)
+    return (
+        f"(CAST(substr({value}, 1, 2) AS INTEGER) * 3600"
+        f" + CAST(substr({value}, 4, 2) AS INTEGER) * 60"
+        f" + CAST(substr({value}, 7, 2) AS INTEGER))"
+    )
+
+
+@compiles(time_to_seconds, "postgresql")
+def compile_time_to_seconds_postgresql(element, compiler, **kw):
+    return f"CAST(EXTRACT(EPOCH FROM {compiler.process(element.clauses, **kw)}) AS INTEGER)"
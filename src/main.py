@@ -1,3 +1,4 @@
+import logging
 from contextlib import asynccontextmanager
 
 import uvicorn
@@ -8,6 +9,11 @@ from core.db import async_session_manager
 from core.config import settings
 from routers.user_router import user_router
 from auth.controller import AuthController
+from auth.service import AuthService
+from auth.identity_cache import identity_cache
+from workers.provisioning_worker import provisioning_worker
+from workers.notification_worker import notification_worker
+from workers.schedule_horizon_worker import schedule_horizon_worker
 from routers.barber_router import barber_router
 from routers.service_router import service_router
 from routers.schedule_router import schedule_router
@@ -15,12 +21,35 @@ from routers.auth_router import auth_router
 from routers.appointment_router import appointment_router
 from routers.thread_router import thread_router
 from routers.message_router import message_router
+from routers.availability_router import availability_router
+from routers.report_router import report_router
+from modules.availability.availability_index import availability_index
+from modules.schedule_cache import schedule_cache
 
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Load Keycloak signing keys so tokens can be verified locally
+    await AuthService.token_verifier.start()
+    try:
+        await AuthService.refresh_realm_roles()
+    except Exception as e:
+        # Roles are loaded on first use instead
+        logging.error(f"Could not warm the realm role cache: {e}")
+    # Apply queued user changes to Keycloak in the background
+    await provisioning_worker.start()
+    # Deliver queued emails in the background
+    await notification_worker.start()
+    # Keep schedules generated from the weekly templates ahead of time, when configured
+    if schedule_horizon_worker.enabled:
+        await schedule_horizon_worker.start()
     yield
+    await schedule_horizon_worker.stop()
+    await notification_worker.stop()
+    await provisioning_worker.stop()
+    await AuthService.token_verifier.stop()
+    await AuthService.keycloak_client.aclose()
     if async_session_manager._engine is not None:
         # Close the DB connection
         await async_session_manager.close()
@@ -38,7 +67,8 @@ app.add_middleware(
     allow_origins=settings.get_config()["backend_cors_origins"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -51,6 +81,8 @@ app.include_router(schedule_router)
 app.include_router(appointment_router)
 app.include_router(thread_router)
 app.include_router(message_router)
+app.include_router(availability_router)
+app.include_router(report_router)
 
 # Define the root endpoint
 @app.get("/")
@@ -61,5 +93,15 @@ async def root():
 async def root():
     return {"healthy": True}
 
+@app.get("/metrics/caches")
+async def cache_metrics():
+    return {
+        "tokens": AuthService.token_cache.stats(),
+        "roles": AuthService.role_cache.stats(),
+        "identities": identity_cache.stats(),
+        "availability": availability_index.stats(),
+        "schedules": schedule_cache.stats(),
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
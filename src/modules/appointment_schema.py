@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import Optional
 from enum import Enum
+from datetime import date, time
 
 from .user.user_schema import UserResponse
 from .user.barber_schema import BarberResponse
@@ -16,7 +17,7 @@ class AppointmentStatus(str, Enum):
     pending = "pending"
     confirmed = "confirmed"
     completed = "completed"
-    cancelled = "cancelled"
+    canceled = "canceled"
 
 class AppointmentCreate(BaseModel):
     user_id: int
@@ -25,6 +26,40 @@ class AppointmentCreate(BaseModel):
     time_slot: list[int]
     service_id: list[int]
 
+class AppointmentBatchItem(BaseModel):
+    time_slot: list[int]
+    service_id: Optional[list[int]] = None
+
+class AppointmentRecurrence(BaseModel):
+    start_date: date
+    start_time: time
+    end_time: time
+    interval_days: int = 14
+    occurrences: int
+
+class AppointmentBatchCreate(BaseModel):
+    user_id: int
+    barber_id: int
+    status: AppointmentStatus
+    service_id: list[int]
+    # Either explicit appointments or a recurrence rule
+    items: Optional[list[AppointmentBatchItem]] = None
+    recurrence: Optional[AppointmentRecurrence] = None
+    # Book nothing unless every appointment can be booked
+    all_or_nothing: bool = True
+
+class AppointmentBatchItemResult(BaseModel):
+    index: int
+    appointment_date: Optional[str] = None
+    time_slot: list[int]
+    appointment_id: Optional[int] = None
+    error: Optional[str] = None
+
+class AppointmentBatchResponse(BaseModel):
+    booked: int
+    failed: int
+    results: list[AppointmentBatchItemResult]
+
 class AppointmentUpdate(BaseModel):
     user_id: Optional[int] = None
     barber_id: Optional[int] = None
@@ -34,7 +69,8 @@ class AppointmentUpdate(BaseModel):
 
 class AppointmentResponse(BaseModel):
     appointment_id: int
-    appointment_date: str
+    # None for appointments booked before their date was recorded
+    appointment_date: Optional[str] = None
     user: UserResponse
     barber: BarberResponse
     status: AppointmentStatus
@@ -0,0 +1,149 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, time
+from math import ceil, gcd
+from typing import Iterable, Iterator, Optional
+
+from core.cache import LRUCache
+from core.config import settings
+
+'''
+In-process index of the time slots of every barber-day that was searched recently.
+A day is packed into integer bitmaps over a fixed grid of the day, one bit per grid unit,
+instead of TimeSlot objects, so finding free runs is a handful of shifts and ANDs.
+Bookings and cancellations in this process update the bitmaps in place; the TTL bounds
+how long a change made by another worker process can go unnoticed.
+'''
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes: int) -> time:
+    return time(minutes // 60, minutes % 60)
+
+
+def runs_of(bits: int, length: int) -> int:
+    '''
+    Bitmap of the positions p where bits p to p + length - 1 are all set.
+    '''
+    covered = 1
+    while covered < length:
+        step = min(covered, length - covered)
+        bits &= bits >> step
+        covered += step
+    return bits
+
+
+class DayAvailability:
+    '''
+    The slots of one barber-day as bitmaps over a grid of `unit` minutes, the largest unit
+    every slot boundary falls on (30 minutes for a day of half-hour slots). Bit p stands
+    for minutes p * unit to (p + 1) * unit:
+
+    - working: covered by a slot
+    - available: covered by a slot the barber opened for booking
+    - booked: covered by a booked slot
+    - slot_starts: a slot starts there
+
+    The slot ids and start/end minutes are kept in start order to map bits back to slots.
+    '''
+    __slots__ = ("unit", "working", "available", "booked", "slot_starts", "slot_ids", "starts", "ends")
+
+    def __init__(self, slots: Iterable):
+        slots = sorted(slots, key=lambda slot: slot.start_time)
+        self.slot_ids = array("q", (slot.slot_id for slot in slots))
+        self.starts = array("H", (to_minutes(slot.start_time) for slot in slots))
+        self.ends = array("H", (to_minutes(slot.end_time) for slot in slots))
+
+        self.unit = MINUTES_PER_DAY
+        for minutes in (*self.starts, *self.ends):
+            self.unit = gcd(self.unit, minutes)
+
+        self.working = self.available = self.booked = self.slot_starts = 0
+        for position, slot in enumerate(slots):
+            mask = self._mask(position)
+            self.working |= mask
+            if slot.is_available:
+                self.available |= mask
+            if slot.is_booked:
+                self.booked |= mask
+            self.slot_starts |= 1 << (self.starts[position] // self.unit)
+
+    # Bits covered by the slot at `position`
+    def _mask(self, position: int) -> int:
+        first = self.starts[position] // self.unit
+        return ((1 << (self.ends[position] // self.unit - first)) - 1) << first
+
+    @property
+    def free(self) -> int:
+        return self.available & ~self.booked
+
+    def set_free(self, slot_ids: Iterable[int], free: bool):
+        for slot_id in slot_ids:
+            try:
+                mask = self._mask(self.slot_ids.index(slot_id))
+            except ValueError:
+                continue
+            if free:
+                self.booked &= ~mask
+            else:
+                self.booked |= mask
+
+    def openings(self, duration: int, not_before: int = 0) -> Iterator[tuple[int, int]]:
+        '''
+        Yield (first, last) slot positions of every run of back-to-back free slots that starts
+        at or after minute `not_before` and covers at least `duration` minutes, earliest first.
+        '''
+        length = max(1, ceil(duration / self.unit))
+        candidates = runs_of(self.free, length) & self.slot_starts
+        candidates &= -1 << ceil(not_before / self.unit)
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            start = (bit.bit_length() - 1) * self.unit
+            yield (
+                bisect_left(self.starts, start),
+                bisect_right(self.starts, start + (length - 1) * self.unit) - 1,
+            )
+
+
+class AvailabilityIndex:
+    '''
+    DayAvailability entries keyed by (barber_id, date).
+    '''
+
+    def __init__(self, max_size: int, ttl: float):
+        self._days = LRUCache(max_size=max_size, default_ttl=ttl)
+
+    def get(self, barber_id: int, day: date) -> Optional[DayAvailability]:
+        return self._days.get((barber_id, day))
+
+    def put(self, barber_id: int, day: date, availability: DayAvailability):
+        self._days.set((barber_id, day), availability)
+
+    def set_free(self, barber_id: int, day: date, slot_ids: Iterable[int], free: bool):
+        '''
+        Apply a booking (free=False) or a release (free=True) to an indexed barber-day.
+        '''
+        availability = self._days.get((barber_id, day))
+        if availability is not None:
+            availability.set_free(slot_ids, free)
+
+    def invalidate(self, barber_id: int, day: date):
+        self._days.pop((barber_id, day))
+
+    def clear(self):
+        self._days.clear()
+
+    def stats(self) -> dict:
+        return self._days.stats()
+
+
+availability_index = AvailabilityIndex(
+    max_size=settings.get_config()["availability_cache_size"],
+    ttl=settings.get_config()["availability_cache_ttl"],
+)
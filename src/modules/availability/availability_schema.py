@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+import datetime
+
+'''
+Pydantic validation models for the availability endpoints
+'''
+
+class AvailabilityOpening(BaseModel):
+    barber_id: int
+    date: datetime.date
+    start_time: datetime.time
+    end_time: datetime.time
+    time_slot: list[int]
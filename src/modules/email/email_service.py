@@ -14,16 +14,97 @@ class EmailService:
             autoescape=jinja2.select_autoescape(["html", "xml"]),
         )
 
-    async def send_barber_cancellation_email(
+    def render_client_booking_email(
+        self,
+        barber: User,
+        client: User,
+        service_name: str,
+        appointment_date: datetime.date,
+        appointment_time: datetime.time,
+    ) -> tuple[str, str]:
+        """
+        Subject and body of the email confirming a booking to the client.
+        """
+        subject = "Barber shop appointment scheduled successfully!"
+        body = f"""
+            {client.firstName},
+            your appointment for a {service_name} with {barber.firstName} {barber.lastName}
+            was successfully scheduled for {appointment_time.strftime('%I:%M %p')} on {appointment_date.strftime('%B %d, %Y')}.
+            """
+        return subject, body
+
+    def render_barber_booking_email(
+        self,
+        barber: User,
+        client: User,
+        service_name: str,
+        appointment_date: datetime.date,
+        appointment_time: datetime.time,
+    ) -> tuple[str, str]:
+        """
+        Subject and body of the email telling the barber about a new booking.
+        """
+        subject = "A client has scheduled an appointment"
+        body = f"""
+            {barber.firstName},
+            {client.firstName} {client.lastName} has scheduled a {service_name} with
+            you at {appointment_time.strftime('%I:%M %p')} on {appointment_date.strftime('%B %d, %Y')}.
+            """
+        return subject, body
+
+    def render_client_booking_summary_email(
+        self,
+        barber: User,
+        client: User,
+        service_name: str,
+        appointments: list[tuple[datetime.date, datetime.time]],
+    ) -> tuple[str, str]:
+        """
+        Subject and body of the email confirming several bookings to the client at once.
+        """
+        subject = f"{len(appointments)} barber shop appointments scheduled successfully!"
+        body = f"""
+            {client.firstName},
+            your appointments for a {service_name} with {barber.firstName} {barber.lastName}
+            were successfully scheduled for:
+            <ul>{self._render_appointment_list(appointments)}</ul>
+            """
+        return subject, body
+
+    def render_barber_booking_summary_email(
+        self,
+        barber: User,
+        client: User,
+        service_name: str,
+        appointments: list[tuple[datetime.date, datetime.time]],
+    ) -> tuple[str, str]:
+        """
+        Subject and body of the email telling the barber about several new bookings at once.
+        """
+        subject = f"A client has scheduled {len(appointments)} appointments"
+        body = f"""
+            {barber.firstName},
+            {client.firstName} {client.lastName} has scheduled a {service_name} with you on:
+            <ul>{self._render_appointment_list(appointments)}</ul>
+            """
+        return subject, body
+
+    def _render_appointment_list(self, appointments: list[tuple[datetime.date, datetime.time]]) -> str:
+        return "".join(
+            f"<li>{appointment_time.strftime('%I:%M %p')} on {appointment_date.strftime('%B %d, %Y')}</li>"
+            for appointment_date, appointment_time in appointments
+        )
+
+    def render_barber_cancellation_email(
         self,
         barber: User,
         client_name: User,
         service_name: str,
         appointment_date: datetime.date,
         appointment_time: datetime.time,
-    ) -> None:
+    ) -> tuple[str, str]:
         """
-        Send an email to the barber notifying them of a cancellation.
+        Subject and body of the email notifying the barber of a cancellation.
         """
         template = "barber_cancellation_email.html"
         subject = "Appointment Cancellation Notification"
@@ -35,22 +116,18 @@ class EmailService:
             appointment_time=appointment_time.strftime('%I:%M %p'),
             appointments_url=f"{settings.get_config()['frontend_host']}/appointments",
         )
-        await self.email_operations.send_email(
-            email=barber.email,
-            subject=subject,
-            body=body,
-        )
+        return subject, body
 
-    async def send_client_cancellation_email(
+    def render_client_cancellation_email(
         self,
         barber: User,
         client: User,
         service_name: str,
         appointment_date: datetime.date,
         appointment_time: datetime.time,
-    ) -> None:
+    ) -> tuple[str, str]:
         """
-        Send an email to the client notifying them of a cancellation.
+        Subject and body of the email notifying the client of a cancellation.
         """
         template = "client_cancellation_email.html"
         subject = "Appointment Cancellation Notification"
@@ -61,11 +138,44 @@ class EmailService:
             appointment_date=appointment_date.strftime('%B %d, %Y'),
             appointment_time=appointment_time.strftime('%I:%M %p'),
         )
+        return subject, body
+
+    async def send_barber_cancellation_email(
+        self,
+        barber: User,
+        client_name: User,
+        service_name: str,
+        appointment_date: datetime.date,
+        appointment_time: datetime.time,
+    ) -> None:
+        """
+        Send an email to the barber notifying them of a cancellation.
+        """
+        subject, body = self.render_barber_cancellation_email(
+            barber, client_name, service_name, appointment_date, appointment_time
+        )
         await self.email_operations.send_email(
-            email=client.email,
+            email=barber.email,
             subject=subject,
             body=body,
         )
 
-    
-
+    async def send_client_cancellation_email(
+        self,
+        barber: User,
+        client: User,
+        service_name: str,
+        appointment_date: datetime.date,
+        appointment_time: datetime.time,
+    ) -> None:
+        """
+        Send an email to the client notifying them of a cancellation.
+        """
+        subject, body = self.render_client_cancellation_email(
+            barber, client, service_name, appointment_date, appointment_time
+        )
+        await self.email_operations.send_email(
+            email=client.email,
+            subject=subject,
+            body=body,
+        )
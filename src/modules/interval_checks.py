@@ -0,0 +1,32 @@
+from datetime import time
+from typing import Hashable, Iterable, Mapping, Optional
+
+'''
+Overlap checks for the time intervals of schedules, slots and template windows.
+The intervals of each group are sorted once by start, then every interval only has to be
+compared with the one before it: n intervals take O(n log n) however many groups there are.
+'''
+
+
+def format_interval(start: time, end: time) -> str:
+    return f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}"
+
+
+def find_interval_problem(
+    groups: Mapping[Hashable, Iterable[tuple[time, time]]], name: str = "Time slots"
+) -> Optional[str]:
+    '''
+    Describe the first empty or overlapping interval found in any group, or return None
+    when every group is valid. Intervals that only touch, one ending where the next
+    starts, don't overlap. `name` is what the intervals are called in the message.
+    '''
+    for intervals in groups.values():
+        intervals = sorted(intervals)
+        for start, end in intervals:
+            if end <= start:
+                return f"end_time must be after start_time: {format_interval(start, end)}"
+        # Sorted by start, some pair overlaps exactly when some neighbouring pair does
+        for previous, current in zip(intervals, intervals[1:]):
+            if current[0] < previous[1]:
+                return f"{name} must not overlap: {format_interval(*previous)} and {format_interval(*current)}"
+    return None
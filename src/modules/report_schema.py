@@ -0,0 +1,46 @@
+from pydantic import BaseModel
+from typing import Optional
+
+'''
+Pydantic validation models for the report endpoints
+'''
+
+class BarberUtilization(BaseModel):
+    barber_id: int
+    working_days: int
+    open_minutes: int
+    booked_minutes: int
+    utilization: float
+
+class BarberIdleGaps(BaseModel):
+    barber_id: int
+    gaps: int
+    idle_minutes: int
+    mean_gap_minutes: float
+    longest_gap_minutes: int
+
+class HeatmapCell(BaseModel):
+    weekday: str
+    hour: int
+    booked_minutes: int
+    utilization: float
+
+class UtilizationHeatmap(BaseModel):
+    weekdays: list[str]
+    hours: list[int]
+    # Indexed [weekday][hour]
+    open_minutes: list[list[int]]
+    booked_minutes: list[list[int]]
+    utilization: list[list[float]]
+    peak_hours: list[HeatmapCell]
+
+class LeadTimeSummary(BaseModel):
+    barber_id: Optional[int] = None
+    appointments: int
+    mean_hours: float
+    median_hours: float
+    p90_hours: float
+
+class LeadTimeReport(BaseModel):
+    overall: LeadTimeSummary
+    barbers: list[LeadTimeSummary]
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from datetime import date
+from typing import Hashable, Optional
+
+from core.cache import LRUCache
+from core.config import settings
+
+'''
+Serialized schedule responses, so polling a schedule doesn't rebuild it.
+A response is cached as its JSON under ("schedule", schedule_id). ("day", barber_id, date)
+maps a barber-day to its schedule_id, or to NO_SCHEDULE when the barber has none that day.
+Writes in this process invalidate entries directly: slot bookings drop the response of
+their schedule, schedule writes also drop the barber-days they touch. The TTL bounds how
+long a change made by another worker process can go unnoticed.
+
+A reader may load a schedule just before a write commits and cache it just after the write
+invalidated it. Every invalidation therefore stamps its key with a new generation, and
+readers take `current_generation()` before they query: an entry whose key was invalidated
+since is not cached.
+'''
+
+NO_SCHEDULE = 0
+
+schedule_cache = LRUCache(
+    max_size=settings.get_config()["schedule_cache_size"],
+    default_ttl=settings.get_config()["schedule_cache_ttl"],
+)
+
+# Generation each key was last invalidated at, oldest first. Keys dropped to bound its size
+# count as invalidated at the newest generation dropped.
+_invalidated: OrderedDict[Hashable, int] = OrderedDict()
+_generation = 0
+_dropped_generation = 0
+
+
+def current_generation() -> int:
+    '''
+    Taken before loading what is about to be cached, and passed to the setters.
+    '''
+    return _generation
+
+
+def _invalidate(key: Hashable):
+    global _generation, _dropped_generation
+    _generation += 1
+    _invalidated[key] = _generation
+    _invalidated.move_to_end(key)
+    while len(_invalidated) > schedule_cache.max_size:
+        _, dropped = _invalidated.popitem(last=False)
+        _dropped_generation = max(_dropped_generation, dropped)
+    schedule_cache.pop(key)
+
+
+def _set_unless_invalidated(key: Hashable, value, generation: int):
+    if _invalidated.get(key, _dropped_generation) <= generation:
+        schedule_cache.set(key, value)
+
+
+def get_schedule_json(schedule_id: int) -> Optional[bytes]:
+    return schedule_cache.get(("schedule", schedule_id))
+
+
+def set_schedule_json(schedule_id: int, barber_id: int, day: date, body: bytes, generation: int):
+    _set_unless_invalidated(("schedule", schedule_id), body, generation)
+    _set_unless_invalidated(("day", barber_id, day), schedule_id, generation)
+
+
+def get_day_schedule_id(barber_id: int, day: date) -> Optional[int]:
+    '''
+    The barber-day's schedule_id, NO_SCHEDULE if it has none, or None if it isn't cached.
+    '''
+    return schedule_cache.get(("day", barber_id, day))
+
+
+def set_day_schedule_id(barber_id: int, day: date, schedule_id: int, generation: int):
+    _set_unless_invalidated(("day", barber_id, day), schedule_id, generation)
+
+
+def invalidate_schedules(*schedule_ids: int):
+    for schedule_id in schedule_ids:
+        _invalidate(("schedule", schedule_id))
+
+
+def invalidate_days(*days: tuple[int, date]):
+    for barber_id, day in days:
+        _invalidate(("day", barber_id, day))
@@ -0,0 +1,85 @@
+from datetime import time
+from typing import Iterable, List, NamedTuple, Optional
+
+from modules.availability.availability_index import MINUTES_PER_DAY, to_minutes, to_time
+
+'''
+Slots derived from a schedule's working intervals.
+A schedule stored as intervals keeps one ScheduleInterval row per working window instead
+of one TimeSlot row per slot. Its slots are derived on the fly and only become TimeSlot
+rows once something has to point at them, such as a booking. A derived slot has a
+negative slot_id that encodes its schedule and start minute, so it can be referred to
+like any other slot until then.
+
+A TimeSlot row starting at the same minute as a derived slot takes its place. Rows of an
+interval schedule are either such materialized slots or lie outside every interval.
+'''
+
+
+# A slot of an interval schedule that has no TimeSlot row yet
+class DerivedSlot(NamedTuple):
+    slot_id: int
+    start_time: time
+    end_time: time
+    is_available: bool = True
+    is_booked: bool = False
+
+
+def derived_slot_id(schedule_id: int, start_minute: int) -> int:
+    return -(schedule_id * MINUTES_PER_DAY + start_minute)
+
+
+def is_derived_slot_id(slot_id: int) -> bool:
+    return slot_id < 0
+
+
+def parse_derived_slot_id(slot_id: int) -> tuple[int, int]:
+    '''
+    The (schedule_id, start minute) a derived slot_id stands for.
+    '''
+    return divmod(-slot_id, MINUTES_PER_DAY)
+
+
+def interval_slots(schedule_id: int, interval) -> List[DerivedSlot]:
+    '''
+    The whole slots of `slot_minutes` that fit in an interval.
+    '''
+    start, end = to_minutes(interval.start_time), to_minutes(interval.end_time)
+    return [
+        DerivedSlot(derived_slot_id(schedule_id, minute), to_time(minute), to_time(minute + interval.slot_minutes))
+        for minute in range(start, end - interval.slot_minutes + 1, interval.slot_minutes)
+    ]
+
+
+def derive_slots(schedule_id: int, intervals: Iterable, rows: Iterable) -> list:
+    '''
+    A schedule's slots in start order: its TimeSlot rows plus the derived slots of its
+    intervals that no row has taken the place of.
+    '''
+    rows = list(rows)
+    taken = {to_minutes(row.start_time) for row in rows}
+    slots = rows + [
+        slot
+        for interval in intervals
+        for slot in interval_slots(schedule_id, interval)
+        if to_minutes(slot.start_time) not in taken
+    ]
+    return sorted(slots, key=lambda slot: slot.start_time)
+
+
+def find_derived_slot(schedule_id: int, start_minute: int, intervals: Iterable) -> Optional[DerivedSlot]:
+    '''
+    The derived slot starting at `start_minute`, if one of the intervals has a slot there.
+    '''
+    for interval in intervals:
+        start, end = to_minutes(interval.start_time), to_minutes(interval.end_time)
+        if (
+            start <= start_minute <= end - interval.slot_minutes
+            and (start_minute - start) % interval.slot_minutes == 0
+        ):
+            return DerivedSlot(
+                derived_slot_id(schedule_id, start_minute),
+                to_time(start_minute),
+                to_time(start_minute + interval.slot_minutes),
+            )
+    return None
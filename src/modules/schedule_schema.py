@@ -33,4 +33,30 @@ class ScheduleResponse(ScheduleCreate):
     barber: BarberResponse
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+class ScheduleCompact(BaseModel):
+    start_date: datetime.date
+    end_date: datetime.date
+    # Every barber when not given
+    barber_id: Optional[int] = None
+
+class ScheduleCompactResponse(BaseModel):
+    schedules_compacted: int
+    time_slots_removed: int
+    intervals_created: int
+
+class ScheduleGrid(BaseModel):
+    start_date: datetime.date
+    end_date: datetime.date
+    # Minutes covered by one bit of the day bitmaps
+    unit_minutes: int
+    days: list[datetime.date]
+    barbers: list[int]
+    # Indexed [barber][day]; schedule_id is None where the barber has no schedule block
+    schedule_id: list[list[Optional[int]]]
+    is_working: list[list[bool]]
+    # Hex bitmaps, bit p covering minutes p * unit_minutes to (p + 1) * unit_minutes of the day
+    slots: list[list[str]]
+    slot_starts: list[list[str]]
+    available: list[list[str]]
+    booked: list[list[str]]
@@ -0,0 +1,36 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+import datetime
+
+'''
+Pydantic validation models for the schedule template endpoints
+'''
+
+class ScheduleTemplateWindow(BaseModel):
+    # 0 is Monday
+    weekday: int = Field(ge=0, le=6)
+    start_time: datetime.time
+    end_time: datetime.time
+    slot_minutes: int = Field(30, ge=5, le=480)
+
+    class Config:
+        from_attributes = True
+
+class ScheduleTemplateUpdate(BaseModel):
+    windows: list[ScheduleTemplateWindow]
+
+class ScheduleTemplateResponse(BaseModel):
+    barber_id: int
+    windows: list[ScheduleTemplateWindow]
+
+class ScheduleGenerate(BaseModel):
+    start_date: datetime.date
+    end_date: datetime.date
+    # Every barber with a template when not given
+    barber_id: Optional[int] = None
+
+class ScheduleGenerateResponse(BaseModel):
+    schedules_created: int
+    time_slots_created: int
+    intervals_created: int = 0
+    days_skipped: int
@@ -5,9 +5,15 @@ from .user_schema import UserBase
 class BarberCreate(BaseModel):
     user_id: int
 
+class BarberBatchCreate(BaseModel):
+    user_ids: list[int]
+
 class BarberResponse(BaseModel):
     barber_id: int
     user: UserBase
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+class BarberListResponse(BarberResponse):
+    # Free slots on the requested schedule_date, when one is given
+    free_slots: Optional[int] = None
@@ -0,0 +1,28 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+from .models import Appointment, AppointmentService, Appointment_TimeSlot, Barber, Schedule
+
+'''
+Named loader options for the relationships a response walks.
+Pass one to a select with `.options(*PROFILE)`; anything not listed raises when touched.
+'''
+
+# Barber.to_response_schema
+BARBER_WITH_USER = (
+    joinedload(Barber.user),
+)
+
+# Schedule.to_response_schema
+SCHEDULE_WITH_SLOTS = (
+    joinedload(Schedule.barber).joinedload(Barber.user),
+    selectinload(Schedule.time_slots),
+    selectinload(Schedule.intervals),
+)
+
+# Appointment.to_response_schema
+APPOINTMENT_CARD = (
+    joinedload(Appointment.user),
+    joinedload(Appointment.barber).joinedload(Barber.user),
+    selectinload(Appointment.appointment_time_slots).joinedload(Appointment_TimeSlot.time_slot),
+    selectinload(Appointment.appointment_services).joinedload(AppointmentService.service),
+)
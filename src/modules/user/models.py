@@ -16,6 +16,8 @@ from sqlalchemy import (
     Enum,
     Text,
     Date,
+    JSON,
+    Index,
     UniqueConstraint
 )
 
@@ -28,7 +30,10 @@ from .user_schema import UserResponse
 from ..schedule_schema import ScheduleResponse, TimeSlotChildResponse
 from .service_schema import ServiceResponse
 from ..appointment_schema import AppointmentResponse
+from ..schedule_intervals import derive_slots
 
+# Relationships never load implicitly (lazy="raise"), operations pick what to load
+# with a profile from loader_profiles. Deletes rely on the database's ON DELETE CASCADE.
 class Base(DeclarativeBase):
     pass
 
@@ -39,13 +44,28 @@ class AppointmentStatus(enum.Enum):
     completed = 'completed'
     canceled = 'canceled'
 
+# Defining Enums to be used in the KeycloakOutbox table
+class OutboxStatus(enum.Enum):
+    pending = 'pending'
+    processing = 'processing'
+    done = 'done'
+    failed = 'failed'
+
+class KeycloakOperation(enum.Enum):
+    create_user = 'create_user'
+    update_user = 'update_user'
+    delete_user = 'delete_user'
+    assign_role = 'assign_role'
+    remove_role = 'remove_role'
+
 
 # User model
 class User(Base):
     __tablename__ = "user"
     
     user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    kc_id: Mapped[str] = mapped_column(String(50), primary_key=False)
+    # Filled in by the provisioning worker once the Keycloak user exists
+    kc_id: Mapped[str] = mapped_column(String(50), primary_key=False, nullable=True, unique=True, index=True)
     firstName: Mapped[str] = mapped_column(String(50), nullable=False)
     lastName: Mapped[str] = mapped_column(String(50), nullable=False)
     email: Mapped[str] = mapped_column(String(50), nullable=False, unique=True)
@@ -58,16 +78,16 @@ class User(Base):
     '''
 
     # User can have one Barber (One-to-One)
-    barber: Mapped["Barber"] = relationship(back_populates="user", uselist=False)
+    barber: Mapped["Barber"] = relationship(back_populates="user", uselist=False, lazy="raise", passive_deletes=True)
     
     # User can have many Appointments (One-to-Many)
-    appointments: Mapped[list["Appointment"]] = relationship(back_populates="user")
+    appointments: Mapped[list["Appointment"]] = relationship(back_populates="user", lazy="raise", passive_deletes=True)
     
     # User have send many Threads (One-To-Many)
-    sent_threads: Mapped[list["Thread"]] = relationship(foreign_keys="Thread.sendingUser", back_populates="sending_user")
+    sent_threads: Mapped[list["Thread"]] = relationship(foreign_keys="Thread.sendingUser", back_populates="sending_user", lazy="raise", passive_deletes=True)
 
     # User can receive many Threads (One-To-Many)
-    received_threads: Mapped[list["Thread"]] = relationship(foreign_keys="Thread.receivingUser", back_populates="receiving_user")
+    received_threads: Mapped[list["Thread"]] = relationship(foreign_keys="Thread.receivingUser", back_populates="receiving_user", lazy="raise", passive_deletes=True)
 
 
     def to_response_schema(self) -> UserResponse:
@@ -91,13 +111,13 @@ class Barber(Base):
     '''
 
     # Barber is linked to a single user (as specified by 'uselist = false' in User table above. One-to-One)
-    user: Mapped["User"] = relationship(back_populates="barber", lazy="selectin")
+    user: Mapped["User"] = relationship(back_populates="barber", lazy="raise")
 
     # Barber can have multiple Appointments (One-to-Many)
-    appointments: Mapped[list["Appointment"]] = relationship(back_populates="barber")
+    appointments: Mapped[list["Appointment"]] = relationship(back_populates="barber", lazy="raise", passive_deletes=True)
 
     # A Barber can have multiple Schedules (One-to-Many)
-    schedules: Mapped[list["Schedule"]] = relationship(back_populates="barber")
+    schedules: Mapped[list["Schedule"]] = relationship(back_populates="barber", lazy="raise", passive_deletes=True)
 
     def to_response_schema(self) -> BarberResponse:
         return BarberResponse(
@@ -120,22 +140,31 @@ class Appointment(Base):
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.user_id", ondelete="CASCADE"), nullable=False)
     barber_id: Mapped[int] = mapped_column(Integer, ForeignKey("barber.barber_id", ondelete="CASCADE"), nullable=False)
     status: Mapped[AppointmentStatus] = mapped_column(Enum(AppointmentStatus), nullable=False)
+    # When the appointment was booked, unknown for appointments booked before it was recorded
+    created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True, default=func.current_timestamp())
+
+    # Listings are paged per client and per barber in (appointment_date, appointment_id) order,
+    # InnoDB appends the primary key to secondary indexes
+    __table_args__ = (
+        Index("ix_appointment_user_date", "user_id", "appointment_date"),
+        Index("ix_appointment_barber_date", "barber_id", "appointment_date"),
+    )
     
     '''
     Appointment class relationships
     '''
 
     # Each appointment is linked to one User (who booked it) - (Many-to-One)
-    user: Mapped["User"] = relationship(back_populates="appointments", lazy="selectin")
+    user: Mapped["User"] = relationship(back_populates="appointments", lazy="raise")
 
     # Each appointment is assigned to one Barber (Many-to-One)
-    barber: Mapped["Barber"] = relationship(back_populates="appointments", lazy="selectin")
+    barber: Mapped["Barber"] = relationship(back_populates="appointments", lazy="raise")
 
     # An Appointment can have multiple AppointmentService records ()
-    appointment_services: Mapped[list["AppointmentService"]] = relationship(back_populates="appointment", lazy="selectin", cascade="all, delete, delete-orphan")
+    appointment_services: Mapped[list["AppointmentService"]] = relationship(back_populates="appointment", cascade="all, delete, delete-orphan", lazy="raise", passive_deletes=True)
 
      # Relationship to Appointment_TimeSlot (creates Many-to-Many with TimeSlot)
-    appointment_time_slots: Mapped[list["Appointment_TimeSlot"]] = relationship("Appointment_TimeSlot", back_populates="appointment", lazy="selectin", cascade="all, delete, delete-orphan")
+    appointment_time_slots: Mapped[list["Appointment_TimeSlot"]] = relationship("Appointment_TimeSlot", back_populates="appointment", cascade="all, delete, delete-orphan", lazy="raise", passive_deletes=True)
 
     def to_response_schema(self) -> AppointmentResponse:
         return AppointmentResponse(
@@ -168,7 +197,7 @@ class Service(Base):
     '''
 
     # A service can be linked to multiple AppointmentService records (One-to-Many)
-    appointment_services: Mapped[list["AppointmentService"]] = relationship(back_populates="service")
+    appointment_services: Mapped[list["AppointmentService"]] = relationship(back_populates="service", lazy="raise", passive_deletes=True)
 
     def to_response_schema(self) -> ServiceResponse:
         return ServiceResponse(
@@ -192,10 +221,10 @@ class AppointmentService(Base):
     '''
 
     # Each AppointmentService is linked to one Appointment
-    service: Mapped["Service"] = relationship(back_populates="appointment_services", lazy="selectin")
+    service: Mapped["Service"] = relationship(back_populates="appointment_services", lazy="raise")
 
     # Each AppointmentService is linked to one Service
-    appointment: Mapped["Appointment"] = relationship(back_populates="appointment_services")
+    appointment: Mapped["Appointment"] = relationship(back_populates="appointment_services", lazy="raise")
 
 
 class Schedule(Base):
@@ -213,10 +242,19 @@ class Schedule(Base):
     Schedule class relationships
     '''
     # Each schedule is assigned to a single Barber (Many-to-One)
-    barber: Mapped["Barber"] = relationship(back_populates="schedules", lazy="selectin")
+    barber: Mapped["Barber"] = relationship(back_populates="schedules", lazy="raise")
 
     # Each schedule links to multiple time slots (One-to-Many)
-    time_slots: Mapped[list["TimeSlot"]] = relationship("TimeSlot", back_populates="schedule", cascade="all, delete, delete-orphan", lazy="selectin")
+    time_slots: Mapped[list["TimeSlot"]] = relationship("TimeSlot", back_populates="schedule", cascade="all, delete, delete-orphan", lazy="raise", passive_deletes=True)
+
+    # A schedule stored as intervals has its working windows here (One-to-Many)
+    intervals: Mapped[list["ScheduleInterval"]] = relationship("ScheduleInterval", back_populates="schedule", cascade="all, delete, delete-orphan", lazy="raise", passive_deletes=True)
+
+    # The schedule's slots, with the ones derived from its intervals
+    def all_time_slots(self) -> list:
+        if not self.intervals:
+            return list(self.time_slots)
+        return derive_slots(self.schedule_id, self.intervals, self.time_slots)
 
     def to_response_schema(self) -> ScheduleResponse:
         return ScheduleResponse(
@@ -225,11 +263,45 @@ class Schedule(Base):
             is_working=self.is_working,
             schedule_id=self.schedule_id,
             time_slots=[
-                time_slot.to_response_schema() for time_slot in self.time_slots
+                TimeSlotChildResponse.model_validate(time_slot) for time_slot in self.all_time_slots()
             ],
             barber=self.barber.to_response_schema()
         )
 
+class ScheduleTemplate(Base):
+    __tablename__ = "schedule_template"
+
+    template_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    barber_id: Mapped[int] = mapped_column(ForeignKey("barber.barber_id", ondelete="CASCADE"), nullable=False)
+    # 0 is Monday, as in date.weekday()
+    weekday: Mapped[int] = mapped_column(Integer, nullable=False)
+    start_time: Mapped[Time] = mapped_column(Time, nullable=False)
+    end_time: Mapped[Time] = mapped_column(Time, nullable=False)
+    slot_minutes: Mapped[int] = mapped_column(Integer, nullable=False, default=30)
+
+    # A barber's weekly working hours, one row per working window of a weekday
+    __table_args__ = (UniqueConstraint("barber_id", "weekday", "start_time", name="uq_template_window"),)
+
+
+class ScheduleInterval(Base):
+    __tablename__ = "schedule_interval"
+
+    interval_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    schedule_id: Mapped[int] = mapped_column(ForeignKey("schedule.schedule_id", ondelete="CASCADE"), nullable=False)
+    start_time: Mapped[Time] = mapped_column(Time, nullable=False)
+    end_time: Mapped[Time] = mapped_column(Time, nullable=False)
+    slot_minutes: Mapped[int] = mapped_column(Integer, nullable=False, default=30)
+
+    # A working window of a schedule stored as intervals, split into slots of slot_minutes
+    __table_args__ = (UniqueConstraint("schedule_id", "start_time", name="uq_schedule_interval"),)
+
+    '''
+    ScheduleInterval class relationships
+    '''
+    # Multiple intervals link to one schedule (Many-to-One)
+    schedule: Mapped["Schedule"] = relationship("Schedule", back_populates="intervals", lazy="raise")
+
+
 class TimeSlot(Base):
     __tablename__ = "time_slots"
 
@@ -246,10 +318,10 @@ class TimeSlot(Base):
     TimeSlot class relationships
     '''
     #Multiple time slots link to one schedule (Many-to-One)
-    schedule: Mapped["Schedule"] = relationship("Schedule", back_populates="time_slots", lazy="selectin")
+    schedule: Mapped["Schedule"] = relationship("Schedule", back_populates="time_slots", lazy="raise")
 
     #Relationship to Appointment_TimeSlot (creates Many-to-Many with appointment)
-    appointment_time_slots: Mapped[list["Appointment_TimeSlot"]] = relationship("Appointment_TimeSlot", back_populates="time_slot", cascade="all, delete, delete-orphan", lazy="selectin")
+    appointment_time_slots: Mapped[list["Appointment_TimeSlot"]] = relationship("Appointment_TimeSlot", back_populates="time_slot", cascade="all, delete, delete-orphan", lazy="raise", passive_deletes=True)
     
     def to_response_schema(self) -> TimeSlotChildResponse:
         return TimeSlotChildResponse(
@@ -265,15 +337,20 @@ class Appointment_TimeSlot(Base):
 
     slot_id: Mapped[int] = mapped_column(Integer, ForeignKey("time_slots.slot_id", ondelete="CASCADE"), primary_key=True)
     appointment_id: Mapped[int] = mapped_column(Integer, ForeignKey("appointment.appointment_id", ondelete="CASCADE"), primary_key=True)
+    # Equal to slot_id while the appointment holds the slot and NULL once it is released,
+    # so the unique constraint allows at most one active booking per slot
+    active_slot_id: Mapped[int] = mapped_column(Integer, nullable=True)
+
+    __table_args__ = (UniqueConstraint("active_slot_id", name="uq_active_slot"),)
 
     '''
     Appointment_TimeSlot class relationships
     '''
     # Each Appointment_TimeSlot is linked to one TimeSlot
-    time_slot: Mapped["TimeSlot"] = relationship(back_populates="appointment_time_slots", lazy="selectin")
+    time_slot: Mapped["TimeSlot"] = relationship(back_populates="appointment_time_slots", lazy="raise")
 
     # Each Appointment_TimeSlot is linked to one TimeSlot
-    appointment: Mapped["Appointment"] = relationship(back_populates="appointment_time_slots")
+    appointment: Mapped["Appointment"] = relationship(back_populates="appointment_time_slots", lazy="raise")
 
     
 
@@ -289,13 +366,13 @@ class Thread(Base):
     Thread class relationships
     '''
     # Each thread has one recieving User (Many-to-One)
-    receiving_user: Mapped["User"] = relationship(foreign_keys=[receivingUser], back_populates="received_threads")
+    receiving_user: Mapped["User"] = relationship(foreign_keys=[receivingUser], back_populates="received_threads", lazy="raise")
 
     # Each thread has one sender (Many-to-One)
-    sending_user: Mapped["User"] = relationship(foreign_keys=[sendingUser], back_populates="sent_threads")
+    sending_user: Mapped["User"] = relationship(foreign_keys=[sendingUser], back_populates="sent_threads", lazy="raise")
 
     # A thread can have multiple messages (One-To-Many)
-    messages: Mapped[list["Message"]] = relationship(back_populates="thread")
+    messages: Mapped[list["Message"]] = relationship(back_populates="thread", lazy="raise", passive_deletes=True)
 
 class Message(Base):
     __tablename__ = "message"
@@ -312,7 +389,46 @@ class Message(Base):
     timeStamp: Mapped[DateTime] = mapped_column(DateTime, default=func.current_timestamp())
     
     # Each message belongs to one thread (Many-To-One)
-    thread: Mapped["Thread"] = relationship(back_populates="messages")
+    thread: Mapped["Thread"] = relationship(back_populates="messages", lazy="raise")
 
     # Each message belongs to one user
-    sender: Mapped["User"] = relationship(foreign_keys=[sender_id])
+    sender: Mapped["User"] = relationship(foreign_keys=[sender_id], lazy="raise")
+
+
+# Pending Keycloak changes, written in the same transaction as the User change they mirror
+class KeycloakOutbox(Base):
+    __tablename__ = "keycloak_outbox"
+
+    outbox_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Not a foreign key, delete entries must outlive the user row
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    operation: Mapped[KeycloakOperation] = mapped_column(Enum(KeycloakOperation), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=True)
+    status: Mapped[OutboxStatus] = mapped_column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.pending)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False, default=func.current_timestamp())
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, default=func.current_timestamp())
+
+    __table_args__ = (
+        Index("ix_keycloak_outbox_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_keycloak_outbox_user", "user_id", "outbox_id"),
+    )
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+
+    notification_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    recipient: Mapped[str] = mapped_column(String(255), nullable=False)
+    subject: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Rendered when the entry is queued, so delivery does not depend on later changes
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[OutboxStatus] = mapped_column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.pending)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False, default=func.current_timestamp())
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, default=func.current_timestamp())
+
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+from enum import Enum
+
+'''
+Pydantic validation models for the Keycloak provisioning status endpoint
+'''
+
+class ProvisioningStatus(str, Enum):
+    pending = "pending"
+    processing = "processing"
+    done = "done"
+    failed = "failed"
+
+class ProvisioningOperation(str, Enum):
+    create_user = "create_user"
+    update_user = "update_user"
+    delete_user = "delete_user"
+    assign_role = "assign_role"
+    remove_role = "remove_role"
+
+class ProvisioningStatusResponse(BaseModel):
+    outbox_id: int
+    user_id: int
+    operation: ProvisioningOperation
+    status: ProvisioningStatus
+    attempts: int
+    last_error: Optional[str] = None
+    next_attempt_at: datetime
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,26 +1,48 @@
-from datetime import datetime
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
 
-from sqlalchemy import delete, or_
+from sqlalchemy import and_, delete, or_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import aliased
 from modules.user.models import (
     Appointment,
+    AppointmentStatus,
     User,
     Barber,
     TimeSlot,
+    Schedule,
+    ScheduleInterval,
     Appointment_TimeSlot,
     AppointmentService,
     Service,
 )
+from modules.user.loader_profiles import APPOINTMENT_CARD, BARBER_WITH_USER
+from operations.appointment_read_operations import AppointmentReadOperations
 from operations.barber_operations import BarberOperations
-from typing import List, Optional
+from operations.schedule_interval_operations import ScheduleIntervalOperations
+from typing import List, NamedTuple, Optional
 from fastapi import HTTPException
-from modules.appointment_schema import AppointmentCreate, AppointmentResponse
+from modules.appointment_schema import (
+    AppointmentBatchCreate,
+    AppointmentBatchItemResult,
+    AppointmentBatchResponse,
+    AppointmentCreate,
+    AppointmentRecurrence,
+    AppointmentResponse,
+    AppointmentUpdate,
+)
+from modules.time_slot_schema import TimeSlotChildResponse
+from core.pagination import decode_cursor, encode_cursor
 import logging
 from modules.email.email_operations import email_operations
 from modules.email.email_service import EmailService
+from operations.notification_operations import NotificationOperations
+from modules.availability.availability_index import availability_index
+from modules.schedule_cache import invalidate_schedules
+from modules.schedule_intervals import derive_slots
+from workers.notification_worker import notification_worker
 
 logger = logging.getLogger("appointment_operations")
 logger.setLevel(logging.ERROR)
@@ -29,6 +51,24 @@ logger.setLevel(logging.ERROR)
 CRUD operations for interacting with the appointment database table
 """
 
+# Most appointments a single batch request may book
+MAX_BATCH_SIZE = 52
+
+
+# Name and email of an email recipient
+class Contact(NamedTuple):
+    firstName: str
+    lastName: str
+    email: str
+
+
+# What a cancellation released, for updating the in-process caches once it is committed
+class ReleasedSlots(NamedTuple):
+    barber_id: int
+    appointment_date: Optional[date]
+    slot_ids: List[int]
+    schedule_ids: set
+
 
 class AppointmentOperations:
     def __init__(self, db: AsyncSession):
@@ -39,198 +79,466 @@ class AppointmentOperations:
         self, appointment_data: AppointmentCreate
     ) -> AppointmentResponse:
         try:
+            appointment_id = await self._book_appointment(appointment_data)
+            # Confirmation emails were queued with the booking
+            notification_worker.wake()
 
-            # check if user_id exists in user table
-            user_result = await self.db.execute(
-                select(User).filter(User.user_id == appointment_data.user_id)
+            # Load the booked appointment for the response
+            return await AppointmentReadOperations(self.db).get_appointment(appointment_id)
+
+        except SQLAlchemyError as e:
+            logger.error(e)
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred during appointment creation",
             )
-            user = user_result.scalars().first()
 
-            if not user:
-                raise HTTPException(
-                    status_code=400, detail="Invalid user_id: User does not exist"
-                )
+    # Reserve the requested slots and create the appointment in a single transaction
+    async def _book_appointment(self, appointment_data: AppointmentCreate) -> int:
+        '''
+        Every slot and service is validated with one set-based query each. The slots are
+        then claimed with a conditional UPDATE that only matches slots which are still free,
+        so when concurrent requests race for a slot exactly one of them updates it and the
+        others get a 409. The uq_active_slot constraint on the link table backs this up at
+        the database level. Nothing is committed unless the whole booking succeeds, and the
+        confirmation emails are queued in the same transaction. Slots derived from a
+        schedule's intervals get their row in the same transaction as well.
+        '''
+        slot_ids = list(dict.fromkeys(appointment_data.time_slot))
+        service_ids = list(dict.fromkeys(appointment_data.service_id))
+        if not slot_ids:
+            raise HTTPException(status_code=400, detail="At least one time slot is required")
+
+        client, barber = await self._get_contacts(appointment_data.user_id, appointment_data.barber_id)
+        materialized = await ScheduleIntervalOperations(self.db).materialize_slots(slot_ids)
+        slot_ids = list(dict.fromkeys(materialized.get(slot_id, slot_id) for slot_id in slot_ids))
+        slots_by_id = await self._get_slots(slot_ids)
+        problem = self._check_slots(slot_ids, slots_by_id, appointment_data.barber_id)
+        if problem:
+            raise HTTPException(status_code=problem[0], detail=problem[1])
+        service_names = await self._get_service_names(service_ids)
 
-            # check if barber_id exists in the Barber table
-            barber_result = await self.db.execute(
-                select(Barber).filter(Barber.barber_id == appointment_data.barber_id)
+        try:
+            slots = [slots_by_id[slot_id] for slot_id in slot_ids]
+            appointment_id = await self._reserve(
+                appointment_data.user_id,
+                appointment_data.barber_id,
+                appointment_data.status,
+                slots,
+                service_ids,
             )
-            barber = barber_result.scalars().first()
-
-            if not barber:
+            self._queue_emails(
+                "booking",
+                client,
+                barber,
+                ", ".join(service_names[service_id] for service_id in service_ids),
+                slots[0].date,
+                min(slot.start_time for slot in slots),
+            )
+            await self.db.commit()
+            self._index_booking(appointment_data.barber_id, slots[0].date, slot_ids, bool(materialized))
+            invalidate_schedules(slots[0].schedule_id)
+            return appointment_id
+        except HTTPException:
+            await self.db.rollback()
+            raise
+        except IntegrityError as e:
+            await self.db.rollback()
+            logger.error(e)
+            raise HTTPException(status_code=409, detail="Time slot is no longer available")
+
+    # Book several appointments for one client and barber in a single transaction
+    async def create_appointments(self, batch: AppointmentBatchCreate) -> AppointmentBatchResponse:
+        '''
+        The appointments come either as explicit slot lists or from a recurrence rule. All
+        slots are validated in one pass and reserved in one transaction. With all_or_nothing
+        any failure rolls the whole batch back; otherwise each appointment is booked in its
+        own savepoint and the ones that can't be booked are reported. The client and the
+        barber get one summary email for everything that was booked.
+        '''
+        try:
+            if (batch.items is None) == (batch.recurrence is None):
+                raise HTTPException(status_code=400, detail="Provide either items or a recurrence rule")
+            size = len(batch.items) if batch.items is not None else batch.recurrence.occurrences
+            if not 1 <= size <= MAX_BATCH_SIZE:
                 raise HTTPException(
-                    status_code=400, detail="Invalid barber_id: Barber does not exist"
+                    status_code=400, detail=f"A batch must contain between 1 and {MAX_BATCH_SIZE} appointments"
                 )
 
-            # check if slot_id(s) exists in the time_slot table
-            appointment_date: str
-            for slot_id in appointment_data.time_slot:
-                time_slot_result = await self.db.execute(
-                    select(TimeSlot).filter(TimeSlot.slot_id == slot_id)
-                )
-                time_slot = time_slot_result.scalars().first()
-
-                if not time_slot:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Invalid slot_id: Time slot does not exist",
-                    )
+            client, barber = await self._get_contacts(batch.user_id, batch.barber_id)
 
-                appointment_date = time_slot.schedule.date
+            # Resolve every appointment to its slots
+            if batch.recurrence is not None:
+                requests = await self._resolve_recurrence(batch.barber_id, batch.recurrence)
+                service_id_lists = [batch.service_id] * len(requests)
+            else:
+                requests = [(None, list(dict.fromkeys(item.time_slot))) for item in batch.items]
+                service_id_lists = [item.service_id or batch.service_id for item in batch.items]
+            service_id_lists = [list(dict.fromkeys(service_ids)) for service_ids in service_id_lists]
 
-            # create new appointment if both exist
-            new_appointment = Appointment(
-                user_id=appointment_data.user_id,
-                appointment_date=appointment_date,
-                barber_id=appointment_data.barber_id,
-                status=appointment_data.status,
+            service_names = await self._get_service_names(
+                list({service_id for service_ids in service_id_lists for service_id in service_ids})
             )
-            self.db.add(new_appointment)
-            await self.db.commit()
-            await self.db.refresh(new_appointment)
-
-            # Update the appointment_time_slot table with the newly associated appointment_id and slot_id(s)
-            for slot_id in appointment_data.time_slot:
-                new_appointment_time_slot = Appointment_TimeSlot(
-                    appointment_id=new_appointment.appointment_id, slot_id=slot_id
-                )
-                self.db.add(new_appointment_time_slot)
-
-            # Update the is_available field in TimeSlot table for the selected slot_id(s)
-            await self.db.execute(
-                TimeSlot.__table__.update()
-                .where(TimeSlot.slot_id.in_(appointment_data.time_slot))
-                .values(is_booked=True)
+            materialized = await ScheduleIntervalOperations(self.db).materialize_slots(
+                list({slot_id for _, slot_ids in requests for slot_id in slot_ids})
             )
-
-            # Update the service table with the newly associated appointment_id and service_id(s)
-            for service_id in appointment_data.service_id:
-                new_appointment_service = AppointmentService(
-                    service_id=service_id, appointment_id=new_appointment.appointment_id
-                )
-                self.db.add(new_appointment_service)
-            await self.db.commit()
-
-            await self.db.refresh(new_appointment)
-
-            # Refresh appointment again to ensure the session is aware of its latest state
-            result = await self.db.execute(
-                select(Appointment).filter(
-                    Appointment.appointment_id == new_appointment.appointment_id
-                ).options(
-                    selectinload(Appointment.appointment_time_slots),
-                    selectinload(Appointment.appointment_services),
-                    selectinload(Appointment.user),
-                    selectinload(Appointment.barber),
-                )
+            requests = [
+                (appointment_date, list(dict.fromkeys(materialized.get(slot_id, slot_id) for slot_id in slot_ids)))
+                for appointment_date, slot_ids in requests
+            ]
+            slots_by_id = await self._get_slots(
+                list({slot_id for _, slot_ids in requests for slot_id in slot_ids})
             )
-            appt = result.scalars().first()
 
-            if not appt:
-                return None
-            
-             # Send out booking confirmation emails
-            try:
-                # Retrieve all necessary information from DB for crafting custom emails based on specific appointment
-                booking_user_result = await self.db.execute(select(User).filter(User.user_id == appt.user_id))
-                booking_user = booking_user_result.scalars().first()
-
-                barber_result = await self.db.execute(select(Barber).filter(Barber.barber_id == appt.barber_id))
-                barber = barber_result.scalars().first()
-
-                barber_information_result = await self.db.execute(select(User).filter(User.user_id == barber.user_id))
-                barber_information = barber_information_result.scalars().first()
-
-                service_information_result = await self.db.execute(select(Service).filter(Service.service_id == appointment_data.service_id))
-                service_information = service_information_result.scalars().first()
-                
-                slots = []
-                for slot_id in appointment_data.time_slot:
-                    time_slot_result = await self.db.execute(select(TimeSlot).filter(TimeSlot.slot_id == slot_id))
-                    time_slot = time_slot_result.scalars().first()
-                    if time_slot:
-                        slots.append(time_slot)
-
-                first_slot = min(slots, key=lambda slot: slot.start_time) if slots else None
-
-                if first_slot:
-                    appointment_time = first_slot.start_time.strftime('%I:%M %p')
-                    appointment_date = first_slot.schedule.date.strftime('%B %d, %Y')
-
-                # Send email to the client
-                await email_operations.send_email(
-                    f"{booking_user.email}",
-                    "Barber shop appointment scheduled successfully!",
-                    f"""
-                    {booking_user.firstName},
-                    your appointment for a {service_information.name} with {barber_information.firstName} {barber_information.lastName} 
-                    was successfully scheduled for {appointment_time} on {appointment_date}.
-                    """
+            results = []
+            claimed_slot_ids = set()
+            for index, (appointment_date, slot_ids) in enumerate(requests):
+                result = AppointmentBatchItemResult(
+                    index=index,
+                    appointment_date=appointment_date.strftime("%Y-%m-%d") if appointment_date else None,
+                    time_slot=slot_ids,
                 )
-
-                # Send email to the barber
-                await email_operations.send_email(
-                    f"{barber_information.email}",
-                    "A client has scheduled an appointment",
-                    f"""
-                    {barber_information.firstName},
-                    {booking_user.firstName} {booking_user.lastName} has scheduled a {service_information.name} with
-                    you at {appointment_time} on {appointment_date}.        
-                    """
+                if not slot_ids:
+                    result.error = "No free time slots cover the requested time"
+                elif not service_id_lists[index]:
+                    result.error = "At least one service is required"
+                elif claimed_slot_ids.intersection(slot_ids):
+                    result.error = "Time slot is requested more than once in the batch"
+                else:
+                    problem = self._check_slots(slot_ids, slots_by_id, batch.barber_id)
+                    if problem:
+                        result.error = problem[1]
+                    else:
+                        result.appointment_date = slots_by_id[slot_ids[0]].date.strftime("%Y-%m-%d")
+                    claimed_slot_ids.update(slot_ids)
+                results.append(result)
+
+            if not batch.all_or_nothing or not any(result.error for result in results):
+                for result, service_ids in zip(results, service_id_lists):
+                    if result.error:
+                        continue
+                    try:
+                        # Savepoints let the rest of the batch survive a failed appointment
+                        async with (nullcontext() if batch.all_or_nothing else self.db.begin_nested()):
+                            result.appointment_id = await self._reserve(
+                                batch.user_id,
+                                batch.barber_id,
+                                batch.status,
+                                [slots_by_id[slot_id] for slot_id in result.time_slot],
+                                service_ids,
+                            )
+                            await self.db.flush()
+                    except HTTPException as e:
+                        result.error = e.detail
+                    except IntegrityError as e:
+                        logger.error(e)
+                        result.error = "Time slot is no longer available"
+                    if result.error and batch.all_or_nothing:
+                        break
+
+            booked = [result for result in results if result.appointment_id is not None]
+            if batch.all_or_nothing and len(booked) != len(results):
+                await self.db.rollback()
+                for result in results:
+                    result.appointment_id = None
+                    result.error = result.error or "Not booked because another appointment in the batch failed"
+                booked = []
+
+            if booked:
+                appointments = sorted(
+                    (
+                        slots_by_id[result.time_slot[0]].date,
+                        min(slots_by_id[slot_id].start_time for slot_id in result.time_slot),
+                    )
+                    for result in booked
                 )
-            
-            # Log if there is an issue sending confirmation emails, but appointment will still be created
-            except Exception as e:
-                logger.error(f"An error occurred while sending confirmation emails: {e}")
-
+                self._queue_summary_emails(
+                    client,
+                    barber,
+                    ", ".join(
+                        sorted({service_names[service_id] for result in booked for service_id in service_id_lists[result.index]})
+                    ),
+                    appointments,
+                )
+                await self.db.commit()
+                for result in booked:
+                    self._index_booking(
+                        batch.barber_id, slots_by_id[result.time_slot[0]].date, result.time_slot, bool(materialized)
+                    )
+                    invalidate_schedules(slots_by_id[result.time_slot[0]].schedule_id)
+                notification_worker.wake()
 
-            return appt.to_response_schema()
+            return AppointmentBatchResponse(
+                booked=len(booked), failed=len(results) - len(booked), results=results
+            )
 
         except SQLAlchemyError as e:
+            await self.db.rollback()
             logger.error(e)
             raise HTTPException(
                 status_code=500,
                 detail="An unexpected error occurred during appointment creation",
             )
 
+    # Find the slots covering the rule's time window on every date of the recurrence
+    async def _resolve_recurrence(
+        self, barber_id: int, recurrence: AppointmentRecurrence
+    ) -> List[tuple[date, List[int]]]:
+        if recurrence.interval_days < 1:
+            raise HTTPException(status_code=400, detail="interval_days must be at least 1")
+        if recurrence.end_time <= recurrence.start_time:
+            raise HTTPException(status_code=400, detail="end_time must be after start_time")
+
+        dates = [
+            recurrence.start_date + timedelta(days=recurrence.interval_days * occurrence)
+            for occurrence in range(recurrence.occurrences)
+        ]
+        result = await self.db.execute(
+            select(TimeSlot.slot_id, TimeSlot.start_time, TimeSlot.end_time, Schedule.date)
+            .join(Schedule, Schedule.schedule_id == TimeSlot.schedule_id)
+            .filter(
+                Schedule.barber_id == barber_id,
+                Schedule.date.in_(dates),
+                TimeSlot.start_time >= recurrence.start_time,
+                TimeSlot.end_time <= recurrence.end_time,
+            )
+            .order_by(Schedule.date, TimeSlot.start_time)
+        )
+        slots_by_date = {}
+        for slot in result.all():
+            slots_by_date.setdefault(slot.date, []).append(slot)
+
+        # Schedules stored as intervals add their derived slots
+        interval_result = await self.db.execute(
+            select(
+                ScheduleInterval.schedule_id,
+                ScheduleInterval.start_time,
+                ScheduleInterval.end_time,
+                ScheduleInterval.slot_minutes,
+                Schedule.date,
+            )
+            .join(Schedule, Schedule.schedule_id == ScheduleInterval.schedule_id)
+            .filter(Schedule.barber_id == barber_id, Schedule.date.in_(dates))
+        )
+        intervals_by_date = {}
+        for interval in interval_result.all():
+            intervals_by_date.setdefault(interval.date, []).append(interval)
+        for appointment_date, intervals in intervals_by_date.items():
+            slots_by_date[appointment_date] = [
+                slot
+                for slot in derive_slots(intervals[0].schedule_id, intervals, slots_by_date.get(appointment_date, []))
+                if slot.start_time >= recurrence.start_time and slot.end_time <= recurrence.end_time
+            ]
+
+        requests = []
+        for appointment_date in dates:
+            # The slots must run back to back from start_time to end_time
+            slot_ids = []
+            reached = recurrence.start_time
+            for slot in slots_by_date.get(appointment_date, []):
+                if slot.start_time == reached:
+                    slot_ids.append(slot.slot_id)
+                    reached = slot.end_time
+            requests.append((appointment_date, slot_ids if reached == recurrence.end_time else []))
+        return requests
+
+    # Get the names and emails of the client and the barber, checking that both exist
+    async def _get_contacts(self, user_id: int, barber_id: int):
+        client_result = await self.db.execute(
+            select(User.firstName, User.lastName, User.email).filter(User.user_id == user_id)
+        )
+        client = client_result.first()
+        if not client:
+            raise HTTPException(status_code=400, detail="Invalid user_id: User does not exist")
+
+        barber_result = await self.db.execute(
+            select(User.firstName, User.lastName, User.email)
+            .join(Barber, Barber.user_id == User.user_id)
+            .filter(Barber.barber_id == barber_id)
+        )
+        barber = barber_result.first()
+        if not barber:
+            raise HTTPException(status_code=400, detail="Invalid barber_id: Barber does not exist")
+        return client, barber
+
+    # Get the requested slots with their schedule's barber and date, keyed by slot_id
+    async def _get_slots(self, slot_ids: List[int]) -> dict:
+        if not slot_ids:
+            return {}
+        result = await self.db.execute(
+            select(
+                TimeSlot.slot_id,
+                TimeSlot.schedule_id,
+                TimeSlot.start_time,
+                TimeSlot.end_time,
+                TimeSlot.is_available,
+                TimeSlot.is_booked,
+                Schedule.barber_id,
+                Schedule.date,
+            )
+            .join(Schedule, Schedule.schedule_id == TimeSlot.schedule_id)
+            .filter(TimeSlot.slot_id.in_(slot_ids))
+        )
+        return {slot.slot_id: slot for slot in result.all()}
+
+    # Check that every slot exists, belongs to the barber, falls on the same day and is free
+    def _check_slots(
+        self, slot_ids: List[int], slots_by_id: dict, barber_id: int, held_slot_ids: frozenset = frozenset()
+    ) -> Optional[tuple[int, str]]:
+        '''
+        Slots in `held_slot_ids` already belong to the appointment being checked and don't
+        need to be free.
+        '''
+        slots = [slots_by_id.get(slot_id) for slot_id in slot_ids]
+        if any(slot is None for slot in slots):
+            return 400, "Invalid slot_id: Time slot does not exist"
+        if any(slot.barber_id != barber_id for slot in slots):
+            return 400, "Invalid slot_id: Time slot does not belong to the barber"
+        if len({slot.date for slot in slots}) != 1:
+            return 400, "Invalid slot_id: Time slots must be on the same day"
+        if any(
+            (slot.is_booked or not slot.is_available) and slot.slot_id not in held_slot_ids
+            for slot in slots
+        ):
+            return 409, "Time slot is no longer available"
+        return None
+
+    # Mark booked slots in the availability index
+    def _index_booking(self, barber_id: int, day: date, slot_ids: List[int], materialized: bool):
+        if materialized:
+            # The day may be indexed under the derived ids of the slots that just got a row
+            availability_index.invalidate(barber_id, day)
+        else:
+            availability_index.set_free(barber_id, day, slot_ids, False)
+
+    # Get the names of the requested services, checking that they all exist
+    async def _get_service_names(self, service_ids: List[int]) -> dict:
+        service_result = await self.db.execute(
+            select(Service.service_id, Service.name).filter(Service.service_id.in_(service_ids))
+        )
+        service_names = {row.service_id: row.name for row in service_result.all()}
+        if len(service_names) != len(service_ids):
+            raise HTTPException(status_code=400, detail="Invalid service_id: Service does not exist")
+        return service_names
+
+    # Claim validated slots and add the appointment with its links, the caller commits
+    async def _reserve(self, user_id: int, barber_id: int, status, slots: list, service_ids: List[int]) -> int:
+        slot_ids = [slot.slot_id for slot in slots]
+
+        # Only the slots nobody booked in the meantime are updated
+        reserve_result = await self.db.execute(
+            update(TimeSlot)
+            .where(
+                TimeSlot.slot_id.in_(slot_ids),
+                TimeSlot.is_booked.is_(False),
+                TimeSlot.is_available.is_(True),
+            )
+            .values(is_booked=True)
+        )
+        if reserve_result.rowcount != len(slot_ids):
+            raise HTTPException(status_code=409, detail="Time slot is no longer available")
+
+        new_appointment = Appointment(
+            user_id=user_id,
+            appointment_date=slots[0].date,
+            barber_id=barber_id,
+            status=status,
+        )
+        self.db.add(new_appointment)
+        await self.db.flush()
+        appointment_id = new_appointment.appointment_id
+
+        self.db.add_all(
+            [
+                Appointment_TimeSlot(appointment_id=appointment_id, slot_id=slot_id, active_slot_id=slot_id)
+                for slot_id in slot_ids
+            ]
+            + [
+                AppointmentService(appointment_id=appointment_id, service_id=service_id)
+                for service_id in service_ids
+            ]
+        )
+        return appointment_id
+
+    # Queue the client and barber emails for a booking or a cancellation, the caller commits them
+    def _queue_emails(self, kind: str, client, barber, service_name: str, appointment_date, appointment_time):
+        email_service = EmailService(email_operations)
+        if kind == "booking":
+            client_email = email_service.render_client_booking_email
+            barber_email = email_service.render_barber_booking_email
+        else:
+            client_email = email_service.render_client_cancellation_email
+            barber_email = email_service.render_barber_cancellation_email
+
+        notification_ops = NotificationOperations(self.db)
+        for recipient, render in ((client.email, client_email), (barber.email, barber_email)):
+            subject, body = render(barber, client, service_name, appointment_date, appointment_time)
+            notification_ops.enqueue_email(recipient, subject, body)
+
+    # Queue one email each for the client and the barber listing every booked appointment
+    def _queue_summary_emails(self, client, barber, service_name: str, appointments: list):
+        email_service = EmailService(email_operations)
+        notification_ops = NotificationOperations(self.db)
+        for recipient, render in (
+            (client.email, email_service.render_client_booking_summary_email),
+            (barber.email, email_service.render_barber_booking_summary_email),
+        ):
+            subject, body = render(barber, client, service_name, appointments)
+            notification_ops.enqueue_email(recipient, subject, body)
+
     # Get all appointments
     async def get_all_appointments(
         self,
-        page: int,
         limit: int,
         is_barber: bool,
         user_id: Optional[int] = None,
+        barber_id: Optional[int] = None,
         is_upcoming: Optional[bool] = None,
         is_past: Optional[bool] = None,
-    ) -> List[AppointmentResponse]:
+        cursor: Optional[str] = None,
+        page: Optional[int] = None,
+    ) -> tuple[List[AppointmentResponse], Optional[str]]:
+        '''
+        Appointments ordered by (appointment_date, appointment_id), together with the cursor
+        of the next page or None on the last page. Pages continue after `cursor` when it is
+        given, otherwise `page` falls back to offset paging and neither returns the first page.
+        '''
         try:
-            # Calculate offset for SQL query
-            offset = (page - 1) * limit
-
-            stmt = select(Appointment)
+            read_ops = AppointmentReadOperations(self.db)
+            stmt = read_ops.select_cards()
             if is_barber:
-                barber_ops = BarberOperations(self.db)
-                barber = await barber_ops.get_barber_by_user_id(user_id)
-                stmt = stmt.filter(or_(Appointment.barber_id == barber.barber_id, Appointment.user_id == user_id))
+                # Only look the barber up when the caller's identity didn't already provide it
+                if barber_id is None:
+                    barber_ops = BarberOperations(self.db)
+                    barber = await barber_ops.get_barber_by_user_id(user_id)
+                    barber_id = barber.barber_id
+                stmt = stmt.filter(or_(Appointment.barber_id == barber_id, Appointment.user_id == user_id))
             else:
                 stmt = stmt.filter((Appointment.user_id == user_id))
             if is_upcoming:
                 stmt = stmt.filter(Appointment.appointment_date >= datetime.now())
             if is_past:
                 stmt = stmt.filter(Appointment.appointment_date < datetime.now())
-            stmt = stmt.offset(offset).limit(limit)
 
-            # Sort by appointment date
-            stmt = stmt.order_by(Appointment.appointment_date.asc())
+            if cursor:
+                after_date, after_id = decode_cursor(cursor, 2)
+                stmt = stmt.filter(self._after_key(after_date, after_id))
+            elif page:
+                stmt = stmt.offset((page - 1) * limit)
 
+            # Fetch one extra row to know whether there is a next page
+            stmt = stmt.order_by(
+                Appointment.appointment_date.asc(), Appointment.appointment_id.asc()
+            ).limit(limit + 1)
 
+            appointments = await read_ops.fetch_cards(stmt)
 
-            result = await self.db.execute(stmt)
-            appointments = result.scalars().all()
-
-            if not appointments:
-                return []
-            return [app.to_response_schema() for app in appointments]
+            next_cursor = None
+            if len(appointments) > limit:
+                appointments = appointments[:limit]
+                last = appointments[-1]
+                next_cursor = encode_cursor(last.appointment_date, last.appointment_id)
+            return [app.to_response_schema() for app in appointments], next_cursor
 
         except SQLAlchemyError as e:
             logger.error(e)
@@ -239,20 +547,31 @@ class AppointmentOperations:
                 detail="An unexpected error occurred while fetching appointments",
             )
 
+    # Filter for the rows that sort after the given (appointment_date, appointment_id) key
+    def _after_key(self, after_date: Optional[str], after_id: int):
+        try:
+            after_date = date.fromisoformat(after_date) if after_date is not None else None
+            after_id = int(after_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        # Appointments without a date sort first
+        if after_date is None:
+            return or_(
+                Appointment.appointment_date.is_not(None),
+                Appointment.appointment_id > after_id,
+            )
+        return or_(
+            Appointment.appointment_date > after_date,
+            and_(Appointment.appointment_date == after_date, Appointment.appointment_id > after_id),
+        )
+
     # Get a specific appointment by its id
     async def get_appointment_by_id(
         self, appointment_id: int
     ) -> Optional[AppointmentResponse]:
         # try:
-        result = await self.db.execute(
-            select(Appointment).filter(Appointment.appointment_id == appointment_id)
-        )
-        appt = result.scalars().first()
-
-        if not appt:
-            return None
-
-        return appt.to_response_schema()
+        return await AppointmentReadOperations(self.db).get_appointment(appointment_id)
 
         # except SQLAlchemyError:
         #     raise HTTPException(
@@ -262,149 +581,306 @@ class AppointmentOperations:
 
     # Update an existing appointment
     async def update_appointment(
-        self, appointment_id: int, appointment_data
+        self, appointment_id: int, appointment_data: AppointmentUpdate
     ) -> Optional[AppointmentResponse]:
+        '''
+        Only what changed is written. Slots and services are diffed against the current
+        links: added slots are reserved with the same conflict check as a booking, released
+        slots are freed, and only the added or removed link rows are touched. Setting the
+        status to canceled releases the slots like a cancellation, and a canceled appointment
+        can't get slots, a barber or another status again. The response is built from the
+        rows loaded for the update, before the commit expires them.
+        '''
         try:
             result = await self.db.execute(
-                select(Appointment).filter(Appointment.appointment_id == appointment_id)
+                select(Appointment)
+                .filter(Appointment.appointment_id == appointment_id)
+                .options(*APPOINTMENT_CARD)
             )
             appointment = result.scalars().first()
 
             if not appointment:
                 return None
 
-            # Update the appointment's info
-            update_data = appointment_data.dict(
-                exclude_unset=True, exclude={"time_slot", "service_id"}
-            )
-            for key, value in update_data.items():
-                setattr(appointment, key, value)
-
-            # update Appointment_TimeSlot table if it has new tim_slot info
-            if "time_slot" in appointment_data.dict(exclude_unset=True):
-                # Delete current associations for this appointment
-                await self.db.execute(
-                    delete(Appointment_TimeSlot).where(
-                        Appointment_TimeSlot.appointment_id == appointment_id
-                    )
-                )
-                # Add new associations
-                for slot_id in appointment_data.time_slot:
-                    new_link = Appointment_TimeSlot(
-                        appointment_id=appointment_id, slot_id=slot_id
-                    )
-                    self.db.add(new_link)
-
-            # update AppointmentService table if it has new service_id information
-            if "service_id" in appointment_data.dict(exclude_unset=True):
-                await self.db.execute(
-                    delete(AppointmentService).where(
-                        AppointmentService.appointment_id == appointment_id
+            update_data = appointment_data.dict(exclude_unset=True)
+            previous_barber_id, previous_date = appointment.barber_id, appointment.appointment_date
+            added_slot_ids, released_slot_ids = [], []
+            materialized = {}
+            released = None
+
+            # A canceled appointment no longer holds slots, so it can't be moved or reopened
+            new_status = AppointmentStatus(update_data["status"].value) if update_data.get("status") is not None else None
+            moves = update_data.get("time_slot") is not None or update_data.get("barber_id") not in (None, appointment.barber_id)
+            if appointment.status == AppointmentStatus.canceled:
+                if moves or new_status not in (None, AppointmentStatus.canceled):
+                    raise HTTPException(
+                        status_code=409, detail="A canceled appointment can't be rescheduled, book a new one instead"
                     )
+            canceling = new_status == AppointmentStatus.canceled and appointment.status != AppointmentStatus.canceled
+            if canceling and moves:
+                raise HTTPException(
+                    status_code=400, detail="Time slots and barber can't be changed while canceling an appointment"
                 )
-                for svc_id in appointment_data.service_id:
-                    new_service_link = AppointmentService(
-                        appointment_id=appointment_id, service_id=svc_id
-                    )
-                    self.db.add(new_service_link)
 
-            # Commit all changes
-            await self.db.commit()
-            await self.db.refresh(appointment)
-
-            # Retrieve the updated data for the response
-            time_slot_result = await self.db.execute(
-                select(Appointment_TimeSlot).where(
-                    Appointment_TimeSlot.appointment_id == appointment_id
+            # Switch the client or barber through the relationship so the response stays current
+            if update_data.get("user_id") not in (None, appointment.user_id):
+                user_result = await self.db.execute(select(User).filter(User.user_id == update_data["user_id"]))
+                user = user_result.scalars().first()
+                if not user:
+                    raise HTTPException(status_code=400, detail="Invalid user_id: User does not exist")
+                appointment.user = user
+            barber_changed = update_data.get("barber_id") not in (None, appointment.barber_id)
+            if barber_changed:
+                barber_result = await self.db.execute(
+                    select(Barber).filter(Barber.barber_id == update_data["barber_id"]).options(*BARBER_WITH_USER)
                 )
-            )
-            time_slot_links = time_slot_result.scalars().all()
-            time_slot_ids = [link.slot_id for link in time_slot_links]
-
-            service_result = await self.db.execute(
-                select(AppointmentService).where(
-                    AppointmentService.appointment_id == appointment_id
+                barber = barber_result.scalars().first()
+                if not barber:
+                    raise HTTPException(status_code=400, detail="Invalid barber_id: Barber does not exist")
+                appointment.barber = barber
+            # Canceling releases the slots below, like a cancellation does
+            if new_status is not None and not canceling:
+                appointment.status = new_status
+
+            # Slots must be re-checked against a new barber even when they stay the same. Only
+            # links that still hold their slot count, a canceled appointment keeps released ones
+            held_links = [link for link in appointment.appointment_time_slots if link.active_slot_id is not None]
+            current_slot_ids = [link.slot_id for link in held_links]
+            changed_schedule_ids = {link.time_slot.schedule_id for link in held_links}
+            time_slots = [link.time_slot.to_response_schema() for link in appointment.appointment_time_slots]
+            if update_data.get("time_slot") is not None or barber_changed:
+                new_slot_ids = list(dict.fromkeys(update_data.get("time_slot") or current_slot_ids))
+                if not new_slot_ids:
+                    raise HTTPException(status_code=400, detail="At least one time slot is required")
+                materialized = await ScheduleIntervalOperations(self.db).materialize_slots(new_slot_ids)
+                new_slot_ids = list(dict.fromkeys(materialized.get(slot_id, slot_id) for slot_id in new_slot_ids))
+                added_slot_ids = [slot_id for slot_id in new_slot_ids if slot_id not in current_slot_ids]
+                released_slot_ids = [slot_id for slot_id in current_slot_ids if slot_id not in new_slot_ids]
+
+                slots_by_id = await self._get_slots(new_slot_ids)
+                problem = self._check_slots(
+                    new_slot_ids, slots_by_id, appointment.barber.barber_id, frozenset(current_slot_ids)
                 )
-            )
-            service_links = service_result.scalars().all()
-            service_ids = [link.service_id for link in service_links]
+                if problem:
+                    raise HTTPException(status_code=problem[0], detail=problem[1])
+
+                if added_slot_ids:
+                    reserve_result = await self.db.execute(
+                        update(TimeSlot)
+                        .where(
+                            TimeSlot.slot_id.in_(added_slot_ids),
+                            TimeSlot.is_booked.is_(False),
+                            TimeSlot.is_available.is_(True),
+                        )
+                        .values(is_booked=True)
+                    )
+                    if reserve_result.rowcount != len(added_slot_ids):
+                        raise HTTPException(status_code=409, detail="Time slot is no longer available")
+                    self.db.add_all(
+                        [
+                            Appointment_TimeSlot(appointment_id=appointment_id, slot_id=slot_id, active_slot_id=slot_id)
+                            for slot_id in added_slot_ids
+                        ]
+                    )
+                if released_slot_ids:
+                    await self.db.execute(
+                        update(TimeSlot).where(TimeSlot.slot_id.in_(released_slot_ids)).values(is_booked=False)
+                    )
+                    await self.db.execute(
+                        delete(Appointment_TimeSlot).where(
+                            Appointment_TimeSlot.appointment_id == appointment_id,
+                            Appointment_TimeSlot.slot_id.in_(released_slot_ids),
+                        )
+                    )
 
-            # Return with updated data
-            return AppointmentResponse(
+                appointment.appointment_date = slots_by_id[new_slot_ids[0]].date
+                changed_schedule_ids.update(slots_by_id[slot_id].schedule_id for slot_id in new_slot_ids)
+                time_slots = [
+                    TimeSlotChildResponse.model_validate(slots_by_id[slot_id]).model_copy(update={"is_booked": True})
+                    for slot_id in new_slot_ids
+                ]
+
+            services = [link.service.to_response_schema() for link in appointment.appointment_services]
+            if update_data.get("service_id") is not None:
+                current_service_ids = [link.service_id for link in appointment.appointment_services]
+                new_service_ids = list(dict.fromkeys(update_data["service_id"]))
+                if not new_service_ids:
+                    raise HTTPException(status_code=400, detail="At least one service is required")
+                added_service_ids = [service_id for service_id in new_service_ids if service_id not in current_service_ids]
+                removed_service_ids = [service_id for service_id in current_service_ids if service_id not in new_service_ids]
+
+                services_by_id = {link.service_id: link.service for link in appointment.appointment_services}
+                if added_service_ids:
+                    service_result = await self.db.execute(
+                        select(Service).filter(Service.service_id.in_(added_service_ids))
+                    )
+                    services_by_id.update({service.service_id: service for service in service_result.scalars().all()})
+                    if len(services_by_id) < len(current_service_ids) + len(added_service_ids):
+                        raise HTTPException(status_code=400, detail="Invalid service_id: Service does not exist")
+                    self.db.add_all(
+                        [
+                            AppointmentService(appointment_id=appointment_id, service_id=service_id)
+                            for service_id in added_service_ids
+                        ]
+                    )
+                if removed_service_ids:
+                    await self.db.execute(
+                        delete(AppointmentService).where(
+                            AppointmentService.appointment_id == appointment_id,
+                            AppointmentService.service_id.in_(removed_service_ids),
+                        )
+                    )
+                services = [services_by_id[service_id].to_response_schema() for service_id in new_service_ids]
+
+            # Flush before building the response so a slot conflict surfaces here
+            await self.db.flush()
+            if canceling:
+                released = await self._release_appointment(appointment_id)
+                time_slots = [link.time_slot.to_response_schema() for link in appointment.appointment_time_slots]
+            response = AppointmentResponse(
                 appointment_id=appointment.appointment_id,
-                user_id=appointment.user_id,
-                barber_id=appointment.barber_id,
+                appointment_date=appointment.appointment_date.strftime("%Y-%m-%d") if appointment.appointment_date else None,
+                user=appointment.user.to_response_schema(),
+                barber=appointment.barber.to_response_schema(),
                 status=appointment.status,
-                time_slot=time_slot_ids,
-                service_id=service_ids,
+                time_slots=time_slots,
+                services=services,
             )
-
+            new_date = appointment.appointment_date
+            await self.db.commit()
+            availability_index.set_free(previous_barber_id, previous_date, released_slot_ids, True)
+            self._index_booking(response.barber.barber_id, new_date, added_slot_ids, bool(materialized))
+            if added_slot_ids or released_slot_ids:
+                invalidate_schedules(*changed_schedule_ids)
+            if released is not None:
+                self._index_release(released)
+            return response
+
+        except HTTPException:
+            await self.db.rollback()
+            raise
+        except IntegrityError as e:
+            await self.db.rollback()
+            logger.error(e)
+            raise HTTPException(status_code=409, detail="Time slot is no longer available")
         except SQLAlchemyError as e:
+            await self.db.rollback()
             logger.error(e)
             raise HTTPException(
                 status_code=500,
                 detail="An unexpected error occurred while updating the desired appointment",
             )
 
-    # Delete an appointment
-    async def delete_appointment(self, appointment_id: int) -> bool:
+    # Cancel an appointment, keeping it for the history
+    async def cancel_appointment(self, appointment_id: int) -> bool:
+        '''
+        Cancelling an appointment that is already canceled succeeds without doing anything.
+        '''
         try:
-            result = await self.db.execute(
-                select(Appointment).filter(Appointment.appointment_id == appointment_id)
-            )
-            appointment = result.scalars().first()
-
-            if not appointment:
+            released = await self._release_appointment(appointment_id)
+            if released is None:
                 return False
-            
-            # Load information about the appointment to be deleted
-            appointment_user = appointment.user
-            appointment_date = appointment.appointment_date
-            appointment_time_slot = appointment.appointment_time_slots[0].time_slot
-            appointment_service = appointment.appointment_services[0].service
-            barber_user = appointment.barber.user
-
-            email_service = EmailService(email_operations)
-
-            # Send out cancellation email to barber
-            try:
-                await email_service.send_barber_cancellation_email(
-                    barber=barber_user,
-                    client_name=appointment_user,
-                    service_name=appointment_service.name,
-                    appointment_date=appointment_date,
-                    appointment_time=appointment_time_slot.start_time
-                )
-            except Exception as e:
-                logger.error(f"An error occurred while sending cancellation email to barber: {e}")
-
-            # Send out cancellation email to client
-            try:
-                await email_service.send_client_cancellation_email(
-                    barber=barber_user,
-                    client=appointment_user,
-                    service_name=appointment_service.name,
-                    appointment_date=appointment_date,
-                    appointment_time=appointment_time_slot.start_time
-                )
-            except Exception as e:
-                logger.error(f"An error occurred while sending cancellation email to client: {e}")
-
-            # Set the is_booked field in TimeSlot table back to False for the selected slot_id(s)
-            for time_slot in appointment.appointment_time_slots:
-                await self.db.execute(
-                    TimeSlot.__table__.update()
-                    .where(TimeSlot.slot_id == time_slot.slot_id)
-                    .values(is_booked=False)
-                )
 
-            await self.db.delete(appointment)
             await self.db.commit()
-
+            self._index_release(released)
             return True
         except SQLAlchemyError as e:
+            await self.db.rollback()
             logger.error(e)
             raise HTTPException(
                 status_code=500,
-                detail="An unexpected error occurred while deleting the desired appointment",
+                detail="An unexpected error occurred while canceling the desired appointment",
+            )
+
+    # Mark an appointment canceled and release its slots, the caller commits
+    async def _release_appointment(self, appointment_id: int) -> Optional[ReleasedSlots]:
+        '''
+        Loads only what the cancellation needs in one query, then marks the appointment
+        canceled and releases all of its slots with one UPDATE each. The link rows stay, with
+        active_slot_id cleared so the slots can be booked again. The cancellation emails are
+        queued in the same transaction. Returns None when the appointment doesn't exist.
+        '''
+        client = aliased(User)
+        barber_user = aliased(User)
+        result = await self.db.execute(
+            select(
+                Appointment.status,
+                Appointment.appointment_date,
+                Appointment.barber_id,
+                client.firstName.label("client_first_name"),
+                client.lastName.label("client_last_name"),
+                client.email.label("client_email"),
+                barber_user.firstName.label("barber_first_name"),
+                barber_user.lastName.label("barber_last_name"),
+                barber_user.email.label("barber_email"),
+                Appointment_TimeSlot.slot_id,
+                TimeSlot.schedule_id,
+                TimeSlot.start_time,
+                Service.name.label("service_name"),
             )
+            .join(client, client.user_id == Appointment.user_id)
+            .join(Barber, Barber.barber_id == Appointment.barber_id)
+            .join(barber_user, barber_user.user_id == Barber.user_id)
+            .outerjoin(
+                Appointment_TimeSlot,
+                and_(
+                    Appointment_TimeSlot.appointment_id == Appointment.appointment_id,
+                    Appointment_TimeSlot.active_slot_id.is_not(None),
+                ),
+            )
+            .outerjoin(TimeSlot, TimeSlot.slot_id == Appointment_TimeSlot.slot_id)
+            .outerjoin(AppointmentService, AppointmentService.appointment_id == Appointment.appointment_id)
+            .outerjoin(Service, Service.service_id == AppointmentService.service_id)
+            .filter(Appointment.appointment_id == appointment_id)
+        )
+        rows = result.all()
+
+        if not rows:
+            return None
+        first = rows[0]
+        if first.status == AppointmentStatus.canceled:
+            return ReleasedSlots(first.barber_id, first.appointment_date, [], set())
+
+        slot_ids = list({row.slot_id for row in rows if row.slot_id is not None})
+        start_times = [row.start_time for row in rows if row.start_time is not None]
+        service_names = sorted({row.service_name for row in rows if row.service_name is not None})
+
+        await self.db.execute(
+            update(Appointment)
+            .where(Appointment.appointment_id == appointment_id)
+            .values(status=AppointmentStatus.canceled)
+        )
+        if slot_ids:
+            await self.db.execute(
+                update(TimeSlot).where(TimeSlot.slot_id.in_(slot_ids)).values(is_booked=False)
+            )
+            await self.db.execute(
+                update(Appointment_TimeSlot)
+                .where(Appointment_TimeSlot.appointment_id == appointment_id)
+                .values(active_slot_id=None)
+            )
+
+        # Queue the cancellation emails, they are sent once the cancellation is committed
+        if start_times and first.appointment_date:
+            self._queue_emails(
+                "cancellation",
+                Contact(first.client_first_name, first.client_last_name, first.client_email),
+                Contact(first.barber_first_name, first.barber_last_name, first.barber_email),
+                ", ".join(service_names),
+                first.appointment_date,
+                min(start_times),
+            )
+        return ReleasedSlots(
+            first.barber_id,
+            first.appointment_date,
+            slot_ids,
+            {row.schedule_id for row in rows if row.schedule_id is not None},
+        )
+
+    # Free a committed cancellation's slots in the availability index and schedule cache
+    def _index_release(self, released: ReleasedSlots):
+        if not released.slot_ids:
+            return
+        availability_index.set_free(released.barber_id, released.appointment_date, released.slot_ids, True)
+        invalidate_schedules(*released.schedule_ids)
+        notification_worker.wake()
@@ -0,0 +1,160 @@
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+from modules.user.models import (
+    Appointment,
+    AppointmentService,
+    Appointment_TimeSlot,
+    Barber,
+    Service,
+    TimeSlot,
+    User,
+)
+from modules.appointment_schema import AppointmentResponse
+from modules.user.barber_schema import BarberResponse
+from modules.user.service_schema import ServiceResponse
+from modules.user.user_schema import UserBase, UserResponse
+from modules.time_slot_schema import TimeSlotChildResponse
+
+'''
+Read path for appointment responses.
+Selects only the columns a response needs with Core queries instead of hydrating the ORM
+graph: one query for the appointments with their client and barber, one for their slots
+and one for their services, however many appointments are read.
+'''
+
+client = aliased(User, name="client")
+barber_user = aliased(User, name="barber_user")
+
+
+class AppointmentCard:
+    '''
+    Everything an AppointmentResponse shows about one appointment.
+    '''
+    __slots__ = ("row", "time_slots", "services")
+
+    def __init__(self, row):
+        self.row = row
+        self.time_slots: List[TimeSlotChildResponse] = []
+        self.services: List[ServiceResponse] = []
+
+    @property
+    def appointment_id(self) -> int:
+        return self.row.appointment_id
+
+    @property
+    def appointment_date(self) -> Optional[date]:
+        return self.row.appointment_date
+
+    def to_response_schema(self) -> AppointmentResponse:
+        row = self.row
+        return AppointmentResponse(
+            appointment_id=row.appointment_id,
+            appointment_date=row.appointment_date.strftime("%Y-%m-%d") if row.appointment_date else None,
+            user=UserResponse(
+                user_id=row.client_user_id,
+                firstName=row.client_first_name,
+                lastName=row.client_last_name,
+                email=row.client_email,
+                phoneNumber=row.client_phone_number,
+                is_admin=row.client_is_admin,
+            ),
+            barber=BarberResponse(
+                barber_id=row.barber_id,
+                user=UserBase(
+                    firstName=row.barber_first_name,
+                    lastName=row.barber_last_name,
+                    email=row.barber_email,
+                    phoneNumber=row.barber_phone_number,
+                    is_admin=row.barber_is_admin,
+                ),
+            ),
+            status=row.status,
+            time_slots=self.time_slots,
+            services=self.services,
+        )
+
+
+class AppointmentReadOperations:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # Base select for appointment cards, callers add their filters, ordering and limits
+    def select_cards(self) -> Select:
+        return (
+            select(
+                Appointment.appointment_id,
+                Appointment.appointment_date,
+                Appointment.status,
+                Appointment.barber_id,
+                client.user_id.label("client_user_id"),
+                client.firstName.label("client_first_name"),
+                client.lastName.label("client_last_name"),
+                client.email.label("client_email"),
+                client.phoneNumber.label("client_phone_number"),
+                client.is_admin.label("client_is_admin"),
+                barber_user.firstName.label("barber_first_name"),
+                barber_user.lastName.label("barber_last_name"),
+                barber_user.email.label("barber_email"),
+                barber_user.phoneNumber.label("barber_phone_number"),
+                barber_user.is_admin.label("barber_is_admin"),
+            )
+            .join(client, client.user_id == Appointment.user_id)
+            .join(Barber, Barber.barber_id == Appointment.barber_id)
+            .join(barber_user, barber_user.user_id == Barber.user_id)
+        )
+
+    # Run a select built on `select_cards` and attach the slots and services of every appointment
+    async def fetch_cards(self, stmt: Select) -> List[AppointmentCard]:
+        result = await self.db.execute(stmt)
+        cards = [AppointmentCard(row) for row in result.all()]
+        if not cards:
+            return cards
+        cards_by_id = {card.appointment_id: card for card in cards}
+
+        slot_result = await self.db.execute(
+            select(
+                Appointment_TimeSlot.appointment_id,
+                TimeSlot.slot_id,
+                TimeSlot.start_time,
+                TimeSlot.end_time,
+                TimeSlot.is_available,
+                TimeSlot.is_booked,
+            )
+            .join(TimeSlot, TimeSlot.slot_id == Appointment_TimeSlot.slot_id)
+            .filter(Appointment_TimeSlot.appointment_id.in_(cards_by_id))
+            .order_by(TimeSlot.start_time)
+        )
+        for row in slot_result.all():
+            cards_by_id[row.appointment_id].time_slots.append(TimeSlotChildResponse.model_validate(row))
+
+        service_result = await self.db.execute(
+            select(
+                AppointmentService.appointment_id,
+                Service.service_id,
+                Service.name,
+                Service.duration,
+                Service.price,
+                Service.category,
+                Service.description,
+                Service.popularity_score,
+            )
+            .join(Service, Service.service_id == AppointmentService.service_id)
+            .filter(AppointmentService.appointment_id.in_(cards_by_id))
+        )
+        for row in service_result.all():
+            cards_by_id[row.appointment_id].services.append(ServiceResponse.model_validate(row))
+
+        return cards
+
+    # Get the response for one appointment
+    async def get_appointment(self, appointment_id: int) -> Optional[AppointmentResponse]:
+        cards = await self.fetch_cards(
+            self.select_cards().filter(Appointment.appointment_id == appointment_id)
+        )
+        return cards[0].to_response_schema() if cards else None
@@ -0,0 +1,154 @@
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.exc import SQLAlchemyError
+from fastapi import HTTPException
+from modules.user.models import Schedule, ScheduleInterval, Service, TimeSlot
+from modules.availability.availability_index import (
+    DayAvailability,
+    availability_index,
+    to_minutes,
+    to_time,
+)
+from modules.availability.availability_schema import AvailabilityOpening
+from modules.schedule_intervals import derive_slots
+import logging
+
+logger = logging.getLogger("availability_operations")
+logger.setLevel(logging.ERROR)
+
+'''
+Search for free openings across barbers.
+Answers come from the availability index; barber-days that aren't indexed yet are loaded
+with one query for their slots and one for their intervals over the whole search range.
+'''
+
+# Longest range of days a single search may cover
+MAX_SEARCH_DAYS = 31
+
+
+class AvailabilityOperations:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # Find the earliest openings long enough for a service
+    async def find_openings(
+        self,
+        service_id: int,
+        from_date: date,
+        to_date: date,
+        barber_id: Optional[int] = None,
+        limit: int = 10,
+    ) -> List[AvailabilityOpening]:
+        '''
+        An opening is a run of back-to-back free slots of one barber covering the service's
+        duration. Openings are returned by date, start time and barber; each one lists the
+        slots to book it with.
+        '''
+        if to_date < from_date:
+            raise HTTPException(status_code=400, detail="to must not be before from")
+        if (to_date - from_date).days >= MAX_SEARCH_DAYS:
+            raise HTTPException(status_code=400, detail=f"A search may cover at most {MAX_SEARCH_DAYS} days")
+
+        try:
+            service_result = await self.db.execute(
+                select(Service.duration).filter(Service.service_id == service_id)
+            )
+            duration = service_result.scalar()
+            if duration is None:
+                raise HTTPException(status_code=400, detail="Invalid service_id: Service does not exist")
+
+            # Openings that have already started are never returned
+            now = datetime.now()
+            days = await self._get_days(max(from_date, now.date()), to_date, barber_id)
+
+            openings = []
+            for day, barbers in sorted(days.items()):
+                not_before = to_minutes(now.time()) if day == now.date() else 0
+                # All of a day's openings are needed to order them across barbers
+                day_openings = []
+                for opening_barber_id, availability in barbers.items():
+                    for first, last in availability.openings(duration, not_before):
+                        day_openings.append(
+                            AvailabilityOpening(
+                                barber_id=opening_barber_id,
+                                date=day,
+                                start_time=to_time(availability.starts[first]),
+                                end_time=to_time(availability.ends[last]),
+                                time_slot=list(availability.slot_ids[first:last + 1]),
+                            )
+                        )
+                day_openings.sort(key=lambda opening: (opening.start_time, opening.barber_id))
+                openings.extend(day_openings[:limit - len(openings)])
+                if len(openings) >= limit:
+                    break
+            return openings
+
+        except SQLAlchemyError as e:
+            logger.error(e)
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred while searching for openings",
+            )
+
+    # Get the availability of every scheduled barber-day in the range by date and barber,
+    # loading what isn't indexed
+    async def _get_days(self, from_date: date, to_date: date, barber_id: Optional[int]) -> dict:
+        '''
+        The schedules in the range are always listed, since another process may have added
+        one; only the slots and intervals of barber-days missing from the index are read.
+        '''
+        schedule_query = select(Schedule.schedule_id, Schedule.barber_id, Schedule.date).filter(
+            Schedule.date >= from_date,
+            Schedule.date <= to_date,
+            Schedule.is_working.is_(True),
+        )
+        if barber_id is not None:
+            schedule_query = schedule_query.filter(Schedule.barber_id == barber_id)
+        schedule_result = await self.db.execute(schedule_query)
+
+        days = {}
+        missing = {}
+        for schedule in schedule_result.all():
+            availability = availability_index.get(schedule.barber_id, schedule.date)
+            if availability is None:
+                missing[schedule.schedule_id] = (schedule.barber_id, schedule.date)
+            else:
+                days.setdefault(schedule.date, {})[schedule.barber_id] = availability
+
+        if missing:
+            slot_result = await self.db.execute(
+                select(
+                    TimeSlot.schedule_id,
+                    TimeSlot.slot_id,
+                    TimeSlot.start_time,
+                    TimeSlot.end_time,
+                    TimeSlot.is_available,
+                    TimeSlot.is_booked,
+                ).filter(TimeSlot.schedule_id.in_(missing))
+            )
+            slots_by_schedule = {schedule_id: [] for schedule_id in missing}
+            for slot in slot_result.all():
+                slots_by_schedule[slot.schedule_id].append(slot)
+            interval_result = await self.db.execute(
+                select(
+                    ScheduleInterval.schedule_id,
+                    ScheduleInterval.start_time,
+                    ScheduleInterval.end_time,
+                    ScheduleInterval.slot_minutes,
+                ).filter(ScheduleInterval.schedule_id.in_(missing))
+            )
+            intervals_by_schedule = {}
+            for interval in interval_result.all():
+                intervals_by_schedule.setdefault(interval.schedule_id, []).append(interval)
+            for schedule_id, slots in slots_by_schedule.items():
+                schedule_barber_id, schedule_date = missing[schedule_id]
+                intervals = intervals_by_schedule.get(schedule_id)
+                if intervals:
+                    slots = derive_slots(schedule_id, intervals, slots)
+                availability = DayAvailability(slots)
+                availability_index.put(schedule_barber_id, schedule_date, availability)
+                days.setdefault(schedule_date, {})[schedule_barber_id] = availability
+        return days
@@ -1,13 +1,19 @@
-from typing import List
+import datetime
+from typing import List, Optional
 
 from fastapi import HTTPException
+from sqlalchemy import and_, case, func, literal, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
-from modules.user.models import Barber, Schedule, User
-from modules.user.barber_schema import BarberCreate
+from modules.user.models import Barber, Schedule, ScheduleInterval, Service, TimeSlot, User, KeycloakOperation
+from modules.user.barber_schema import BarberCreate, BarberBatchCreate, BarberListResponse
+from modules.user.loader_profiles import BARBER_WITH_USER
 
-from auth.service import AuthService
+from auth.identity_cache import invalidate_identity
+from core.sql_functions import time_to_seconds
+from operations.provisioning_operations import ProvisioningOperations
+from workers.provisioning_worker import provisioning_worker
 import logging
 
 logger = logging.getLogger("barber_operations")
@@ -48,21 +54,67 @@ class BarberOperations:
         
             barber = Barber(user_id=user.user_id)
             self.db.add(barber)
+
+            # Queue the barber role for the Keycloak user in the same transaction
+            ProvisioningOperations(self.db).enqueue(
+                user.user_id, KeycloakOperation.assign_role, {"role": "barber"}
+            )
+            kc_id = user_object.kc_id
             await self.db.commit()
-            await self.db.refresh(barber)
-
-            # Add barber role to Keycloak user
-            try:
-                AuthService.add_role_to_user(user_object.kc_id, "barber")
-            except Exception as e:
-                logger.error(f"Error adding role to Keycloak user: {str(e)}")
-                await self.db.rollback()
+            invalidate_identity(kc_id)
+            provisioning_worker.wake()
+
+            result = await self.db.execute(
+                select(Barber).filter(Barber.user_id == user.user_id).options(*BARBER_WITH_USER)
+            )
+            return result.scalars().first()
+
+        except SQLAlchemyError as e:
+            logger.error(e)
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred"
+            )
+    
+    # Create Barbers for many existing users at once, e.g. when onboarding a shop's staff
+    async def create_barbers(self, users: BarberBatchCreate) -> List[Barber]:
+        try:
+            user_ids = set(users.user_ids)
+            result = await self.db.execute(select(User.user_id, User.kc_id).filter(User.user_id.in_(user_ids)))
+            kc_ids = {row.user_id: row.kc_id for row in result.all()}
+            missing_user_ids = user_ids - set(kc_ids)
+
+            # Check to make sure every User ID provided links to a valid User
+            if missing_user_ids:
                 raise HTTPException(
                     status_code=400,
-                    detail=f"Error adding role to Keycloak user: {str(e)}"
+                    detail=f"Users not found with provided IDs: {sorted(missing_user_ids)}"
                 )
 
-            return barber
+            existing_barbers = await self.db.execute(select(Barber.user_id).filter(Barber.user_id.in_(user_ids)))
+            existing_barber_user_ids = set(existing_barbers.scalars().all())
+
+            # Make sure none of the users is already a barber
+            if existing_barber_user_ids:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Users are already barbers: {sorted(existing_barber_user_ids)}"
+                )
+
+            # Queue the barber role for every Keycloak user, the worker assigns them together
+            provisioning_ops = ProvisioningOperations(self.db)
+            for user_id in user_ids:
+                self.db.add(Barber(user_id=user_id))
+                provisioning_ops.enqueue(user_id, KeycloakOperation.assign_role, {"role": "barber"})
+            await self.db.commit()
+            invalidate_identity(*kc_ids.values())
+            provisioning_worker.wake()
+
+            result = await self.db.execute(
+                select(Barber).filter(Barber.user_id.in_(user_ids)).options(*BARBER_WITH_USER)
+            )
+            return result.scalars().all()
 
         except SQLAlchemyError as e:
             logger.error(e)
@@ -71,14 +123,16 @@ class BarberOperations:
                 status_code=500,
                 detail="An unexpected error occurred"
             )
-    
+
     # Retrieve all barbers
     async def get_all_barbers(self, page: int, limit: int) -> List[Barber]:
         try: 
             # Calculate offset for SQL query
             offset = (page - 1) * limit
 
-            result = await self.db.execute(select(Barber).limit(limit).offset(offset))
+            result = await self.db.execute(
+                select(Barber).options(*BARBER_WITH_USER).limit(limit).offset(offset)
+            )
             return result.scalars().all()
         except SQLAlchemyError as e:
             logger.error(e)
@@ -90,7 +144,9 @@ class BarberOperations:
     # Retrieve a specific barber by their Barber ID
     async def get_barber_by_id(self, barber_id: int):
         try:
-            result = await self.db.execute(select(Barber).filter(Barber.barber_id == barber_id))
+            result = await self.db.execute(
+                select(Barber).filter(Barber.barber_id == barber_id).options(*BARBER_WITH_USER)
+            )
             first_result = result.scalars().first()
             if not first_result:
                 raise HTTPException(status_code = 400, detail="No barber found with provided ID")
@@ -106,7 +162,9 @@ class BarberOperations:
     # Retrieve a specific barber by their User ID
     async def get_barber_by_user_id(self, user_id: int):
         try:
-            result = await self.db.execute(select(Barber).filter(Barber.user_id == user_id))
+            result = await self.db.execute(
+                select(Barber).filter(Barber.user_id == user_id).options(*BARBER_WITH_USER)
+            )
             first_result = result.scalars().first()
             if not first_result:
                 raise HTTPException(status_code = 400, detail="No barber found with provided User ID")
@@ -119,21 +177,163 @@ class BarberOperations:
                 detail="An unexpected error occurred"
             )
         
-    async def list_barbers_by_schedule_date(self, schedule_date: str, page: int = None, limit: int = None) -> List[Barber]:
-        # Get a Schedule object by date
-        schedules = await self.db.execute(select(Schedule).filter(Schedule.date == schedule_date))
-        schedules = schedules.scalars().all()
-        if not schedules:
-            return []
-
-        # Get all barbers by joining the Schedule table on the barber_id
-        result = await self.db.execute(
-            select(Barber).join(Schedule).filter(Schedule.schedule_id.in_([schedule.schedule_id for schedule in schedules])
-            ).distinct(Barber.barber_id)
+    # Retrieve a page of the barbers working on a date with their free slot counts
+    async def list_barbers_by_schedule_date(
+        self,
+        schedule_date: datetime.date,
+        page: int,
+        limit: int,
+        min_free_slots: Optional[int] = None,
+        service_id: Optional[int] = None,
+    ) -> List[BarberListResponse]:
+        '''
+        Barbers with a working schedule block on the date, ordered by barber_id. With
+        min_free_slots only barbers with at least that many free slots are listed, with
+        service_id only barbers with back-to-back free slots covering the service's duration.
+        Counting, filtering and paging all happen in one query.
+        '''
+        try:
+            min_free_seconds = None
+            if service_id is not None:
+                service_result = await self.db.execute(select(Service.duration).filter(Service.service_id == service_id))
+                duration = service_result.scalar()
+                if duration is None:
+                    raise HTTPException(status_code=400, detail="Invalid service_id: Service does not exist")
+                min_free_seconds = duration * 60
+
+            day_slots = self._day_slots(schedule_date)
+            free_slots = func.coalesce(func.sum(case((day_slots.c.free, 1), else_=0)), 0)
+            counts = (
+                select(day_slots.c.schedule_id, free_slots.label("free_slots"))
+                .group_by(day_slots.c.schedule_id)
+                .subquery()
+            )
+
+            stmt = (
+                select(Barber, func.coalesce(counts.c.free_slots, 0).label("free_slots"))
+                .join(
+                    Schedule,
+                    and_(
+                        Schedule.barber_id == Barber.barber_id,
+                        Schedule.date == schedule_date,
+                        Schedule.is_working.is_(True),
+                    ),
+                )
+                .outerjoin(counts, counts.c.schedule_id == Schedule.schedule_id)
+                .options(*BARBER_WITH_USER)
+                .order_by(Barber.barber_id)
+                .limit(limit)
+                .offset((page - 1) * limit)
+            )
+            if min_free_slots is not None:
+                stmt = stmt.filter(counts.c.free_slots >= min_free_slots)
+            if min_free_seconds is not None:
+                runs = self._longest_free_runs(day_slots)
+                stmt = stmt.join(runs, runs.c.schedule_id == Schedule.schedule_id).filter(
+                    runs.c.longest_seconds >= min_free_seconds
+                )
+
+            result = await self.db.execute(stmt)
+            return [
+                BarberListResponse(**barber.to_response_schema().model_dump(), free_slots=count)
+                for barber, count in result.all()
+            ]
+        except SQLAlchemyError as e:
+            logger.error(e)
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred"
+            )
+
+    # Every slot of the working schedule blocks on a date, with times in seconds of the day
+    def _day_slots(self, schedule_date: datetime.date):
+        '''
+        Slot rows plus the slots derived from schedules stored as intervals, expanded by a
+        recursive CTE. A derived slot is left out when a row starts at the same time.
+        '''
+        day_schedules = select(Schedule.schedule_id).filter(
+            Schedule.date == schedule_date, Schedule.is_working.is_(True)
         )
-        barbers = result.scalars().all()
-        if page and limit:
-            offset = (page - 1) * limit
-            barbers = barbers[offset:offset + limit]
-        return barbers
+        row_slots = select(
+            TimeSlot.schedule_id,
+            time_to_seconds(TimeSlot.start_time).label("start_seconds"),
+            time_to_seconds(TimeSlot.end_time).label("end_seconds"),
+            and_(TimeSlot.is_available.is_(True), TimeSlot.is_booked.is_(False)).label("free"),
+        ).filter(TimeSlot.schedule_id.in_(day_schedules))
+
+        first_slots = select(
+            ScheduleInterval.schedule_id,
+            time_to_seconds(ScheduleInterval.start_time).label("start_seconds"),
+            (time_to_seconds(ScheduleInterval.start_time) + ScheduleInterval.slot_minutes * 60).label("end_seconds"),
+            time_to_seconds(ScheduleInterval.end_time).label("interval_end_seconds"),
+            (ScheduleInterval.slot_minutes * 60).label("step_seconds"),
+        ).filter(
+            ScheduleInterval.schedule_id.in_(day_schedules),
+            time_to_seconds(ScheduleInterval.start_time) + ScheduleInterval.slot_minutes * 60
+            <= time_to_seconds(ScheduleInterval.end_time),
+        )
+        interval_slots = first_slots.cte("interval_slots", recursive=True)
+        interval_slots = interval_slots.union_all(
+            select(
+                interval_slots.c.schedule_id,
+                interval_slots.c.end_seconds,
+                interval_slots.c.end_seconds + interval_slots.c.step_seconds,
+                interval_slots.c.interval_end_seconds,
+                interval_slots.c.step_seconds,
+            ).filter(interval_slots.c.end_seconds + interval_slots.c.step_seconds <= interval_slots.c.interval_end_seconds)
+        )
+
+        rows = row_slots.cte("row_slots")
+        derived_slots = select(
+            interval_slots.c.schedule_id,
+            interval_slots.c.start_seconds,
+            interval_slots.c.end_seconds,
+            literal(True).label("free"),
+        ).filter(
+            ~select(rows.c.schedule_id)
+            .where(
+                rows.c.schedule_id == interval_slots.c.schedule_id,
+                rows.c.start_seconds == interval_slots.c.start_seconds,
+            )
+            .exists()
+        )
+        return select(rows).union_all(derived_slots).cte("day_slots")
 
+    # The length of each schedule's longest run of back-to-back free slots
+    def _longest_free_runs(self, day_slots):
+        '''
+        Gaps and islands: a free slot that doesn't start where the previous free slot ended
+        begins a new run, and a running count of those starts numbers the runs.
+        '''
+        previous_end = func.lag(day_slots.c.end_seconds).over(
+            partition_by=day_slots.c.schedule_id, order_by=day_slots.c.start_seconds
+        )
+        free_slots = (
+            select(
+                day_slots.c.schedule_id,
+                day_slots.c.start_seconds,
+                day_slots.c.end_seconds,
+                case(
+                    (or_(previous_end.is_(None), previous_end != day_slots.c.start_seconds), 1), else_=0
+                ).label("run_start"),
+            )
+            .filter(day_slots.c.free)
+            .subquery()
+        )
+        numbered = select(
+            free_slots.c.schedule_id,
+            (free_slots.c.end_seconds - free_slots.c.start_seconds).label("seconds"),
+            func.sum(free_slots.c.run_start)
+            .over(partition_by=free_slots.c.schedule_id, order_by=free_slots.c.start_seconds, rows=(None, 0))
+            .label("run"),
+        ).subquery()
+        run_lengths = (
+            select(numbered.c.schedule_id, func.sum(numbered.c.seconds).label("seconds"))
+            .group_by(numbered.c.schedule_id, numbered.c.run)
+            .subquery()
+        )
+        return (
+            select(run_lengths.c.schedule_id, func.max(run_lengths.c.seconds).label("longest_seconds"))
+            .group_by(run_lengths.c.schedule_id)
+            .subquery()
+        )
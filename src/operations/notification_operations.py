@@ -0,0 +1,99 @@
+import datetime
+from typing import List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from modules.user.models import NotificationOutbox, OutboxStatus
+import logging
+
+logger = logging.getLogger("notification_operations")
+logger.setLevel(logging.ERROR)
+
+'''
+Operations on the email notification outbox.
+Emails are added to the caller's session and committed together with the change they announce.
+'''
+class NotificationOperations:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # Queue an email, the caller commits it
+    def enqueue_email(self, recipient: str, subject: str, body: str) -> NotificationOutbox:
+        entry = NotificationOutbox(
+            recipient=recipient,
+            subject=subject,
+            body=body,
+            status=OutboxStatus.pending,
+            attempts=0,
+            next_attempt_at=datetime.datetime.now(),
+        )
+        self.db.add(entry)
+        return entry
+
+    # Claim up to `limit` due emails for delivery
+    async def claim_batch(self, limit: int, lease_seconds: int) -> List[dict]:
+        '''
+        Claimed emails are leased rather than locked: if the worker dies, they become due
+        again once the lease runs out.
+        '''
+        now = datetime.datetime.now()
+        result = await self.db.execute(
+            select(NotificationOutbox)
+            .filter(
+                NotificationOutbox.status.in_([OutboxStatus.pending, OutboxStatus.processing]),
+                NotificationOutbox.next_attempt_at <= now,
+            )
+            .order_by(NotificationOutbox.notification_id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        entries = result.scalars().all()
+
+        # Snapshot before commit, the ORM objects are expired afterwards
+        claimed = [
+            {
+                "notification_id": entry.notification_id,
+                "recipient": entry.recipient,
+                "subject": entry.subject,
+                "body": entry.body,
+                "attempts": entry.attempts,
+            }
+            for entry in entries
+        ]
+        if claimed:
+            await self.db.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.notification_id.in_([entry["notification_id"] for entry in claimed]))
+                .values(
+                    status=OutboxStatus.processing,
+                    next_attempt_at=now + datetime.timedelta(seconds=lease_seconds),
+                )
+            )
+        await self.db.commit()
+        return claimed
+
+    # Record the outcome of a delivery attempt, the caller commits it
+    async def mark_done(self, notification_id: int, attempts: int):
+        await self.db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.notification_id == notification_id)
+            .values(status=OutboxStatus.done, attempts=attempts, last_error=None)
+        )
+
+    async def mark_failed(self, notification_id: int, attempts: int, error: str, retry_in: Optional[float]):
+        '''
+        Schedule a retry in `retry_in` seconds, or give up on the email when it is None.
+        '''
+        values = {"attempts": attempts, "last_error": error[:2000]}
+        if retry_in is None:
+            values["status"] = OutboxStatus.failed
+        else:
+            values["status"] = OutboxStatus.pending
+            values["next_attempt_at"] = datetime.datetime.now() + datetime.timedelta(seconds=retry_in)
+        await self.db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.notification_id == notification_id)
+            .values(**values)
+        )
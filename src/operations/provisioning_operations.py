@@ -0,0 +1,127 @@
+import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import exists, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased
+from modules.user.models import KeycloakOutbox, KeycloakOperation, OutboxStatus
+import logging
+
+logger = logging.getLogger("provisioning_operations")
+logger.setLevel(logging.ERROR)
+
+'''
+Operations on the Keycloak provisioning outbox.
+Entries are added to the caller's session and committed together with the User change.
+'''
+class ProvisioningOperations:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # Queue a Keycloak change for a user, the caller commits it
+    def enqueue(self, user_id: int, operation: KeycloakOperation, payload: Optional[dict] = None) -> KeycloakOutbox:
+        entry = KeycloakOutbox(
+            user_id=user_id,
+            operation=operation,
+            payload=payload,
+            status=OutboxStatus.pending,
+            attempts=0,
+            next_attempt_at=datetime.datetime.now(),
+        )
+        self.db.add(entry)
+        return entry
+
+    # Get the provisioning history of a user, newest first
+    async def get_status_for_user(self, user_id: int) -> List[KeycloakOutbox]:
+        try:
+            result = await self.db.execute(
+                select(KeycloakOutbox)
+                .filter(KeycloakOutbox.user_id == user_id)
+                .order_by(KeycloakOutbox.outbox_id.desc())
+            )
+            return result.scalars().all()
+        except SQLAlchemyError as e:
+            logger.error(e)
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred"
+            )
+
+    # Claim up to `limit` due entries for processing
+    async def claim_batch(self, limit: int, lease_seconds: int) -> List[dict]:
+        '''
+        Only the oldest unfinished entry of each user is eligible, so a user's changes reach
+        Keycloak in the order they were made. Claimed entries are leased rather than locked:
+        if the worker dies, they become due again once the lease runs out.
+        '''
+        now = datetime.datetime.now()
+        earlier = aliased(KeycloakOutbox)
+        unfinished = [OutboxStatus.pending, OutboxStatus.processing]
+
+        result = await self.db.execute(
+            select(KeycloakOutbox)
+            .filter(
+                KeycloakOutbox.status.in_(unfinished),
+                KeycloakOutbox.next_attempt_at <= now,
+                ~exists().where(
+                    earlier.user_id == KeycloakOutbox.user_id,
+                    earlier.outbox_id < KeycloakOutbox.outbox_id,
+                    earlier.status.in_(unfinished),
+                ),
+            )
+            .order_by(KeycloakOutbox.outbox_id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        entries = result.scalars().all()
+
+        # Snapshot before commit, the ORM objects are expired afterwards
+        claimed = [
+            {
+                "outbox_id": entry.outbox_id,
+                "user_id": entry.user_id,
+                "operation": entry.operation,
+                "payload": entry.payload or {},
+                "attempts": entry.attempts,
+            }
+            for entry in entries
+        ]
+        if claimed:
+            await self.db.execute(
+                update(KeycloakOutbox)
+                .where(KeycloakOutbox.outbox_id.in_([entry["outbox_id"] for entry in claimed]))
+                .values(
+                    status=OutboxStatus.processing,
+                    next_attempt_at=now + datetime.timedelta(seconds=lease_seconds),
+                )
+            )
+        await self.db.commit()
+        return claimed
+
+    # Record the outcome of a processed entry, the caller commits it
+    async def mark_done(self, outbox_id: int, attempts: int):
+        await self.db.execute(
+            update(KeycloakOutbox)
+            .where(KeycloakOutbox.outbox_id == outbox_id)
+            .values(status=OutboxStatus.done, attempts=attempts, last_error=None)
+        )
+
+    async def mark_failed(self, outbox_id: int, attempts: int, error: str, retry_in: Optional[float]):
+        '''
+        Schedule a retry in `retry_in` seconds, or give up on the entry when it is None.
+        '''
+        values = {"attempts": attempts, "last_error": error[:2000]}
+        if retry_in is None:
+            values["status"] = OutboxStatus.failed
+        else:
+            values["status"] = OutboxStatus.pending
+            values["next_attempt_at"] = datetime.datetime.now() + datetime.timedelta(seconds=retry_in)
+        await self.db.execute(
+            update(KeycloakOutbox)
+            .where(KeycloakOutbox.outbox_id == outbox_id)
+            .values(**values)
+        )
@@ -0,0 +1,353 @@
+from datetime import date, datetime, time
+from typing import Callable, List, Optional
+
+import numpy as np
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.exc import SQLAlchemyError
+from fastapi import HTTPException
+from modules.user.models import Appointment, Appointment_TimeSlot, Schedule, ScheduleInterval, TimeSlot
+from modules.report_schema import (
+    BarberIdleGaps,
+    BarberUtilization,
+    HeatmapCell,
+    LeadTimeReport,
+    LeadTimeSummary,
+    UtilizationHeatmap,
+)
+import logging
+
+logger = logging.getLogger("report_operations")
+logger.setLevel(logging.ERROR)
+
+'''
+Reports over barbers' slots and appointments.
+The rows a report needs are streamed from the database in chunks straight into columnar
+NumPy arrays (dates as day ordinals, times as minutes), and every figure is computed with
+array operations over the whole range rather than row by row. Schedules stored as intervals
+are expanded into their slots the same way.
+'''
+
+# Longest range of days a single report may cover
+MAX_REPORT_DAYS = 366
+
+# Rows fetched per round trip while streaming report data
+STREAM_CHUNK_SIZE = 10000
+
+# Number of busiest weekday hours listed by the heatmap
+PEAK_HOURS = 5
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def minute_of_day(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def minute_of_era(value: datetime) -> int:
+    return value.toordinal() * 1440 + value.hour * 60 + value.minute
+
+
+class ReportOperations:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # Booked share of the open slot minutes of each barber
+    async def get_utilization(
+        self, from_date: date, to_date: date, barber_id: Optional[int] = None
+    ) -> List[BarberUtilization]:
+        slots = await self._load_slots(from_date, to_date, barber_id)
+        barber_ids, barber_index = np.unique(slots["barber_id"], return_inverse=True)
+        minutes = slots["end"] - slots["start"]
+
+        open_minutes = np.bincount(
+            barber_index, weights=minutes * (slots["available"] | slots["booked"]), minlength=len(barber_ids)
+        )
+        booked_minutes = np.bincount(barber_index, weights=minutes * slots["booked"], minlength=len(barber_ids))
+        utilization = np.divide(
+            booked_minutes, open_minutes, out=np.zeros(len(barber_ids)), where=open_minutes > 0
+        )
+
+        # Distinct (barber, day) pairs give each barber's working days
+        day_keys = np.unique(barber_index.astype(np.int64) * (MAX_REPORT_DAYS + 1) + slots["day"] - from_date.toordinal())
+        working_days = np.bincount(day_keys // (MAX_REPORT_DAYS + 1), minlength=len(barber_ids))
+
+        return [
+            BarberUtilization(
+                barber_id=barber,
+                working_days=days,
+                open_minutes=round(open_total),
+                booked_minutes=round(booked_total),
+                utilization=round(share, 4),
+            )
+            for barber, days, open_total, booked_total, share in zip(
+                barber_ids.tolist(),
+                working_days.tolist(),
+                open_minutes.tolist(),
+                booked_minutes.tolist(),
+                utilization.tolist(),
+            )
+        ]
+
+    # Idle time between consecutive bookings on the same barber-day
+    async def get_idle_gaps(
+        self, from_date: date, to_date: date, barber_id: Optional[int] = None
+    ) -> List[BarberIdleGaps]:
+        slots = await self._load_slots(from_date, to_date, barber_id)
+        booked = slots["booked"]
+        barber_ids, barber_index = np.unique(slots["barber_id"][booked], return_inverse=True)
+        days, starts, ends = slots["day"][booked], slots["start"][booked], slots["end"][booked]
+
+        order = np.lexsort((starts, days, barber_index))
+        barber_index, days, starts, ends = barber_index[order], days[order], starts[order], ends[order]
+
+        gaps = starts[1:] - ends[:-1]
+        is_gap = (barber_index[1:] == barber_index[:-1]) & (days[1:] == days[:-1]) & (gaps > 0)
+        gap_barbers, gaps = barber_index[1:][is_gap], gaps[is_gap]
+
+        gap_counts = np.bincount(gap_barbers, minlength=len(barber_ids))
+        idle_minutes = np.bincount(gap_barbers, weights=gaps, minlength=len(barber_ids))
+        longest_gaps = np.zeros(len(barber_ids), dtype=np.int64)
+        np.maximum.at(longest_gaps, gap_barbers, gaps)
+
+        return [
+            BarberIdleGaps(
+                barber_id=barber,
+                gaps=count,
+                idle_minutes=round(idle),
+                mean_gap_minutes=round(idle / count, 1) if count else 0.0,
+                longest_gap_minutes=longest,
+            )
+            for barber, count, idle, longest in zip(
+                barber_ids.tolist(), gap_counts.tolist(), idle_minutes.tolist(), longest_gaps.tolist()
+            )
+        ]
+
+    # Open and booked minutes by weekday and hour of the day
+    async def get_heatmap(
+        self, from_date: date, to_date: date, barber_id: Optional[int] = None
+    ) -> UtilizationHeatmap:
+        slots = await self._load_slots(from_date, to_date, barber_id)
+        minutes = slots["end"] - slots["start"]
+
+        # Day ordinal 1 (0001-01-01) is a Monday; slots count towards the hour they start in
+        cells = ((slots["day"] - 1) % 7) * 24 + slots["start"] // 60
+        open_minutes = np.bincount(
+            cells, weights=minutes * (slots["available"] | slots["booked"]), minlength=7 * 24
+        ).reshape(7, 24)
+        booked_minutes = np.bincount(cells, weights=minutes * slots["booked"], minlength=7 * 24).reshape(7, 24)
+        utilization = np.divide(
+            booked_minutes, open_minutes, out=np.zeros((7, 24)), where=open_minutes > 0
+        ).round(4)
+
+        peak_cells = np.argsort(-booked_minutes, axis=None, kind="stable")[:PEAK_HOURS]
+        return UtilizationHeatmap(
+            weekdays=WEEKDAYS,
+            hours=list(range(24)),
+            open_minutes=open_minutes.astype(np.int64).tolist(),
+            booked_minutes=booked_minutes.astype(np.int64).tolist(),
+            utilization=utilization.tolist(),
+            peak_hours=[
+                HeatmapCell(
+                    weekday=WEEKDAYS[cell // 24],
+                    hour=cell % 24,
+                    booked_minutes=round(float(booked_minutes.flat[cell])),
+                    utilization=float(utilization.flat[cell]),
+                )
+                for cell in peak_cells.tolist()
+                if booked_minutes.flat[cell] > 0
+            ],
+        )
+
+    # Time between booking an appointment and its start, overall and per barber
+    async def get_lead_time(
+        self, from_date: date, to_date: date, barber_id: Optional[int] = None
+    ) -> LeadTimeReport:
+        '''
+        Covers the active appointments in the range that recorded when they were booked.
+        '''
+        self._check_range(from_date, to_date)
+        stmt = (
+            select(
+                Appointment_TimeSlot.appointment_id,
+                Appointment.barber_id,
+                Appointment.created_at,
+                Schedule.date,
+                TimeSlot.start_time,
+            )
+            .join(Appointment, Appointment.appointment_id == Appointment_TimeSlot.appointment_id)
+            .join(TimeSlot, TimeSlot.slot_id == Appointment_TimeSlot.slot_id)
+            .join(Schedule, Schedule.schedule_id == TimeSlot.schedule_id)
+            .filter(
+                Appointment_TimeSlot.active_slot_id.is_not(None),
+                Appointment.created_at.is_not(None),
+                Schedule.date >= from_date,
+                Schedule.date <= to_date,
+            )
+            .order_by(Appointment_TimeSlot.appointment_id)
+        )
+        if barber_id is not None:
+            stmt = stmt.filter(Appointment.barber_id == barber_id)
+        links = await self._load_columns(
+            stmt,
+            [
+                ("appointment_id", np.int64, None),
+                ("barber_id", np.int64, None),
+                ("created", np.int64, minute_of_era),
+                ("day", np.int64, date.toordinal),
+                ("start", np.int64, minute_of_day),
+            ],
+        )
+
+        # Rows arrive ordered by appointment; each appointment starts at its earliest slot
+        _, first_rows = np.unique(links["appointment_id"], return_index=True)
+        slot_starts = links["day"] * 1440 + links["start"]
+        appointment_starts = np.minimum.reduceat(slot_starts, first_rows) if len(first_rows) else slot_starts
+        lead_hours = (appointment_starts - links["created"][first_rows]) / 60
+        appointment_barbers = links["barber_id"][first_rows]
+
+        order = np.argsort(appointment_barbers, kind="stable")
+        barber_ids, barber_rows = np.unique(appointment_barbers[order], return_index=True)
+        return LeadTimeReport(
+            overall=self._summarize_lead_time(None, lead_hours),
+            barbers=[
+                self._summarize_lead_time(barber, hours)
+                for barber, hours in zip(barber_ids.tolist(), np.split(lead_hours[order], barber_rows[1:]))
+            ],
+        )
+
+    def _summarize_lead_time(self, barber_id: Optional[int], lead_hours: np.ndarray) -> LeadTimeSummary:
+        if not len(lead_hours):
+            return LeadTimeSummary(barber_id=barber_id, appointments=0, mean_hours=0, median_hours=0, p90_hours=0)
+        median, p90 = np.percentile(lead_hours, [50, 90])
+        return LeadTimeSummary(
+            barber_id=barber_id,
+            appointments=len(lead_hours),
+            mean_hours=round(float(lead_hours.mean()), 2),
+            median_hours=round(float(median), 2),
+            p90_hours=round(float(p90), 2),
+        )
+
+    # Load the working slots in the range as columns
+    async def _load_slots(self, from_date: date, to_date: date, barber_id: Optional[int]) -> dict:
+        self._check_range(from_date, to_date)
+        stmt = (
+            select(
+                TimeSlot.schedule_id,
+                Schedule.barber_id,
+                Schedule.date,
+                TimeSlot.start_time,
+                TimeSlot.end_time,
+                TimeSlot.is_available,
+                TimeSlot.is_booked,
+            )
+            .join(Schedule, Schedule.schedule_id == TimeSlot.schedule_id)
+            .filter(
+                Schedule.date >= from_date,
+                Schedule.date <= to_date,
+                Schedule.is_working.is_(True),
+            )
+        )
+        if barber_id is not None:
+            stmt = stmt.filter(Schedule.barber_id == barber_id)
+        slots = await self._load_columns(
+            stmt,
+            [
+                ("schedule_id", np.int64, None),
+                ("barber_id", np.int64, None),
+                ("day", np.int64, date.toordinal),
+                ("start", np.int64, minute_of_day),
+                ("end", np.int64, minute_of_day),
+                ("available", np.bool_, None),
+                ("booked", np.bool_, None),
+            ],
+        )
+
+        interval_stmt = (
+            select(
+                ScheduleInterval.schedule_id,
+                Schedule.barber_id,
+                Schedule.date,
+                ScheduleInterval.start_time,
+                ScheduleInterval.end_time,
+                ScheduleInterval.slot_minutes,
+            )
+            .join(Schedule, Schedule.schedule_id == ScheduleInterval.schedule_id)
+            .filter(
+                Schedule.date >= from_date,
+                Schedule.date <= to_date,
+                Schedule.is_working.is_(True),
+            )
+        )
+        if barber_id is not None:
+            interval_stmt = interval_stmt.filter(Schedule.barber_id == barber_id)
+        intervals = await self._load_columns(
+            interval_stmt,
+            [
+                ("schedule_id", np.int64, None),
+                ("barber_id", np.int64, None),
+                ("day", np.int64, date.toordinal),
+                ("start", np.int64, minute_of_day),
+                ("end", np.int64, minute_of_day),
+                ("slot_minutes", np.int64, None),
+            ],
+        )
+        if not len(intervals["schedule_id"]):
+            return slots
+        derived = self._expand_intervals(intervals)
+
+        # A slot row starting where a derived slot does takes its place
+        taken = np.isin(
+            derived["schedule_id"] * 1440 + derived["start"], slots["schedule_id"] * 1440 + slots["start"]
+        )
+        return {name: np.concatenate([slots[name], derived[name][~taken]]) for name in slots}
+
+    # The slots of intervals as the same columns as slot rows, all open and free
+    def _expand_intervals(self, intervals: dict) -> dict:
+        counts = (intervals["end"] - intervals["start"]) // intervals["slot_minutes"]
+        rows = np.repeat(np.arange(len(counts)), counts)
+        # Position of every slot within its interval
+        positions = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        starts = intervals["start"][rows] + positions * intervals["slot_minutes"][rows]
+        return {
+            "schedule_id": intervals["schedule_id"][rows],
+            "barber_id": intervals["barber_id"][rows],
+            "day": intervals["day"][rows],
+            "start": starts,
+            "end": starts + intervals["slot_minutes"][rows],
+            "available": np.ones(len(rows), dtype=np.bool_),
+            "booked": np.zeros(len(rows), dtype=np.bool_),
+        }
+
+    # Stream a select into one array per column, converting values on the way when needed
+    async def _load_columns(
+        self, stmt: Select, columns: List[tuple[str, type, Optional[Callable]]]
+    ) -> dict:
+        try:
+            chunks = {name: [] for name, _, _ in columns}
+            # Core streaming on the session's connection skips the ORM result layer
+            connection = await self.db.connection()
+            result = await connection.stream(stmt.execution_options(yield_per=STREAM_CHUNK_SIZE))
+            async for partition in result.partitions():
+                for position, (name, dtype, convert) in enumerate(columns):
+                    values = (row[position] for row in partition)
+                    if convert is not None:
+                        values = map(convert, values)
+                    chunks[name].append(np.fromiter(values, dtype=dtype, count=len(partition)))
+            return {
+                name: np.concatenate(chunks[name]) if chunks[name] else np.empty(0, dtype=dtype)
+                for name, dtype, _ in columns
+            }
+        except SQLAlchemyError as e:
+            logger.error(e)
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred while loading report data",
+            )
+
+    def _check_range(self, from_date: date, to_date: date):
+        if to_date < from_date:
+            raise HTTPException(status_code=400, detail="to must not be before from")
+        if (to_date - from_date).days >= MAX_REPORT_DAYS:
+            raise HTTPException(status_code=400, detail=f"A report may cover at most {MAX_REPORT_DAYS} days")
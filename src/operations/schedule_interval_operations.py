@@ -0,0 +1,283 @@
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from fastapi import HTTPException
+from modules.user.models import Appointment_TimeSlot, Schedule, ScheduleInterval, TimeSlot
+from modules.schedule_schema import ScheduleCompactResponse
+from modules.schedule_intervals import (
+    find_derived_slot,
+    interval_slots,
+    is_derived_slot_id,
+    parse_derived_slot_id,
+)
+from modules.availability.availability_index import availability_index, to_minutes
+from modules.schedule_cache import invalidate_schedules
+import logging
+
+logger = logging.getLogger("schedule_interval_operations")
+logger.setLevel(logging.ERROR)
+
+'''
+Storage of schedules as working intervals.
+Turns derived slots into TimeSlot rows when they are booked or edited, and compacts
+schedules stored as slot rows into intervals.
+'''
+
+# Longest range of days a single compaction may cover
+MAX_COMPACT_DAYS = 366
+
+# Slot ids deleted per statement while compacting
+DELETE_CHUNK_SIZE = 1000
+
+# Attempts at inserting derived slots that other requests are materializing at the same time
+MATERIALIZE_ATTEMPTS = 3
+
+
+class ScheduleIntervalOperations:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # Give the derived slots among the slot_ids a TimeSlot row, returning their row ids by derived id
+    async def materialize_slots(self, slot_ids: List[int]) -> Dict[int, int]:
+        '''
+        Runs inside the caller's transaction, so the rows go away again if it rolls back.
+        Derived ids that don't match a slot of their schedule's intervals are left out and
+        fail the caller's slot checks like any unknown slot_id.
+        '''
+        wanted = {slot_id: parse_derived_slot_id(slot_id) for slot_id in slot_ids if is_derived_slot_id(slot_id)}
+        if not wanted:
+            return {}
+
+        schedule_ids = {schedule_id for schedule_id, _ in wanted.values()}
+        interval_result = await self.db.execute(
+            select(
+                ScheduleInterval.schedule_id,
+                ScheduleInterval.start_time,
+                ScheduleInterval.end_time,
+                ScheduleInterval.slot_minutes,
+            ).filter(ScheduleInterval.schedule_id.in_(schedule_ids))
+        )
+        intervals = {}
+        for interval in interval_result.all():
+            intervals.setdefault(interval.schedule_id, []).append(interval)
+
+        slots = {}
+        for slot_id, (schedule_id, start_minute) in wanted.items():
+            slot = find_derived_slot(schedule_id, start_minute, intervals.get(schedule_id, []))
+            if slot is not None:
+                slots[slot_id] = (schedule_id, slot)
+        if not slots:
+            return {}
+
+        for _ in range(MATERIALIZE_ATTEMPTS):
+            materialized = await self._find_rows(slots)
+            missing = [key for key in slots if key not in materialized]
+            if not missing:
+                return materialized
+            try:
+                # A concurrent request may insert the same slot first, which fails only the savepoint
+                async with self.db.begin_nested():
+                    await self.db.execute(
+                        insert(TimeSlot),
+                        [
+                            dict(
+                                schedule_id=slots[slot_id][0],
+                                start_time=slots[slot_id][1].start_time,
+                                end_time=slots[slot_id][1].end_time,
+                                is_available=True,
+                                is_booked=False,
+                            )
+                            for slot_id in missing
+                        ],
+                    )
+            except IntegrityError as e:
+                logger.error(e)
+        return await self._find_rows(slots)
+
+    # Get the row ids of the derived slots that already have a TimeSlot row, by derived id
+    async def _find_rows(self, slots: dict) -> Dict[int, int]:
+        result = await self.db.execute(
+            select(TimeSlot.slot_id, TimeSlot.schedule_id, TimeSlot.start_time).filter(
+                TimeSlot.schedule_id.in_({schedule_id for schedule_id, _ in slots.values()}),
+                TimeSlot.start_time.in_({slot.start_time for _, slot in slots.values()}),
+            )
+        )
+        rows = {(row.schedule_id, row.start_time): row.slot_id for row in result.all()}
+        return {
+            slot_id: rows[(schedule_id, slot.start_time)]
+            for slot_id, (schedule_id, slot) in slots.items()
+            if (schedule_id, slot.start_time) in rows
+        }
+
+    # Store a schedule as slot rows again, returning the row ids of its derived slots by derived id
+    async def materialize_schedule(self, schedule_id: int) -> Dict[int, int]:
+        '''
+        Used before a schedule's slots are edited, since edited slots no longer have to line
+        up with the intervals. Runs inside the caller's transaction.
+        '''
+        interval_result = await self.db.execute(
+            select(ScheduleInterval.start_time, ScheduleInterval.end_time, ScheduleInterval.slot_minutes).filter(
+                ScheduleInterval.schedule_id == schedule_id
+            )
+        )
+        intervals = interval_result.all()
+        if not intervals:
+            return {}
+
+        slot_result = await self.db.execute(select(TimeSlot.start_time).filter(TimeSlot.schedule_id == schedule_id))
+        taken = {to_minutes(start_time) for start_time in slot_result.scalars().all()}
+        slots = [
+            slot
+            for interval in intervals
+            for slot in interval_slots(schedule_id, interval)
+            if to_minutes(slot.start_time) not in taken
+        ]
+        if slots:
+            await self.db.execute(
+                insert(TimeSlot),
+                [
+                    dict(schedule_id=schedule_id, start_time=slot.start_time, end_time=slot.end_time, is_available=True, is_booked=False)
+                    for slot in slots
+                ],
+            )
+        await self.db.execute(delete(ScheduleInterval).where(ScheduleInterval.schedule_id == schedule_id))
+
+        row_result = await self.db.execute(
+            select(TimeSlot.slot_id, TimeSlot.start_time).filter(TimeSlot.schedule_id == schedule_id)
+        )
+        row_ids = {row.start_time: row.slot_id for row in row_result.all()}
+        return {slot.slot_id: row_ids[slot.start_time] for slot in slots}
+
+    # Store the schedules in a date range as intervals where their slots allow it
+    async def compact_schedules(
+        self, start_date: date, end_date: date, barber_id: Optional[int] = None
+    ) -> ScheduleCompactResponse:
+        '''
+        Runs of back-to-back slots of equal length that are open, free and have never been
+        linked to an appointment become one interval each. Every other slot keeps its row,
+        so appointment history is untouched. Schedules already stored as intervals are
+        skipped. If a slot is booked while the compaction runs it is rolled back with a 409.
+        '''
+        if end_date < start_date:
+            raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+        if (end_date - start_date).days >= MAX_COMPACT_DAYS:
+            raise HTTPException(
+                status_code=400, detail=f"Schedules may be compacted for at most {MAX_COMPACT_DAYS} days at once"
+            )
+
+        try:
+            schedule_query = select(Schedule.schedule_id, Schedule.barber_id, Schedule.date).filter(
+                Schedule.date >= start_date,
+                Schedule.date <= end_date,
+                ~select(ScheduleInterval.interval_id)
+                .where(ScheduleInterval.schedule_id == Schedule.schedule_id)
+                .exists(),
+            )
+            if barber_id is not None:
+                schedule_query = schedule_query.filter(Schedule.barber_id == barber_id)
+            schedule_result = await self.db.execute(schedule_query)
+            schedules = {schedule.schedule_id: schedule for schedule in schedule_result.all()}
+            if not schedules:
+                return ScheduleCompactResponse(schedules_compacted=0, time_slots_removed=0, intervals_created=0)
+
+            slot_result = await self.db.execute(
+                select(
+                    TimeSlot.slot_id,
+                    TimeSlot.schedule_id,
+                    TimeSlot.start_time,
+                    TimeSlot.end_time,
+                    TimeSlot.is_available,
+                    TimeSlot.is_booked,
+                    select(Appointment_TimeSlot.slot_id)
+                    .where(Appointment_TimeSlot.slot_id == TimeSlot.slot_id)
+                    .exists()
+                    .label("is_linked"),
+                )
+                .filter(TimeSlot.schedule_id.in_(schedules))
+                .order_by(TimeSlot.schedule_id, TimeSlot.start_time)
+            )
+            slots_by_schedule = {}
+            for slot in slot_result.all():
+                slots_by_schedule.setdefault(slot.schedule_id, []).append(slot)
+
+            new_intervals = []
+            removed_slot_ids = []
+            for schedule_id, slots in slots_by_schedule.items():
+                for run in self._free_runs(slots):
+                    new_intervals.append(
+                        dict(
+                            schedule_id=schedule_id,
+                            start_time=run[0].start_time,
+                            end_time=run[-1].end_time,
+                            slot_minutes=to_minutes(run[0].end_time) - to_minutes(run[0].start_time),
+                        )
+                    )
+                    removed_slot_ids.extend(slot.slot_id for slot in run)
+            if not new_intervals:
+                return ScheduleCompactResponse(schedules_compacted=0, time_slots_removed=0, intervals_created=0)
+
+            # Only slots that are still free and unlinked may go
+            deleted = 0
+            for chunk_start in range(0, len(removed_slot_ids), DELETE_CHUNK_SIZE):
+                delete_result = await self.db.execute(
+                    delete(TimeSlot)
+                    .where(
+                        TimeSlot.slot_id.in_(removed_slot_ids[chunk_start:chunk_start + DELETE_CHUNK_SIZE]),
+                        TimeSlot.is_available.is_(True),
+                        TimeSlot.is_booked.is_(False),
+                        ~select(Appointment_TimeSlot.slot_id)
+                        .where(Appointment_TimeSlot.slot_id == TimeSlot.slot_id)
+                        .exists(),
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                deleted += delete_result.rowcount
+            if deleted != len(removed_slot_ids):
+                raise HTTPException(status_code=409, detail="Slots in the range were booked concurrently, try again")
+            await self.db.execute(insert(ScheduleInterval), new_intervals)
+
+            await self.db.commit()
+            compacted = {interval["schedule_id"] for interval in new_intervals}
+            invalidate_schedules(*compacted)
+            for schedule_id in compacted:
+                availability_index.invalidate(schedules[schedule_id].barber_id, schedules[schedule_id].date)
+            return ScheduleCompactResponse(
+                schedules_compacted=len(compacted),
+                time_slots_removed=len(removed_slot_ids),
+                intervals_created=len(new_intervals),
+            )
+        except HTTPException:
+            await self.db.rollback()
+            raise
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(e)
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred while compacting schedules",
+            )
+
+    # Split a schedule's slots, in start order, into runs that can become intervals
+    def _free_runs(self, slots: list) -> List[list]:
+        runs = []
+        run = []
+        for slot in slots:
+            if not slot.is_available or slot.is_booked or slot.is_linked:
+                run = []
+                continue
+            length = to_minutes(slot.end_time) - to_minutes(slot.start_time)
+            if (
+                run
+                and run[-1].end_time == slot.start_time
+                and to_minutes(run[-1].end_time) - to_minutes(run[-1].start_time) == length
+            ):
+                run.append(slot)
+            else:
+                run = [slot]
+                runs.append(run)
+        # A lone slot is stored as compactly as a row already
+        return [run for run in runs if len(run) > 1]
@@ -1,14 +1,31 @@
 import datetime
 
+from sqlalchemy import insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.exc import SQLAlchemyError
-from modules.user.models import Schedule, TimeSlot
-from modules.schedule_schema import ScheduleCreate, ScheduleUpdate
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from modules.user.models import Schedule, ScheduleInterval, TimeSlot
+from modules.user.loader_profiles import SCHEDULE_WITH_SLOTS
+from modules.schedule_schema import ScheduleCreate, ScheduleGrid, ScheduleUpdate
 from modules.time_slot_schema import TimeSlotUpdate
+from modules.availability.availability_index import MINUTES_PER_DAY, DayAvailability, availability_index, to_minutes
+from modules.schedule_intervals import interval_slots
+from modules.interval_checks import find_interval_problem
+from modules.schedule_cache import (
+    NO_SCHEDULE,
+    current_generation,
+    get_day_schedule_id,
+    get_schedule_json,
+    invalidate_days,
+    invalidate_schedules,
+    set_day_schedule_id,
+    set_schedule_json,
+)
+from operations.schedule_interval_operations import ScheduleIntervalOperations
 from typing import List, Optional
 from fastapi import HTTPException
 from datetime import time
+from math import gcd
 import logging
 
 
@@ -18,6 +35,12 @@ logger.setLevel(logging.ERROR)
 CRUD operations for interacting with the schedule database table
 """
 
+# Longest range of days a single schedule grid may cover
+MAX_GRID_DAYS = 31
+
+# Most schedule blocks a single bulk request may create
+MAX_BULK_SCHEDULES = 366
+
 
 class ScheduleOperations:
     def __init__(self, db: AsyncSession):
@@ -25,27 +48,87 @@ class ScheduleOperations:
 
     # Create a new schedule block
     async def create_schedule(self, schedule_data: ScheduleCreate) -> Schedule:
+        schedules = await self.create_schedules([schedule_data])
+        return schedules[0]
+
+    # Create schedule blocks for any barbers and days in a single transaction
+    async def create_schedules(self, schedules_data: List[ScheduleCreate]) -> List[Schedule]:
+        '''
+        Every block's slots are checked for overlaps before anything is written. The blocks
+        and then all of their slots go out as one multi-row insert each, and nothing is
+        committed unless every block could be created.
+        '''
+        if not 1 <= len(schedules_data) <= MAX_BULK_SCHEDULES:
+            raise HTTPException(
+                status_code=400, detail=f"Between 1 and {MAX_BULK_SCHEDULES} schedule blocks may be created at once"
+            )
+        days = [(schedule_data.barber_id, schedule_data.date) for schedule_data in schedules_data]
+        if len(set(days)) != len(days):
+            raise HTTPException(status_code=400, detail="A barber can have only one schedule block a day")
+        time_slots = {
+            day: [
+                (self._parse_time(time_slot.start_time), self._parse_time(time_slot.end_time), time_slot.is_available)
+                for time_slot in schedule_data.time_slots
+            ]
+            for day, schedule_data in zip(days, schedules_data)
+        }
+        problem = find_interval_problem(
+            {day: [(start, end) for start, end, _ in slots] for day, slots in time_slots.items()}
+        )
+        if problem:
+            raise HTTPException(status_code=400, detail=problem)
+
         try:
-            new_schedule = Schedule(**schedule_data.model_dump(exclude={"time_slots"}))
-            self.db.add(new_schedule)
-            await self.db.commit()
-            await self.db.refresh(new_schedule)
-
-            # Create time slots for the schedule, each 30 minutes
-            # starting from 9:00 AM to 5:00 PM
-            for time_slot in schedule_data.time_slots:
-                self.db.add(
-                    TimeSlot(
-                        schedule_id=new_schedule.schedule_id,
-                        start_time=time_slot.start_time,
-                        end_time=time_slot.end_time,
-                        is_available=time_slot.is_available,
+            await self.db.execute(
+                insert(Schedule),
+                [
+                    dict(
+                        barber_id=schedule_data.barber_id,
+                        date=schedule_data.date,
+                        is_working=schedule_data.is_working if schedule_data.is_working is not None else True,
                     )
+                    for schedule_data in schedules_data
+                ],
+            )
+
+            # Read the new schedule ids back to link their slots
+            created_result = await self.db.execute(
+                select(Schedule.schedule_id, Schedule.barber_id, Schedule.date).filter(
+                    Schedule.barber_id.in_({barber_id for barber_id, _ in days}),
+                    Schedule.date.in_({day for _, day in days}),
                 )
+            )
+            schedule_ids = {
+                (schedule.barber_id, schedule.date): schedule.schedule_id
+                for schedule in created_result.all()
+                if (schedule.barber_id, schedule.date) in time_slots
+            }
+            slot_rows = [
+                dict(schedule_id=schedule_ids[day], start_time=start, end_time=end, is_available=is_available, is_booked=False)
+                for day, slots in time_slots.items()
+                for start, end, is_available in slots
+            ]
+            if slot_rows:
+                await self.db.execute(insert(TimeSlot), slot_rows)
             await self.db.commit()
-            await self.db.refresh(new_schedule)
+            invalidate_days(*days)
 
-            return new_schedule
+            result = await self.db.execute(
+                select(Schedule)
+                .filter(Schedule.schedule_id.in_(schedule_ids.values()))
+                .options(*SCHEDULE_WITH_SLOTS)
+            )
+            schedules = {(schedule.barber_id, schedule.date): schedule for schedule in result.scalars().all()}
+            for schedule in schedules.values():
+                self._index_availability(schedule)
+            return [schedules[day] for day in days]
+        except IntegrityError as e:
+            logger.error(e)
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail="The barber already has a schedule block on that date, or a time slot is repeated",
+            )
         except SQLAlchemyError as e:
             logger.error(e)
             await self.db.rollback()
@@ -54,18 +137,48 @@ class ScheduleOperations:
                 detail="An unexpected error occurred during schedule block creation",
             )
 
-    # Get all schedule blocks
-    async def get_all_schedules(self, page: int, limit: int, schedule_date: datetime.date = None, barber_id: int = None) -> List[Schedule]:
+    # Get a page of schedule block responses as a JSON array, from the schedule cache when possible
+    async def get_schedules_json(
+        self, page: int, limit: int, schedule_date: datetime.date = None, barber_id: int = None
+    ) -> bytes:
+        '''
+        Only the ids of the page are queried, the responses come from the cache and the
+        missing ones are loaded together. Asking for one barber-day skips the id query too
+        once the barber-day is cached.
+        '''
         try:
-            # Calculate offset for SQL query
-            offset = (page - 1) * limit
-            select_query = select(Schedule).limit(limit).offset(offset)
-            if schedule_date:
-                select_query = select_query.filter(Schedule.date == schedule_date)
-            if barber_id:
-                select_query = select_query.filter(Schedule.barber_id == barber_id)
-            result = await self.db.execute(select_query)
-            return result.scalars().all()
+            if schedule_date and barber_id:
+                schedule_id = get_day_schedule_id(barber_id, schedule_date)
+                if schedule_id is None:
+                    generation = current_generation()
+                    result = await self.db.execute(
+                        select(Schedule.schedule_id).filter(
+                            Schedule.barber_id == barber_id, Schedule.date == schedule_date
+                        )
+                    )
+                    schedule_id = result.scalar() or NO_SCHEDULE
+                    set_day_schedule_id(barber_id, schedule_date, schedule_id, generation)
+                # A barber has at most one schedule a day
+                schedule_ids = [schedule_id] if schedule_id != NO_SCHEDULE and page == 1 else []
+            else:
+                select_query = (
+                    select(Schedule.schedule_id)
+                    .order_by(Schedule.schedule_id)
+                    .limit(limit)
+                    .offset((page - 1) * limit)
+                )
+                if schedule_date:
+                    select_query = select_query.filter(Schedule.date == schedule_date)
+                if barber_id:
+                    select_query = select_query.filter(Schedule.barber_id == barber_id)
+                result = await self.db.execute(select_query)
+                schedule_ids = result.scalars().all()
+
+            bodies = {schedule_id: get_schedule_json(schedule_id) for schedule_id in schedule_ids}
+            missing = [schedule_id for schedule_id, body in bodies.items() if body is None]
+            if missing:
+                bodies.update(await self._cache_schedules(missing))
+            return b"[" + b",".join(bodies[schedule_id] for schedule_id in schedule_ids if bodies.get(schedule_id)) + b"]"
         except SQLAlchemyError as e:
             logger.error(e)
             raise HTTPException(
@@ -73,15 +186,13 @@ class ScheduleOperations:
                 detail="An unexpected error occurred while fetching schedule blocks",
             )
 
-    # Get a specific schedule block by its id
-    async def get_schedule_by_id(self, schedule_id: int) -> Optional[Schedule]:
+    # Get a schedule block's response as JSON, from the schedule cache when possible
+    async def get_schedule_json(self, schedule_id: int) -> Optional[bytes]:
         try:
-            result = await self.db.execute(
-                select(Schedule)
-                .join(TimeSlot)
-                .filter(Schedule.schedule_id == schedule_id)
-            )
-            return result.scalars().first()
+            body = get_schedule_json(schedule_id)
+            if body is None:
+                body = (await self._cache_schedules([schedule_id])).get(schedule_id)
+            return body
         except SQLAlchemyError as e:
             logger.error(e)
             raise HTTPException(
@@ -89,10 +200,139 @@ class ScheduleOperations:
                 detail="An unexpected error occurred while fetching the schedule block",
             )
 
+    # Get every barber's schedule blocks over a date range as a barbers x days grid of slot bitmaps
+    async def get_schedule_grid(self, start_date: datetime.date, end_date: datetime.date) -> ScheduleGrid:
+        '''
+        One query loads the schedule blocks of the range, one their slot rows and one the
+        intervals of those stored as intervals. Each barber-day
+        is packed into bitmaps over a grid of the day shared by the whole range, the largest
+        unit every slot boundary falls on, and sent as hex strings.
+        '''
+        if end_date < start_date:
+            raise HTTPException(status_code=400, detail="to must not be before from")
+        if (end_date - start_date).days >= MAX_GRID_DAYS:
+            raise HTTPException(status_code=400, detail=f"A schedule grid may cover at most {MAX_GRID_DAYS} days")
+
+        try:
+            schedule_result = await self.db.execute(
+                select(Schedule.schedule_id, Schedule.barber_id, Schedule.date, Schedule.is_working)
+                .filter(Schedule.date >= start_date, Schedule.date <= end_date)
+            )
+            schedules = schedule_result.all()
+            slot_result = await self.db.execute(
+                select(
+                    TimeSlot.schedule_id,
+                    TimeSlot.start_time,
+                    TimeSlot.end_time,
+                    TimeSlot.is_available,
+                    TimeSlot.is_booked,
+                )
+                .join(Schedule, Schedule.schedule_id == TimeSlot.schedule_id)
+                .filter(Schedule.date >= start_date, Schedule.date <= end_date)
+            )
+            slots = [
+                (slot.schedule_id, to_minutes(slot.start_time), to_minutes(slot.end_time), slot.is_available, slot.is_booked)
+                for slot in slot_result.all()
+            ]
+            interval_result = await self.db.execute(
+                select(
+                    ScheduleInterval.schedule_id,
+                    ScheduleInterval.start_time,
+                    ScheduleInterval.end_time,
+                    ScheduleInterval.slot_minutes,
+                )
+                .join(Schedule, Schedule.schedule_id == ScheduleInterval.schedule_id)
+                .filter(Schedule.date >= start_date, Schedule.date <= end_date)
+            )
+            # Derived slots whose start already has a row are replaced by that row
+            taken = {(schedule_id, start) for schedule_id, start, _, _, _ in slots}
+            slots.extend(
+                (interval.schedule_id, to_minutes(slot.start_time), to_minutes(slot.end_time), True, False)
+                for interval in interval_result.all()
+                for slot in interval_slots(interval.schedule_id, interval)
+                if (interval.schedule_id, to_minutes(slot.start_time)) not in taken
+            )
+        except SQLAlchemyError as e:
+            logger.error(e)
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred while fetching the schedule grid",
+            )
+
+        unit = MINUTES_PER_DAY
+        for _, start, end, _, _ in slots:
+            unit = gcd(unit, gcd(start, end))
+
+        days = [start_date + datetime.timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+        barbers = sorted({schedule.barber_id for schedule in schedules})
+        day_index = {day: position for position, day in enumerate(days)}
+        barber_index = {barber: position for position, barber in enumerate(barbers)}
+
+        def empty_grid(value):
+            return [[value] * len(days) for _ in barbers]
+
+        schedule_ids, is_working = empty_grid(None), empty_grid(False)
+        cells = {}
+        for schedule in schedules:
+            row, column = barber_index[schedule.barber_id], day_index[schedule.date]
+            schedule_ids[row][column] = schedule.schedule_id
+            is_working[row][column] = schedule.is_working
+            cells[schedule.schedule_id] = (row, column)
+
+        covered, starts, available, booked = empty_grid(0), empty_grid(0), empty_grid(0), empty_grid(0)
+        for schedule_id, start, end, slot_available, slot_booked in slots:
+            row, column = cells[schedule_id]
+            first = start // unit
+            mask = ((1 << (end // unit - first)) - 1) << first
+            covered[row][column] |= mask
+            starts[row][column] |= 1 << first
+            if slot_available:
+                available[row][column] |= mask
+            if slot_booked:
+                booked[row][column] |= mask
+
+        def to_hex(grid):
+            return [[format(bits, "x") for bits in row] for row in grid]
+
+        return ScheduleGrid(
+            start_date=start_date,
+            end_date=end_date,
+            unit_minutes=unit,
+            days=days,
+            barbers=barbers,
+            schedule_id=schedule_ids,
+            is_working=is_working,
+            slots=to_hex(covered),
+            slot_starts=to_hex(starts),
+            available=to_hex(available),
+            booked=to_hex(booked),
+        )
+
+    # Load schedule responses, cache them as JSON and return them by schedule_id
+    async def _cache_schedules(self, schedule_ids: List[int]) -> dict:
+        # Writes that commit while the schedules load must keep them out of the cache
+        generation = current_generation()
+        result = await self.db.execute(
+            select(Schedule).filter(Schedule.schedule_id.in_(schedule_ids)).options(*SCHEDULE_WITH_SLOTS)
+        )
+        bodies = {}
+        for schedule in result.scalars().all():
+            body = schedule.to_response_schema().model_dump_json().encode()
+            set_schedule_json(schedule.schedule_id, schedule.barber_id, schedule.date, body, generation)
+            bodies[schedule.schedule_id] = body
+        return bodies
+
     # Update an existing schedule block
     async def update_schedule(
         self, schedule_id: int, schedule_data: ScheduleUpdate
     ) -> Optional[Schedule]:
+        '''
+        The schedule's slots are loaded with one query and reconciled in memory: entries
+        whose slot_id belongs to the schedule update that slot, any other entry adds a new
+        slot. The resulting day is checked for overlaps and booked slots must stay as they
+        are, then the changes go out as one bulk UPDATE and one bulk INSERT. A schedule stored
+        as intervals is turned into slot rows first.
+        '''
         try:
             result = await self.db.execute(
                 select(Schedule).filter(Schedule.schedule_id == schedule_id)
@@ -100,39 +340,45 @@ class ScheduleOperations:
             schedule = result.scalars().first()
             if not schedule:
                 return None
+            previous_day = (schedule.barber_id, schedule.date)
 
-            for key, value in schedule_data.model_dump(exclude_unset=True).items():
-                if key == "time_slots":
-                    # Update time slots if provided
-                    for time_slot in value:
-                        time_slot = TimeSlotUpdate(**time_slot)
-                        existing_time_slot = (
-                            await self.db.execute(
-                                select(TimeSlot)
-                                .filter(
-                                    TimeSlot.slot_id == time_slot.slot_id,
-                                    TimeSlot.schedule_id == schedule_id,
-                                )
-                            )
-                        ).scalars().first()
-                        if existing_time_slot:
-                            existing_time_slot.start_time = time_slot.start_time
-                            existing_time_slot.end_time = time_slot.end_time
-                            existing_time_slot.is_available = time_slot.is_available
-                        else:
-                            new_time_slot = TimeSlot(
-                                schedule_id=schedule.schedule_id,
-                                start_time=time_slot.start_time,
-                                end_time=time_slot.end_time,
-                                is_available=time_slot.is_available,
-                            )
-                            self.db.add(new_time_slot)
-                else:
-                    setattr(schedule, key, value)
+            update_data = schedule_data.model_dump(exclude_unset=True)
+            time_slots = update_data.pop("time_slots", None)
+            for key, value in update_data.items():
+                setattr(schedule, key, value)
+
+            if time_slots:
+                # Slots stored as intervals become rows first, so they can be edited one by one
+                materialized = await ScheduleIntervalOperations(self.db).materialize_schedule(schedule_id)
+                changes = [TimeSlotUpdate(**time_slot) for time_slot in time_slots]
+                for change in changes:
+                    change.slot_id = materialized.get(change.slot_id, change.slot_id)
+                slot_updates, slot_inserts = await self._reconcile_time_slots(schedule_id, changes)
+                if slot_updates:
+                    await self.db.execute(update(TimeSlot), slot_updates)
+                if slot_inserts:
+                    await self.db.execute(insert(TimeSlot), slot_inserts)
 
             await self.db.commit()
-            await self.db.refresh(schedule)
+            availability_index.invalidate(*previous_day)
+            invalidate_schedules(schedule_id)
+            invalidate_days(previous_day)
+
+            schedule = await self._load_schedule(schedule_id)
+            if schedule is not None:
+                invalidate_days((schedule.barber_id, schedule.date))
+            self._index_availability(schedule)
             return schedule
+        except HTTPException:
+            await self.db.rollback()
+            raise
+        except IntegrityError as e:
+            logger.error(e)
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail="The barber already has a schedule block on that date, or a time slot is repeated",
+            )
         except SQLAlchemyError as e:
             logger.error(e)
             await self.db.rollback()
@@ -141,6 +387,88 @@ class ScheduleOperations:
                 detail="An unexpected error occurred while updating the desired schedule block",
             )
 
+    # Work out the slot rows to update and insert for the requested changes
+    async def _reconcile_time_slots(
+        self, schedule_id: int, changes: List[TimeSlotUpdate]
+    ) -> tuple[List[dict], List[dict]]:
+        result = await self.db.execute(
+            select(
+                TimeSlot.slot_id,
+                TimeSlot.start_time,
+                TimeSlot.end_time,
+                TimeSlot.is_available,
+                TimeSlot.is_booked,
+            ).filter(TimeSlot.schedule_id == schedule_id)
+        )
+        slots = {slot.slot_id: slot._asdict() for slot in result.all()}
+
+        slot_updates = {}
+        slot_inserts = []
+        for change in changes:
+            values = {
+                "start_time": self._parse_time(change.start_time),
+                "end_time": self._parse_time(change.end_time),
+                "is_available": change.is_available,
+            }
+            values = {key: value for key, value in values.items() if value is not None}
+
+            slot = slots.get(change.slot_id)
+            if slot is None:
+                if "start_time" not in values or "end_time" not in values:
+                    raise HTTPException(status_code=400, detail="New time slots need a start_time and an end_time")
+                slot_inserts.append({"schedule_id": schedule_id, "is_available": True, "is_booked": False, **values})
+                continue
+
+            changed = {key: value for key, value in values.items() if slot[key] != value}
+            if not changed:
+                continue
+            if slot["is_booked"]:
+                raise HTTPException(status_code=409, detail="Booked time slots cannot be changed")
+            slot.update(changed)
+            slot_updates[change.slot_id] = {
+                "slot_id": change.slot_id,
+                "start_time": slot["start_time"],
+                "end_time": slot["end_time"],
+                "is_available": slot["is_available"],
+            }
+
+        # The day as it will be after the update must not have overlapping slots
+        problem = find_interval_problem(
+            {
+                schedule_id: [(slot["start_time"], slot["end_time"]) for slot in slots.values()]
+                + [(slot["start_time"], slot["end_time"]) for slot in slot_inserts]
+            }
+        )
+        if problem:
+            raise HTTPException(status_code=400, detail=problem)
+
+        return list(slot_updates.values()), slot_inserts
+
+    # Parse an HH:MM[:SS] time from a slot change
+    def _parse_time(self, value: Optional[str]) -> Optional[time]:
+        if value is None:
+            return None
+        try:
+            return time.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid time: {value}")
+
+    # Load a schedule with everything its response shows
+    async def _load_schedule(self, schedule_id: int) -> Optional[Schedule]:
+        result = await self.db.execute(
+            select(Schedule).filter(Schedule.schedule_id == schedule_id).options(*SCHEDULE_WITH_SLOTS)
+        )
+        return result.scalars().first()
+
+    # Replace the schedule's barber-day in the availability index with its current slots
+    def _index_availability(self, schedule: Optional[Schedule]):
+        if schedule is None:
+            return
+        if schedule.is_working:
+            availability_index.put(schedule.barber_id, schedule.date, DayAvailability(schedule.all_time_slots()))
+        else:
+            availability_index.invalidate(schedule.barber_id, schedule.date)
+
     # Delete a schedule block by id
     async def delete_schedule(self, schedule_id: int) -> bool:
         try:
@@ -150,8 +478,12 @@ class ScheduleOperations:
             schedule = result.scalars().first()
             if not schedule:
                 return False
+            day = (schedule.barber_id, schedule.date)
             await self.db.delete(schedule)
             await self.db.commit()
+            availability_index.invalidate(*day)
+            invalidate_schedules(schedule_id)
+            invalidate_days(day)
             return True
         except SQLAlchemyError as e:
             logger.error(e)
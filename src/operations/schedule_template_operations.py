@@ -0,0 +1,224 @@
+from datetime import date, datetime, timedelta, time
+from typing import List, Optional
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from fastapi import HTTPException
+from modules.user.models import Barber, Schedule, ScheduleInterval, ScheduleTemplate, TimeSlot
+from modules.schedule_template_schema import (
+    ScheduleGenerateResponse,
+    ScheduleTemplateResponse,
+    ScheduleTemplateWindow,
+)
+from modules.schedule_cache import invalidate_days
+from modules.interval_checks import find_interval_problem
+from core.config import settings
+import logging
+
+logger = logging.getLogger("schedule_template_operations")
+logger.setLevel(logging.ERROR)
+
+'''
+Weekly working-hour templates and the schedules generated from them.
+Generation is set-based: one query for the templates, one for the days that already have a
+schedule, then multi-row inserts for the new schedules and their slots in one transaction.
+With SCHEDULE_SLOT_STORAGE=intervals the template windows are stored as the schedules'
+intervals instead of one row per slot.
+'''
+
+# Longest range of days a single generation may cover
+MAX_GENERATE_DAYS = 366
+
+
+class ScheduleTemplateOperations:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # Get a barber's weekly template
+    async def get_template(self, barber_id: int) -> ScheduleTemplateResponse:
+        try:
+            result = await self.db.execute(
+                select(
+                    ScheduleTemplate.weekday,
+                    ScheduleTemplate.start_time,
+                    ScheduleTemplate.end_time,
+                    ScheduleTemplate.slot_minutes,
+                )
+                .filter(ScheduleTemplate.barber_id == barber_id)
+                .order_by(ScheduleTemplate.weekday, ScheduleTemplate.start_time)
+            )
+            return ScheduleTemplateResponse(
+                barber_id=barber_id,
+                windows=[ScheduleTemplateWindow.model_validate(row) for row in result.all()],
+            )
+        except SQLAlchemyError as e:
+            logger.error(e)
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred while fetching the schedule template",
+            )
+
+    # Replace a barber's weekly template
+    async def replace_template(
+        self, barber_id: int, windows: List[ScheduleTemplateWindow]
+    ) -> ScheduleTemplateResponse:
+        try:
+            barber_result = await self.db.execute(select(Barber.barber_id).filter(Barber.barber_id == barber_id))
+            if barber_result.first() is None:
+                raise HTTPException(status_code=400, detail="Invalid barber_id: Barber does not exist")
+
+            windows = sorted(windows, key=lambda window: (window.weekday, window.start_time))
+            weekdays = {}
+            for window in windows:
+                weekdays.setdefault(window.weekday, []).append((window.start_time, window.end_time))
+            problem = find_interval_problem(weekdays, "Template windows of a weekday")
+            if problem:
+                raise HTTPException(status_code=400, detail=problem)
+
+            await self.db.execute(delete(ScheduleTemplate).where(ScheduleTemplate.barber_id == barber_id))
+            if windows:
+                await self.db.execute(
+                    insert(ScheduleTemplate),
+                    [dict(barber_id=barber_id, **window.model_dump()) for window in windows],
+                )
+            await self.db.commit()
+            return ScheduleTemplateResponse(barber_id=barber_id, windows=windows)
+        except HTTPException:
+            await self.db.rollback()
+            raise
+        except SQLAlchemyError as e:
+            logger.error(e)
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred while saving the schedule template",
+            )
+
+    # Create the schedules and slots the templates call for over a date range
+    async def generate_schedules(
+        self, start_date: date, end_date: date, barber_id: Optional[int] = None
+    ) -> ScheduleGenerateResponse:
+        '''
+        Days that already have a schedule are skipped whatever it contains, so generating
+        the same range again changes nothing. If another request creates one of the
+        schedules at the same time the whole generation is rolled back with a 409.
+        '''
+        if end_date < start_date:
+            raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+        if (end_date - start_date).days >= MAX_GENERATE_DAYS:
+            raise HTTPException(
+                status_code=400, detail=f"Schedules may be generated for at most {MAX_GENERATE_DAYS} days at once"
+            )
+
+        try:
+            template_query = select(
+                ScheduleTemplate.barber_id,
+                ScheduleTemplate.weekday,
+                ScheduleTemplate.start_time,
+                ScheduleTemplate.end_time,
+                ScheduleTemplate.slot_minutes,
+            )
+            if barber_id is not None:
+                template_query = template_query.filter(ScheduleTemplate.barber_id == barber_id)
+            template_result = await self.db.execute(template_query)
+            windows = {}
+            for window in template_result.all():
+                windows.setdefault((window.barber_id, window.weekday), []).append(window)
+            if not windows:
+                return ScheduleGenerateResponse(schedules_created=0, time_slots_created=0, days_skipped=0)
+            barber_ids = {window_barber_id for window_barber_id, _ in windows}
+
+            existing_result = await self.db.execute(
+                select(Schedule.barber_id, Schedule.date).filter(
+                    Schedule.barber_id.in_(barber_ids),
+                    Schedule.date >= start_date,
+                    Schedule.date <= end_date,
+                )
+            )
+            existing = {tuple(row) for row in existing_result.all()}
+
+            days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+            planned = [
+                (day_barber_id, day)
+                for day in days
+                for day_barber_id in sorted(barber_ids)
+                if (day_barber_id, day.weekday()) in windows
+            ]
+            new_days = [key for key in planned if key not in existing]
+            if not new_days:
+                return ScheduleGenerateResponse(
+                    schedules_created=0, time_slots_created=0, days_skipped=len(planned)
+                )
+
+            await self.db.execute(
+                insert(Schedule),
+                [dict(barber_id=day_barber_id, date=day, is_working=True) for day_barber_id, day in new_days],
+            )
+
+            # Read the new schedule ids back to link their slots
+            created_result = await self.db.execute(
+                select(Schedule.schedule_id, Schedule.barber_id, Schedule.date).filter(
+                    Schedule.barber_id.in_(barber_ids),
+                    Schedule.date >= start_date,
+                    Schedule.date <= end_date,
+                )
+            )
+            new_day_set = set(new_days)
+            store_intervals = settings.get_config()["schedule_slot_storage"] == "intervals"
+            slot_rows = []
+            interval_rows = []
+            for schedule in created_result.all():
+                if (schedule.barber_id, schedule.date) not in new_day_set:
+                    continue
+                for window in windows[(schedule.barber_id, schedule.date.weekday())]:
+                    if store_intervals:
+                        interval_rows.append(
+                            dict(
+                                schedule_id=schedule.schedule_id,
+                                start_time=window.start_time,
+                                end_time=window.end_time,
+                                slot_minutes=window.slot_minutes,
+                            )
+                        )
+                        continue
+                    slot_rows.extend(
+                        dict(schedule_id=schedule.schedule_id, start_time=start, end_time=end, is_available=True, is_booked=False)
+                        for start, end in self._slot_times(window.start_time, window.end_time, window.slot_minutes)
+                    )
+            if slot_rows:
+                await self.db.execute(insert(TimeSlot), slot_rows)
+            if interval_rows:
+                await self.db.execute(insert(ScheduleInterval), interval_rows)
+
+            await self.db.commit()
+            invalidate_days(*new_days)
+            return ScheduleGenerateResponse(
+                schedules_created=len(new_days),
+                time_slots_created=len(slot_rows),
+                intervals_created=len(interval_rows),
+                days_skipped=len(planned) - len(new_days),
+            )
+        except IntegrityError as e:
+            await self.db.rollback()
+            logger.error(e)
+            raise HTTPException(status_code=409, detail="Schedules in the range were created concurrently, try again")
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(e)
+            raise HTTPException(
+                status_code=500,
+                detail="An unexpected error occurred while generating schedules",
+            )
+
+    # Start and end times of the whole slots that fit in a window
+    def _slot_times(self, start_time: time, end_time: time, slot_minutes: int) -> List[tuple[time, time]]:
+        start = datetime.combine(date.min, start_time)
+        end = datetime.combine(date.min, end_time)
+        step = timedelta(minutes=slot_minutes)
+        times = []
+        while start + step <= end:
+            times.append((start.time(), (start + step).time()))
+            start += step
+        return times
@@ -50,13 +50,10 @@ class ThreadOperations:
             await self.db.commit()
             await self.db.refresh(new_thread)
 
-            await self.db.refresh(existing_user_one_result)
-            await self.db.refresh(existing_user_two_result)
-
             return ThreadResponse(
                 thread_id=new_thread.thread_id,
-                receivingUser=new_thread.receiving_user.user_id,
-                sendingUser=new_thread.sending_user.user_id
+                receivingUser=new_thread.receivingUser,
+                sendingUser=new_thread.sendingUser
             )
         
         except SQLAlchemyError as e:
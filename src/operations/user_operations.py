@@ -1,13 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
-from modules.user.models import User
+from modules.user.models import Barber, Schedule, User, KeycloakOperation
 from modules.user.user_schema import UserCreate, UserUpdate, UserPasswordUpdate, UserResponse
 from typing import List, Optional
 from fastapi import HTTPException
 from sqlalchemy import or_
 
 from auth.service import AuthService
+from auth.identity_cache import invalidate_identity
+from modules.schedule_cache import invalidate_days, invalidate_schedules
+from operations.provisioning_operations import ProvisioningOperations
+from workers.provisioning_worker import provisioning_worker
 import logging
 
 logger = logging.getLogger("user_operations")
@@ -50,22 +54,15 @@ class UserOperations:
             )
 
         try:
-            # Creates a new user
+            # Creates a new user, the Keycloak account is created by the provisioning worker
             new_user = User(**user_data.model_dump())
-            try:
-                kc_id = AuthService.register_kc_user(new_user)
-                if not kc_id:
-                    raise HTTPException(status_code=400, detail="Keycloak user creation has failed")
-                new_user.kc_id = kc_id
-            except Exception as e:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Error creating Keycloak user: {str(e)}"
-                )
             self.db.add(new_user)
+            await self.db.flush()
+            ProvisioningOperations(self.db).enqueue(new_user.user_id, KeycloakOperation.create_user)
             await self.db.commit()
             await self.db.refresh(new_user)
-            
+            provisioning_worker.wake()
+
             return new_user
         # If another error is returned that was somehow not caught above, return generic error message.
         except SQLAlchemyError as e:
@@ -177,21 +174,16 @@ class UserOperations:
             for key, value in user_data.model_dump(exclude_unset=True).items():
                 setattr(user, key, value)
 
-            # Update Keycloak user data# Update user in Keycloak
-            try:
-                AuthService.update_kc_user(user)
-            except Exception as e:
-                logger.error(e)
-                # Rollback database changes if Keycloak update fails
-                await self.db.rollback()
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Error updating Keycloak user: {str(e)}"
-                )
-            
-            # Update database user data
+            # Update database user data and queue the matching Keycloak update
+            ProvisioningOperations(self.db).enqueue(user.user_id, KeycloakOperation.update_user)
+            kc_id = user.kc_id
+            schedules = await self._barber_schedules(user_id)
             await self.db.commit()
+            invalidate_identity(kc_id)
+            # Cached schedules embed their barber's user details
+            invalidate_schedules(*(schedule.schedule_id for schedule in schedules))
             await self.db.refresh(user)
+            provisioning_worker.wake()
 
             return user
     
@@ -212,12 +204,23 @@ class UserOperations:
             if not user:
                 return False
             
-            # Delete user from Keycloak server
-            AuthService.delete_kc_user(user.email)
+            # Queue the Keycloak deletion, keeping what is needed to find the account later
+            ProvisioningOperations(self.db).enqueue(
+                user.user_id,
+                KeycloakOperation.delete_user,
+                {"kc_id": user.kc_id, "email": user.email},
+            )
 
             # Delete user from database
+            kc_id = user.kc_id
+            # A barber's schedules go with the user, read them before the cascade
+            schedules = await self._barber_schedules(user_id)
             await self.db.delete(user)
             await self.db.commit()
+            invalidate_identity(kc_id)
+            invalidate_schedules(*(schedule.schedule_id for schedule in schedules))
+            invalidate_days(*((schedule.barber_id, schedule.date) for schedule in schedules))
+            provisioning_worker.wake()
             return True
         
         # Handle generic exceptions, wrong ID provided error already handled in router
@@ -229,6 +232,15 @@ class UserOperations:
                 detail="An unexpected error occured"
             )
         
+    # Get the schedules of the barber a user is, if any
+    async def _barber_schedules(self, user_id: int) -> list:
+        result = await self.db.execute(
+            select(Schedule.schedule_id, Schedule.barber_id, Schedule.date)
+            .join(Barber, Barber.barber_id == Schedule.barber_id)
+            .filter(Barber.user_id == user_id)
+        )
+        return result.all()
+
     # Update user password
     async def update_user_password(self, user_id: int, password_data: UserPasswordUpdate) -> bool:
         try:
@@ -240,7 +252,7 @@ class UserOperations:
             
             # Check if the old password is correct
             try:
-                AuthService.authenticate_user(user.email, password_data.old_password)
+                await AuthService.authenticate_user(user.email, password_data.old_password)
             except Exception as e:
                 logger.error(e)
                 raise HTTPException(status_code=400, detail="Old password is incorrect")
@@ -251,7 +263,7 @@ class UserOperations:
 
             # Update the user's password in Keycloak
             try:
-                AuthService.update_kc_user_password(user.kc_id, password_data.new_password)
+                await AuthService.update_kc_user_password(user.kc_id, password_data.new_password)
             except Exception as e:
                 logger.error(e)
                 # Rollback database changes if Keycloak update fails
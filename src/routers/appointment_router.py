@@ -1,17 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 
 
-from typing import List
+from typing import List, Optional
 from core.dependencies import DBSessionDep
 from operations.appointment_operations import AppointmentOperations
 from modules.appointment_schema import (
+    AppointmentBatchCreate,
+    AppointmentBatchResponse,
     AppointmentResponse,
     AppointmentCreate,
     AppointmentUpdate,
 )
 from modules.user.error_response_schema import ErrorResponse
-from auth.controller import AuthController
+from auth.dependencies import Principal, PrincipalDep
 import logging
 
 """
@@ -23,7 +24,21 @@ appointment_router = APIRouter(
     tags=["appointments"],
 )
 
-bearer_scheme = HTTPBearer()
+
+# Resolve whose appointments to list, reusing the caller's identity when they ask for their own
+async def resolve_appointment_owner(
+    principal: Principal, user_id: Optional[int], is_barber: bool
+) -> tuple[int, Optional[int]]:
+    caller_user_id = await principal.get_user_id()
+    if user_id is None or user_id == caller_user_id:
+        return caller_user_id, (await principal.get_barber_id() if is_barber else None)
+    return user_id, None
+
+
+# Listings return the cursor of their next page in a header, keeping the body a plain list
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
 
 
 # POST endpoint to create a new appointment in the database
@@ -39,6 +54,21 @@ async def create_appointment(appointment: AppointmentCreate, db_session: DBSessi
     return created_appointment
 
 
+# POST endpoint to book several appointments, or a recurring one, in one request
+@appointment_router.post(
+    "/batch",
+    response_model=AppointmentBatchResponse,
+    responses={400: {"model": ErrorResponse}, 403: {"model": ErrorResponse}, 500: {"model": ErrorResponse}},
+)
+async def create_appointments(batch: AppointmentBatchCreate, db_session: DBSessionDep, principal: PrincipalDep):
+    # Clients book for themselves, barbers and admins may book for anyone
+    if not (principal.has_role("barber") or principal.has_role("admin")):
+        if batch.user_id != await principal.get_user_id():
+            raise HTTPException(status_code=403, detail="***Access denied. Appointments can only be booked for yourself.")
+    appointment_ops = AppointmentOperations(db_session)
+    return await appointment_ops.create_appointments(batch)
+
+
 # Get endpoint to get all appointments from the database
 @appointment_router.get(
     "",
@@ -47,15 +77,23 @@ async def create_appointment(appointment: AppointmentCreate, db_session: DBSessi
 )
 async def get_appointments(
     db_session: DBSessionDep,
-    page: int,
-    limit: int,
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    response: Response,
+    principal: PrincipalDep,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    page: Optional[int] = Query(None, ge=1),
     user_id: int = None,
     barber_id: int = None,
 ):
-    AuthController.protected_endpoint(credentials)
+    is_barber = barber_id is not None
+    if not is_barber:
+        user_id, barber_id = await resolve_appointment_owner(principal, user_id, is_barber)
     appointment_ops = AppointmentOperations(db_session)
-    return await appointment_ops.get_all_appointments(page, limit, user_id, barber_id)
+    appointments, next_cursor = await appointment_ops.get_all_appointments(
+        limit, is_barber, user_id, barber_id=barber_id, cursor=cursor, page=page
+    )
+    set_next_cursor(response, next_cursor)
+    return appointments
 
 @appointment_router.get(
     "/upcoming",
@@ -65,15 +103,21 @@ async def get_appointments(
 )
 async def get_appointments_upcoming(
     db_session: DBSessionDep,
-    page: int,
-    limit: int,
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    response: Response,
+    principal: PrincipalDep,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    page: Optional[int] = Query(None, ge=1),
     user_id: int = None,
     is_barber: bool = False,
 ):
-    AuthController.protected_endpoint(credentials)
+    user_id, barber_id = await resolve_appointment_owner(principal, user_id, is_barber)
     appointment_ops = AppointmentOperations(db_session)
-    return await appointment_ops.get_all_appointments(page, limit, is_barber, user_id, is_upcoming=True)
+    appointments, next_cursor = await appointment_ops.get_all_appointments(
+        limit, is_barber, user_id, barber_id=barber_id, is_upcoming=True, cursor=cursor, page=page
+    )
+    set_next_cursor(response, next_cursor)
+    return appointments
 
 @appointment_router.get(
     "/past",
@@ -83,15 +127,21 @@ async def get_appointments_upcoming(
 )
 async def get_appointments_past(
     db_session: DBSessionDep,
-    page: int,
-    limit: int,
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    response: Response,
+    principal: PrincipalDep,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    page: Optional[int] = Query(None, ge=1),
     user_id: int = None,
     is_barber: bool = False,
 ):
-    AuthController.protected_endpoint(credentials)
+    user_id, barber_id = await resolve_appointment_owner(principal, user_id, is_barber)
     appointment_ops = AppointmentOperations(db_session)
-    return await appointment_ops.get_all_appointments(page, limit, is_barber, user_id, is_past=True)
+    appointments, next_cursor = await appointment_ops.get_all_appointments(
+        limit, is_barber, user_id, barber_id=barber_id, is_past=True, cursor=cursor, page=page
+    )
+    set_next_cursor(response, next_cursor)
+    return appointments
 
 # GET endpoint to retrieve a specific appointment from the database by the appointment_id
 @appointment_router.get(
@@ -102,9 +152,8 @@ async def get_appointments_past(
 async def get_appointment(
     appointment_id: int,
     db_session: DBSessionDep,
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    principal: PrincipalDep,
 ):
-    AuthController.protected_endpoint(credentials)
     appointment_ops = AppointmentOperations(db_session)
     appointment = await appointment_ops.get_appointment_by_id(appointment_id)
     if not appointment:
@@ -134,7 +183,7 @@ async def update_appointment(
     return updated_appointment
 
 
-# DELETE endpoint to delete an appointment from the database by the appointment_id
+# DELETE endpoint to cancel an appointment by the appointment_id, the appointment is kept as canceled
 @appointment_router.delete(
     "/{appointment_id}",
     response_model=dict,
@@ -143,13 +192,12 @@ async def update_appointment(
 async def delete_appointment(
     appointment_id: int,
     db_session: DBSessionDep,
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    principal: PrincipalDep,
 ):
-    AuthController.protected_endpoint(credentials)
     appointment_ops = AppointmentOperations(db_session)
-    success = await appointment_ops.delete_appointment(appointment_id)
+    success = await appointment_ops.cancel_appointment(appointment_id)
     if not success:
         raise HTTPException(
             status_code=404, detail="Appointment with ID provided not found"
         )
-    return {"message": "Appointment deleted successfully"}
+    return {"message": "Appointment canceled successfully"}
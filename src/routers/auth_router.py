@@ -20,4 +20,4 @@ async def login(username: str = Form(...), password: str = Form(...)):
     Returns:
         TokenResponse: Contains the access token upon successful authentication.
     """
-    return AuthController.login(username, password)
+    return await AuthController.login(username, password)
@@ -0,0 +1,38 @@
+import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Query
+
+from core.dependencies import DBSessionDep
+from modules.availability.availability_schema import AvailabilityOpening
+from operations.availability_operations import AvailabilityOperations
+from modules.user.error_response_schema import ErrorResponse
+from auth.dependencies import PrincipalDep
+
+"""
+Endpoints for searching free openings
+"""
+
+availability_router = APIRouter(
+    prefix="/api/v1/availability",
+    tags=["availability"],
+)
+
+
+# GET endpoint to find the earliest openings for a service, across barbers or for one
+@availability_router.get("", response_model=List[AvailabilityOpening], responses={
+    400: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def get_availability(
+    db_session: DBSessionDep,
+    principal: PrincipalDep,
+    service_id: int,
+    from_date: datetime.date = Query(..., alias="from"),
+    to_date: datetime.date = Query(..., alias="to"),
+    barber_id: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+):
+    availability_ops = AvailabilityOperations(db_session)
+    response = await availability_ops.find_openings(service_id, from_date, to_date, barber_id, limit)
+
+    return response
@@ -1,54 +1,73 @@
 import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from operations.barber_operations import BarberOperations
 from core.dependencies import DBSessionDep
-from modules.user.barber_schema import BarberResponse, BarberCreate
+from modules.user.barber_schema import BarberResponse, BarberCreate, BarberBatchCreate, BarberListResponse
 from typing import List
-from auth.controller import AuthController
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from auth.dependencies import Principal, PrincipalDep, require_role
 from modules.user.error_response_schema import ErrorResponse
 
 barber_router = APIRouter(
     prefix="/api/v1/barbers",
     tags=["barbers"],
 )
-# Initialize the HTTPBearer scheme for authentication
-bearer_scheme = HTTPBearer()
 
 # POST endpoint to create a barber for an existing user by user_id
 @barber_router.post("", response_model=BarberResponse, responses = {
     400: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
 })
-async def create_barber(user: BarberCreate, db_session: DBSessionDep, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+async def create_barber(
+    user: BarberCreate,
+    db_session: DBSessionDep,
     # Checks for barber role
-    AuthController.protected_endpoint(credentials, required_role="barber")
-    
+    principal: Principal = Depends(require_role("barber")),
+):
     barber_ops = BarberOperations(db_session)
     response = await barber_ops.create_barber(user)
 
     return response.to_response_schema()
 
-# GET endpoint to retrieve all barbers
-@barber_router.get("", response_model=List[BarberResponse], responses = {
+# POST endpoint to create barbers for many existing users by user_id
+@barber_router.post("/batch", response_model=List[BarberResponse], responses = {
+    400: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+}, operation_id="createBarbers")
+async def create_barbers(
+    users: BarberBatchCreate,
+    db_session: DBSessionDep,
+    # Checks for barber role
+    principal: Principal = Depends(require_role("barber")),
+):
+    barber_ops = BarberOperations(db_session)
+    response = await barber_ops.create_barbers(users)
+
+    return [barber.to_response_schema() for barber in response]
+
+# GET endpoint to retrieve all barbers, or the ones working on a date with their free slots
+@barber_router.get("", response_model=List[BarberListResponse], responses = {
+    400: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
 })
 async def get_all_barbers(
     db_session: DBSessionDep, 
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    principal: PrincipalDep,
     page: int = Query(1, ge=1),
-    limit: int = Query(10, le=100),
+    limit: int = Query(10, ge=1, le=100),
     # Optional query parameters
     schedule_date: Optional[datetime.date] = Query(None, description="Date to filter barbers by schedule"),
+    min_free_slots: Optional[int] = Query(None, ge=1, description="Least free slots a barber must have on schedule_date"),
+    service_id: Optional[int] = Query(None, description="Service a barber must have enough back-to-back free slots for on schedule_date"),
 ):
-    AuthController.protected_endpoint(credentials)
     barber_ops = BarberOperations(db_session)
-    response = await barber_ops.get_all_barbers(page, limit)
     if schedule_date:
-        response = await barber_ops.list_barbers_by_schedule_date(schedule_date, page, limit)
+        return await barber_ops.list_barbers_by_schedule_date(schedule_date, page, limit, min_free_slots, service_id)
+    if min_free_slots is not None or service_id is not None:
+        raise HTTPException(status_code=400, detail="schedule_date is required to filter by free slots")
 
+    response = await barber_ops.get_all_barbers(page, limit)
     barbers: List[BarberResponse] = []
     for barber in response:
         barbers.append(barber.to_response_schema())
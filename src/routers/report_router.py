@@ -0,0 +1,94 @@
+import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+
+from core.dependencies import DBSessionDep
+from modules.report_schema import BarberIdleGaps, BarberUtilization, LeadTimeReport, UtilizationHeatmap
+from operations.report_operations import ReportOperations
+from modules.user.error_response_schema import ErrorResponse
+from auth.dependencies import Principal, require_role
+
+"""
+Endpoints for the shop's utilisation reports
+"""
+
+report_router = APIRouter(
+    prefix="/api/v1/reports",
+    tags=["reports"],
+)
+
+
+# GET endpoint for the booked share of each barber's open time
+@report_router.get("/utilization", response_model=List[BarberUtilization], responses={
+    400: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def get_utilization(
+    db_session: DBSessionDep,
+    from_date: datetime.date = Query(..., alias="from"),
+    to_date: datetime.date = Query(..., alias="to"),
+    barber_id: Optional[int] = None,
+    # Checks for admin role
+    principal: Principal = Depends(require_role("admin")),
+):
+    report_ops = ReportOperations(db_session)
+    response = await report_ops.get_utilization(from_date, to_date, barber_id)
+
+    return response
+
+
+# GET endpoint for the idle time between each barber's bookings
+@report_router.get("/idle-gaps", response_model=List[BarberIdleGaps], responses={
+    400: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def get_idle_gaps(
+    db_session: DBSessionDep,
+    from_date: datetime.date = Query(..., alias="from"),
+    to_date: datetime.date = Query(..., alias="to"),
+    barber_id: Optional[int] = None,
+    # Checks for admin role
+    principal: Principal = Depends(require_role("admin")),
+):
+    report_ops = ReportOperations(db_session)
+    response = await report_ops.get_idle_gaps(from_date, to_date, barber_id)
+
+    return response
+
+
+# GET endpoint for open and booked time by weekday and hour
+@report_router.get("/heatmap", response_model=UtilizationHeatmap, responses={
+    400: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def get_heatmap(
+    db_session: DBSessionDep,
+    from_date: datetime.date = Query(..., alias="from"),
+    to_date: datetime.date = Query(..., alias="to"),
+    barber_id: Optional[int] = None,
+    # Checks for admin role
+    principal: Principal = Depends(require_role("admin")),
+):
+    report_ops = ReportOperations(db_session)
+    response = await report_ops.get_heatmap(from_date, to_date, barber_id)
+
+    return response
+
+
+# GET endpoint for how far ahead appointments are booked
+@report_router.get("/lead-time", response_model=LeadTimeReport, responses={
+    400: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def get_lead_time(
+    db_session: DBSessionDep,
+    from_date: datetime.date = Query(..., alias="from"),
+    to_date: datetime.date = Query(..., alias="to"),
+    barber_id: Optional[int] = None,
+    # Checks for admin role
+    principal: Principal = Depends(require_role("admin")),
+):
+    report_ops = ReportOperations(db_session)
+    response = await report_ops.get_lead_time(from_date, to_date, barber_id)
+
+    return response
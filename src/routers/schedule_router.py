@@ -1,15 +1,30 @@
 import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from core.db import get_db_session
 from core.dependencies import DBSessionDep
 from operations.schedule_operations import ScheduleOperations
-from modules.schedule_schema import ScheduleResponse, ScheduleCreate, ScheduleUpdate, TimeSlotChildResponse
-from auth.controller import AuthController
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from operations.schedule_template_operations import ScheduleTemplateOperations
+from operations.schedule_interval_operations import ScheduleIntervalOperations
+from modules.schedule_template_schema import (
+    ScheduleGenerate,
+    ScheduleGenerateResponse,
+    ScheduleTemplateResponse,
+    ScheduleTemplateUpdate,
+)
+from modules.schedule_schema import (
+    ScheduleCompact,
+    ScheduleCompactResponse,
+    ScheduleCreate,
+    ScheduleGrid,
+    ScheduleResponse,
+    ScheduleUpdate,
+    TimeSlotChildResponse,
+)
+from auth.dependencies import Principal, PrincipalDep, require_role
 import logging
 from modules.user.error_response_schema import ErrorResponse
 
@@ -21,15 +36,14 @@ schedule_router = APIRouter(
     prefix="/api/v1/schedules",
     tags=["schedules"],
 )
-# Initialize the HTTPBearer scheme for authentication
-bearer_scheme = HTTPBearer()
 
 # POST endpoint to create a new schedule block in the database
 @schedule_router.post("", response_model=ScheduleResponse, responses = {
+    400: {"model": ErrorResponse},
+    409: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
 })
-async def create_schedule(schedule: ScheduleCreate, db_session: DBSessionDep, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
-    AuthController.protected_endpoint(credentials, required_role="barber")
+async def create_schedule(schedule: ScheduleCreate, db_session: DBSessionDep, principal: Principal = Depends(require_role("barber"))):
     # try:
     schedule_ops = ScheduleOperations(db_session)
     created_schedule = await schedule_ops.create_schedule(schedule)
@@ -41,24 +55,98 @@ async def create_schedule(schedule: ScheduleCreate, db_session: DBSessionDep, cr
     #     logging.error(e)
     #     raise HTTPException(status_code=500, detail="An unexpected error occurred during schedule block creation")
 
+# POST endpoint to create schedule blocks for several barbers and days at once
+@schedule_router.post("/bulk", response_model=List[ScheduleResponse], responses = {
+    400: {"model": ErrorResponse},
+    409: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def create_schedules(schedules: List[ScheduleCreate], db_session: DBSessionDep, principal: Principal = Depends(require_role("barber"))):
+    schedule_ops = ScheduleOperations(db_session)
+    created_schedules = await schedule_ops.create_schedules(schedules)
+    return [schedule.to_response_schema() for schedule in created_schedules]
+
 # GET endpoint to get all schedule blocks from the database
 @schedule_router.get("", response_model=List[ScheduleResponse], responses = {
     500: {"model": ErrorResponse}
 })
 async def get_schedules(
     db_session: DBSessionDep, 
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    principal: PrincipalDep,
     page : int = Query(1, ge=1),
     limit: int = Query(10, le=100),
     # Optional query parameters
     schedule_date: Optional[datetime.date] = Query(None, description="Date to filter barbers by schedule"),
     barber_id: Optional[int] = Query(None, description="Barber ID to filter schedules by"),
 ):
-    AuthController.protected_endpoint(credentials)
+    # Responses are served already serialized from the schedule cache
+    schedule_ops = ScheduleOperations(db_session)
+    body = await schedule_ops.get_schedules_json(page, limit, schedule_date, barber_id)
+    return Response(content=body, media_type="application/json")
 
+# GET endpoint to retrieve every barber's schedule blocks over a date range as a grid of slot bitmaps
+@schedule_router.get("/grid", response_model=ScheduleGrid, responses = {
+    400: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def get_schedule_grid(
+    db_session: DBSessionDep,
+    principal: PrincipalDep,
+    start_date: datetime.date = Query(..., alias="from"),
+    end_date: datetime.date = Query(..., alias="to"),
+):
     schedule_ops = ScheduleOperations(db_session)
-    results = await schedule_ops.get_all_schedules(page, limit, schedule_date, barber_id)
-    return [schedule.to_response_schema() for schedule in results]
+    return await schedule_ops.get_schedule_grid(start_date, end_date)
+
+# GET endpoint to retrieve a barber's weekly schedule template
+@schedule_router.get("/templates/{barber_id}", response_model=ScheduleTemplateResponse, responses = {
+    500: {"model": ErrorResponse}
+})
+async def get_schedule_template(barber_id: int, db_session: DBSessionDep, principal: PrincipalDep):
+    template_ops = ScheduleTemplateOperations(db_session)
+    return await template_ops.get_template(barber_id)
+
+# PUT endpoint to replace a barber's weekly schedule template
+@schedule_router.put("/templates/{barber_id}", response_model=ScheduleTemplateResponse, responses = {
+    400: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def replace_schedule_template(
+    barber_id: int,
+    template: ScheduleTemplateUpdate,
+    db_session: DBSessionDep,
+    principal: Principal = Depends(require_role("barber")),
+):
+    template_ops = ScheduleTemplateOperations(db_session)
+    return await template_ops.replace_template(barber_id, template.windows)
+
+# POST endpoint to generate schedule blocks from the weekly templates over a date range
+@schedule_router.post("/generate", response_model=ScheduleGenerateResponse, responses = {
+    400: {"model": ErrorResponse},
+    409: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def generate_schedules(
+    request: ScheduleGenerate,
+    db_session: DBSessionDep,
+    principal: Principal = Depends(require_role("barber")),
+):
+    template_ops = ScheduleTemplateOperations(db_session)
+    return await template_ops.generate_schedules(request.start_date, request.end_date, request.barber_id)
+
+# POST endpoint to store the schedule blocks of a date range as working intervals instead of slot rows
+@schedule_router.post("/compact", response_model=ScheduleCompactResponse, responses = {
+    400: {"model": ErrorResponse},
+    409: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def compact_schedules(
+    request: ScheduleCompact,
+    db_session: DBSessionDep,
+    principal: Principal = Depends(require_role("admin")),
+):
+    interval_ops = ScheduleIntervalOperations(db_session)
+    return await interval_ops.compact_schedules(request.start_date, request.end_date, request.barber_id)
 
 # GET endpoint to retrieve a specific schedule block from the database by the schedule_id
 @schedule_router.get("/{schedule_id}", response_model=ScheduleResponse, responses = {
@@ -68,18 +156,18 @@ async def get_schedules(
 async def get_schedule(schedule_id: int, db_session: DBSessionDep):
     
     schedule_ops = ScheduleOperations(db_session)
-    schedule = await schedule_ops.get_schedule_by_id(schedule_id)
+    body = await schedule_ops.get_schedule_json(schedule_id)
 
-    if not schedule:
+    if not body:
         raise HTTPException(status_code=404, detail="Schedule block with ID provided not found")
-    return schedule.to_response_schema()
+    return Response(content=body, media_type="application/json")
 
 # PUT endpoint to update a specific schedule block in the database by the schedule_id
 @schedule_router.put("/{schedule_id}", response_model=ScheduleResponse, responses = {
     404: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
 })
-async def update_schedule(schedule_id: int, schedule: ScheduleUpdate, db_session: DBSessionDep, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+async def update_schedule(schedule_id: int, schedule: ScheduleUpdate, db_session: DBSessionDep, principal: PrincipalDep):
     
     schedule_ops = ScheduleOperations(db_session)
     updated_schedule = await schedule_ops.update_schedule(schedule_id, schedule)
@@ -92,7 +180,7 @@ async def update_schedule(schedule_id: int, schedule: ScheduleUpdate, db_session
     404: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
 })
-async def delete_schedule(schedule_id: int, db_session: DBSessionDep, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+async def delete_schedule(schedule_id: int, db_session: DBSessionDep, principal: PrincipalDep):
     
     schedule_ops = ScheduleOperations(db_session)
     success = await schedule_ops.delete_schedule(schedule_id)
@@ -5,24 +5,23 @@ from core.dependencies import DBSessionDep
 from modules.user.service_schema import ServiceBase, ServiceResponse, ServiceUpdate
 from operations.service_operations import ServiceOperations
 from modules.user.error_response_schema import ErrorResponse
-from auth.controller import AuthController
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from auth.dependencies import Principal, require_role
 
 service_router = APIRouter(
     prefix="/api/v1/services",
     tags=["services"],
 )
-# Initialize the HTTPBearer scheme for authentication
-bearer_scheme = HTTPBearer()
 
 # POST endpoint to create a service
 @service_router.post("", response_model=ServiceResponse, responses = {
     500: {"model": ErrorResponse}
 })
-async def create_service(service: ServiceBase, db_session: DBSessionDep, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+async def create_service(
+    service: ServiceBase,
+    db_session: DBSessionDep,
     # Checks for barber role
-    AuthController.protected_endpoint(credentials, required_role="barber")
-    
+    principal: Principal = Depends(require_role("barber")),
+):
     service_ops = ServiceOperations(db_session)
     response = await service_ops.create_service(service)
 
@@ -48,10 +47,13 @@ async def get_all_services(
     400: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
 })
-async def update_service(db_session: DBSessionDep, service_id: int, service_details: ServiceUpdate, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+async def update_service(
+    db_session: DBSessionDep,
+    service_id: int,
+    service_details: ServiceUpdate,
     # Checks for barber role
-    AuthController.protected_endpoint(credentials, required_role="barber")
-    
+    principal: Principal = Depends(require_role("barber")),
+):
     service_ops = ServiceOperations(db_session)
     response = await service_ops.update_service(service_id, service_details)
 
@@ -62,11 +64,12 @@ async def update_service(db_session: DBSessionDep, service_id: int, service_deta
     400: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
 })
-async def delete_service(db_session: DBSessionDep, service_id: int, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+async def delete_service(
+    db_session: DBSessionDep,
+    service_id: int,
     # Checks for barber role
-    AuthController.protected_endpoint(credentials, required_role="barber")
-    
-    
+    principal: Principal = Depends(require_role("barber")),
+):
     service_ops = ServiceOperations(db_session)
     response = await service_ops.delete_service(service_id)
 
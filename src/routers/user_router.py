@@ -2,10 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List
 from core.dependencies import DBSessionDep
 from operations.user_operations import UserOperations
+from operations.provisioning_operations import ProvisioningOperations
 from modules.user.user_schema import UserResponse, UserCreate, UserUpdate, UserPasswordUpdate
-from auth.controller import AuthController
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from auth.dependencies import Principal, PrincipalDep, require_role
 from modules.user.error_response_schema import ErrorResponse
+from modules.user.provisioning_schema import ProvisioningStatusResponse
 
 
 '''
@@ -16,8 +17,6 @@ user_router = APIRouter(
     prefix="/api/v1/users",
     tags=["users"],
 )
-# Initialize the HTTPBearer scheme for authentication
-bearer_scheme = HTTPBearer()
 
 # POST endpoint to create a new user in the database
 @user_router.post("", response_model=UserResponse, responses = {
@@ -39,12 +38,10 @@ async def create_user(user: UserCreate, db_session: DBSessionDep):
 })
 async def get_users(
     db_session: DBSessionDep, 
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     page: int = Query(1, ge=1),
-    limit: int = Query(10, le=100)
+    limit: int = Query(10, le=100),
+    principal: Principal = Depends(require_role("barber")),
 ):
-    AuthController.protected_endpoint(credentials, required_role="barber")
-    
     user_ops = UserOperations(db_session)
     return await user_ops.get_all_users(page, limit)
 
@@ -52,20 +49,13 @@ async def get_users(
     400: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
 })
-async def get_current_user(db_session: DBSessionDep, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+async def get_current_user(principal: PrincipalDep):
     # Get the current user from the token
-    user_info = AuthController.protected_endpoint(credentials)
-    if not user_info:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-    
-    user_ops = UserOperations(db_session)
-    user = await user_ops.get_user_by_kc_id(user_info.id)
+    user = await principal.get_user()
 
-    return {**user.to_response_schema().model_dump(), "roles": user_info.roles}
+    return {**user.to_response_schema().model_dump(), "roles": principal.user_info.roles}
 
 # Get endpoint to search for users
-bearer = HTTPBearer()
-
 @user_router.get(
     "/search",
     response_model=List[UserResponse],
@@ -74,14 +64,12 @@ bearer = HTTPBearer()
 )
 async def search_users(
     db_session: DBSessionDep,
+    # Only require a valid token (no special role):
+    principal: PrincipalDep,
     q: str = Query(..., min_length=2, description="Search term for username"),
     page: int = Query(1, ge=1),
     limit: int = Query(10, le=100),
-    credentials: HTTPAuthorizationCredentials = Depends(bearer),
 ):
-    # Only require a valid token (no special role):
-    AuthController.protected_endpoint(credentials)
-
     user_ops = UserOperations(db_session)
     try:
         return await user_ops.search_users_by_username(q, page, limit)
@@ -97,21 +85,28 @@ async def search_users(
      400: {"model": ErrorResponse},
      500: {"model": ErrorResponse}
 })
-async def get_user(user_id: int, db_session: DBSessionDep, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
-    AuthController.protected_endpoint(credentials)
+async def get_user(user_id: int, db_session: DBSessionDep, principal: PrincipalDep):
     user_ops = UserOperations(db_session)
     user = await user_ops.get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found with ID provided")
     return user
 
+# GET endpoint to check whether a user's changes have reached Keycloak
+@user_router.get("/{user_id}/provisioning", response_model=List[ProvisioningStatusResponse], responses = {
+    500: {"model": ErrorResponse}
+}, operation_id="getUserProvisioningStatus")
+async def get_user_provisioning_status(user_id: int, db_session: DBSessionDep, principal: Principal = Depends(require_role("admin"))):
+    provisioning_ops = ProvisioningOperations(db_session)
+    entries = await provisioning_ops.get_status_for_user(user_id)
+    return [ProvisioningStatusResponse.model_validate(entry) for entry in entries]
+
 # PUT endpoint to update a specific user in the database by their ID
 @user_router.put("/{user_id}", response_model=UserResponse, responses = {
     400: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
 })
-async def update_user(user_id: int, user: UserUpdate, db_session: DBSessionDep, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
-    AuthController.protected_endpoint(credentials)
+async def update_user(user_id: int, user: UserUpdate, db_session: DBSessionDep, principal: PrincipalDep):
     user_ops = UserOperations(db_session)
     updated_user = await user_ops.update_user(user_id, user)
     if not updated_user:
@@ -128,9 +123,8 @@ async def update_user_password(
     user_id: int,
     password_data: UserPasswordUpdate,
     db_session: DBSessionDep,
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
+    principal: PrincipalDep,
 ):
-    AuthController.protected_endpoint(credentials)
     user_ops = UserOperations(db_session)
     success = await user_ops.update_user_password(user_id, password_data)
     if not success:
@@ -143,8 +137,7 @@ async def update_user_password(
     404: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
 })
-async def delete_user(user_id: int, db_session: DBSessionDep, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
-    AuthController.protected_endpoint(credentials, required_role="admin")
+async def delete_user(user_id: int, db_session: DBSessionDep, principal: Principal = Depends(require_role("admin"))):
     user_ops = UserOperations(db_session)
     success = await user_ops.delete_user(user_id)
     if not success:
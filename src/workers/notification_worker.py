@@ -0,0 +1,64 @@
+import asyncio
+import logging
+
+from core.config import settings
+from core.db import async_session_manager
+from modules.email.email_operations import email_operations
+from operations.notification_operations import NotificationOperations
+from workers.outbox_worker import OutboxWorker, backoff_delay
+
+logger = logging.getLogger("notification_worker")
+logger.setLevel(logging.ERROR)
+
+
+class NotificationWorker(OutboxWorker):
+    """
+    Delivers queued emails, at most `max_concurrency` SMTP sends at a time.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_attempts: int,
+        max_concurrency: int,
+        lease_seconds: int = 120,
+        poll_interval: float = 2.0,
+    ):
+        super().__init__("notifications", poll_interval)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._send_limit = asyncio.Semaphore(max_concurrency)
+
+    async def run_once(self) -> int:
+        async with async_session_manager.session() as db:
+            notification_ops = NotificationOperations(db)
+            entries = await notification_ops.claim_batch(self.batch_size, self.lease_seconds)
+            if not entries:
+                return 0
+
+            outcomes = await asyncio.gather(
+                *[self._send(entry) for entry in entries], return_exceptions=True
+            )
+            for entry, outcome in zip(entries, outcomes):
+                attempts = entry["attempts"] + 1
+                if isinstance(outcome, BaseException):
+                    logger.error(f"Email {entry['notification_id']} to {entry['recipient']} failed: {outcome}")
+                    retry_in = backoff_delay(attempts) if attempts < self.max_attempts else None
+                    await notification_ops.mark_failed(entry["notification_id"], attempts, str(outcome), retry_in)
+                else:
+                    await notification_ops.mark_done(entry["notification_id"], attempts)
+
+            await db.commit()
+            return len(entries)
+
+    async def _send(self, entry: dict):
+        async with self._send_limit:
+            await email_operations.send_email(entry["recipient"], entry["subject"], entry["body"])
+
+
+notification_worker = NotificationWorker(
+    batch_size=settings.get_config()["notification_batch_size"],
+    max_attempts=settings.get_config()["notification_max_attempts"],
+    max_concurrency=settings.get_config()["notification_max_concurrency"],
+)
@@ -0,0 +1,26 @@
+import random
+
+from workers.periodic_worker import PeriodicWorker
+
+
+def backoff_delay(attempts: int, base: float = 2.0, cap: float = 600.0) -> float:
+    """
+    Exponential backoff with full jitter for the given number of failed attempts.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempts))
+
+
+class OutboxWorker(PeriodicWorker):
+    """
+    Background loop that drains an outbox table in batches.
+
+    Subclasses implement `run_once`, which processes one batch and returns how many
+    entries it handled. The loop keeps going while there is work and otherwise polls
+    every `poll_interval` seconds, or sooner when `wake` is called after a commit.
+    """
+
+    def __init__(self, name: str, poll_interval: float = 2.0):
+        super().__init__(name, poll_interval)
+
+    async def run_once(self) -> int:
+        raise NotImplementedError
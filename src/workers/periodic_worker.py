@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from typing import Optional
+
+logger = logging.getLogger("periodic_worker")
+logger.setLevel(logging.ERROR)
+
+
+class PeriodicWorker:
+    """
+    Background loop that runs a unit of work every `interval` seconds.
+
+    Subclasses implement `run_once`, which does one round of work and returns a truthy
+    value when more work is already waiting, so the loop goes again without sleeping.
+    Otherwise it sleeps for `interval` seconds or until `wake` is called.
+    """
+
+    def __init__(self, name: str, interval: float):
+        self.name = name
+        self.interval = interval
+        self._wake_event = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self):
+        raise NotImplementedError
+
+    def wake(self):
+        """
+        Signal that there is new work so it is picked up without waiting.
+        """
+        self._wake_event.set()
+
+    async def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Finish the round in progress, then stop. Cancels the loop after `timeout` seconds.
+        """
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake_event.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"{self.name} did not finish within {timeout}s, cancelling")
+        self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                more = await self.run_once()
+            except Exception as e:
+                logger.error(f"{self.name} run failed: {e}")
+                more = False
+
+            if more or self._stopping:
+                continue
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+from auth.identity_cache import invalidate_identity
+from auth.keycloak_client import KeycloakClientError
+from auth.service import AuthService
+from core.config import settings
+from core.db import async_session_manager
+from modules.user.models import KeycloakOperation, User
+from operations.provisioning_operations import ProvisioningOperations
+from workers.outbox_worker import OutboxWorker, backoff_delay
+
+logger = logging.getLogger("provisioning_worker")
+logger.setLevel(logging.ERROR)
+
+ROLE_OPERATIONS = (KeycloakOperation.assign_role, KeycloakOperation.remove_role)
+
+
+class KeycloakProvisioningWorker(OutboxWorker):
+    """
+    Applies queued user changes to Keycloak.
+
+    Every operation is safe to repeat: creating a user that already exists adopts the
+    existing Keycloak account, deleting a missing one succeeds, and updates and role
+    assignments always write the current state.
+    """
+
+    def __init__(self, batch_size: int, max_attempts: int, lease_seconds: int = 60, poll_interval: float = 2.0):
+        super().__init__("keycloak_provisioning", poll_interval)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+
+    async def run_once(self) -> int:
+        async with async_session_manager.session() as db:
+            provisioning_ops = ProvisioningOperations(db)
+            entries = await provisioning_ops.claim_batch(self.batch_size, self.lease_seconds)
+            if not entries:
+                return 0
+
+            # Load every user the batch refers to in one query
+            result = await db.execute(
+                select(User).filter(User.user_id.in_({entry["user_id"] for entry in entries}))
+            )
+            users = {user.user_id: user for user in result.scalars().all()}
+
+            # Role changes are applied per role for the whole batch, with one role lookup each
+            role_groups: dict[tuple, list[dict]] = {}
+            other_entries = []
+            for entry in entries:
+                user = users.get(entry["user_id"])
+                if entry["operation"] in ROLE_OPERATIONS and user is not None and user.kc_id:
+                    role_groups.setdefault((entry["operation"], entry["payload"]["role"]), []).append(entry)
+                else:
+                    other_entries.append(entry)
+
+            # The claim only returns one entry per user, so the batch can run concurrently
+            group_outcomes, single_outcomes = await asyncio.gather(
+                asyncio.gather(
+                    *[
+                        self._apply_role_group(operation, role, group, users)
+                        for (operation, role), group in role_groups.items()
+                    ]
+                ),
+                asyncio.gather(
+                    *[self._apply(entry, users.get(entry["user_id"])) for entry in other_entries],
+                    return_exceptions=True,
+                ),
+            )
+            processed_entries = [entry for group in role_groups.values() for entry in group] + other_entries
+            outcomes = [outcome for group in group_outcomes for outcome in group] + list(single_outcomes)
+
+            linked_kc_ids = []
+            for entry, outcome in zip(processed_entries, outcomes):
+                attempts = entry["attempts"] + 1
+                if isinstance(outcome, BaseException):
+                    logger.error(f"Keycloak {entry['operation'].value} for user {entry['user_id']} failed: {outcome}")
+                    retry_in = backoff_delay(attempts) if attempts < self.max_attempts else None
+                    await provisioning_ops.mark_failed(entry["outbox_id"], attempts, str(outcome), retry_in)
+                    continue
+
+                if entry["operation"] == KeycloakOperation.create_user and outcome:
+                    await db.execute(
+                        update(User).where(User.user_id == entry["user_id"]).values(kc_id=outcome)
+                    )
+                    linked_kc_ids.append(outcome)
+                await provisioning_ops.mark_done(entry["outbox_id"], attempts)
+
+            await db.commit()
+            invalidate_identity(*linked_kc_ids)
+            return len(entries)
+
+    async def _apply_role_group(self, operation: KeycloakOperation, role: str, group: list[dict], users: dict) -> list:
+        kc_ids = [users[entry["user_id"]].kc_id for entry in group]
+        try:
+            if operation == KeycloakOperation.assign_role:
+                failures = await AuthService.add_role_to_users(kc_ids, role)
+            else:
+                failures = await AuthService.remove_role_from_users(kc_ids, role)
+        except Exception as e:
+            return [e] * len(group)
+        return [RuntimeError(failures[kc_id]) if kc_id in failures else None for kc_id in kc_ids]
+
+    async def _apply(self, entry: dict, user: User):
+        operation = entry["operation"]
+        payload = entry["payload"]
+
+        if operation == KeycloakOperation.delete_user:
+            kc_id = payload.get("kc_id") or await AuthService.keycloak_client.get_user_id(payload["email"])
+            if not kc_id:
+                return None
+            try:
+                await AuthService.keycloak_client.delete_user(kc_id)
+            except KeycloakClientError as e:
+                if e.status_code != 404:
+                    raise
+            return None
+
+        # Every other operation works on the current user row; nothing to do if it is gone
+        if user is None:
+            return None
+
+        if operation == KeycloakOperation.create_user:
+            if user.kc_id:
+                return user.kc_id
+            # A previous attempt may have created the account before failing to record it
+            existing_kc_id = await AuthService.keycloak_client.get_user_id(user.email)
+            return existing_kc_id or await AuthService.register_kc_user(user)
+
+        if not user.kc_id:
+            raise RuntimeError("Keycloak user has not been provisioned yet")
+
+        # Role changes for provisioned users are handled by _apply_role_group
+        await AuthService.update_kc_user(user)
+        return None
+
+
+provisioning_worker = KeycloakProvisioningWorker(
+    batch_size=settings.get_config()["provisioning_batch_size"],
+    max_attempts=settings.get_config()["provisioning_max_attempts"],
+)
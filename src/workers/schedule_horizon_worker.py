@@ -0,0 +1,42 @@
+import logging
+from datetime import date, timedelta
+
+from core.config import settings
+from core.db import async_session_manager
+from operations.schedule_template_operations import ScheduleTemplateOperations
+from workers.periodic_worker import PeriodicWorker
+
+logger = logging.getLogger("schedule_horizon_worker")
+logger.setLevel(logging.ERROR)
+
+
+class ScheduleHorizonWorker(PeriodicWorker):
+    """
+    Keeps every barber's schedules generated from their template `weeks` weeks ahead.
+
+    Each run only fills in the days that have no schedule yet, so it is cheap once the
+    horizon is generated and several processes running it at once do no harm.
+    """
+
+    def __init__(self, weeks: int, interval: float):
+        super().__init__("schedule_horizon", interval)
+        self.weeks = weeks
+
+    @property
+    def enabled(self) -> bool:
+        return self.weeks > 0
+
+    async def run_once(self) -> bool:
+        today = date.today()
+        async with async_session_manager.session() as db:
+            await ScheduleTemplateOperations(db).generate_schedules(
+                today, today + timedelta(weeks=self.weeks, days=-1)
+            )
+        # Nothing is left to do until the horizon moves
+        return False
+
+
+schedule_horizon_worker = ScheduleHorizonWorker(
+    weeks=settings.get_config()["schedule_horizon_weeks"],
+    interval=settings.get_config()["schedule_horizon_interval"],
+)
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import sys
+import time as clock
+from datetime import date, time
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from auth.identity_cache import identity_cache
+from auth.models import UserInfo
+from auth.service import AuthService
+from core.db import AsyncDatabaseSessionManager, get_async_db_session
+from modules.availability.availability_index import availability_index
+from modules.schedule_cache import schedule_cache
+from modules.user.models import Barber, Base, Schedule, ScheduleInterval, Service, TimeSlot, User
+
+'''
+Shared fixtures for the test suite.
+Tests run against a fresh SQLite database per test, or against TEST_DATABASE_URL when it
+is set, e.g. a throwaway MySQL schema. Every test uses plain functions and drives its
+coroutines with asyncio.run.
+'''
+
+# Ids of the rows created by `seed_shop`
+CLIENT_USER_ID = 1
+OTHER_CLIENT_USER_ID = 2
+BARBER_USER_ID = 3
+BARBER_ID = 1
+SERVICE_ID = 1
+SCHEDULE_DATE = date(2030, 1, 7)
+
+
+@pytest.fixture(autouse=True)
+def run_from_src(monkeypatch):
+    # The app is started from src/, email templates are looked up relative to it
+    monkeypatch.chdir(SRC_DIR)
+
+
+@pytest.fixture
+def db_manager(tmp_path) -> AsyncDatabaseSessionManager:
+    url = os.getenv("TEST_DATABASE_URL")
+    if url:
+        manager = AsyncDatabaseSessionManager(url)
+    else:
+        manager = AsyncDatabaseSessionManager(
+            f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", {"connect_args": {"timeout": 30}}
+        )
+        # SQLite would fail a transaction that reads, then writes behind another writer,
+        # so transactions take the write lock when they begin and wait for each other
+        engine = manager._engine.sync_engine
+
+        @event.listens_for(engine, "connect")
+        def disable_implicit_begin(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def begin_immediate(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    async def create_tables():
+        async with manager._engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.run_sync(Base.metadata.create_all)
+        # Pooled connections belong to this event loop, the test runs its own
+        await manager._engine.dispose()
+
+    asyncio.run(create_tables())
+    availability_index.clear()
+    schedule_cache.clear()
+    identity_cache.clear()
+    AuthService.token_cache.clear()
+    yield manager
+    asyncio.run(manager.close())
+
+
+@pytest.fixture
+def statements(db_manager) -> list:
+    '''
+    Every SQL statement run on the test database, in order.
+    '''
+    executed = []
+
+    @event.listens_for(db_manager._engine.sync_engine, "before_cursor_execute")
+    def record(connection, cursor, statement, parameters, context, executemany):
+        # The BEGIN IMMEDIATE issued for SQLite isn't a query of the code under test
+        if statement != "BEGIN IMMEDIATE":
+            executed.append(statement)
+
+    return executed
+
+
+@pytest.fixture
+def client(db_manager):
+    '''
+    A client for the app, using the test database and without running its lifespan.
+    '''
+    from fastapi.testclient import TestClient
+    from main import app
+
+    async def get_test_session():
+        async with db_manager.session() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db_session] = get_test_session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def auth_headers(kc_id: str, *roles: str) -> dict:
+    '''
+    Headers for a caller with the given Keycloak id and realm roles, whose token is
+    already in the verified token cache.
+    '''
+    token = f"test-token:{kc_id}:{','.join(roles)}"
+    AuthService.token_cache.set(
+        AuthService.token_digest(token),
+        UserInfo(id=kc_id, username=kc_id, email=f"{kc_id}@example.com", first_name="", last_name="", roles=list(roles)),
+        clock.time() + 3600,
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def seed_shop(manager: AsyncDatabaseSessionManager, slot_count: int = 4) -> list[int]:
+    '''
+    Two clients, a barber with one service and a schedule of 30 minute slots from 09:00.
+    Returns the slot ids in start order.
+    '''
+    async with manager.session() as db:
+        db.add_all(
+            [
+                User(user_id=CLIENT_USER_ID, kc_id="kc-client", firstName="Ada", lastName="Client",
+                     email="ada@example.com", password="x", phoneNumber="5550000001", is_admin=False),
+                User(user_id=OTHER_CLIENT_USER_ID, kc_id="kc-other", firstName="Bob", lastName="Client",
+                     email="bob@example.com", password="x", phoneNumber="5550000002", is_admin=False),
+                User(user_id=BARBER_USER_ID, kc_id="kc-barber", firstName="Cy", lastName="Barber",
+                     email="cy@example.com", password="x", phoneNumber="5550000003", is_admin=False),
+                Barber(barber_id=BARBER_ID, user_id=BARBER_USER_ID),
+                Service(service_id=SERVICE_ID, name="Cut", duration=30, price=20.0, category="Hair",
+                        description="Haircut", popularity_score=1),
+                Schedule(schedule_id=1, barber_id=BARBER_ID, date=SCHEDULE_DATE, is_working=True),
+            ]
+        )
+        slots = [
+            TimeSlot(schedule_id=1, start_time=time(9 + index // 2, 30 * (index % 2)),
+                     end_time=time(9 + (index + 1) // 2, 30 * ((index + 1) % 2)), is_available=True, is_booked=False)
+            for index in range(slot_count)
+        ]
+        db.add_all(slots)
+        await db.flush()
+        slot_ids = [slot.slot_id for slot in slots]
+        await db.commit()
+        return slot_ids
+
+
+async def add_barber(manager: AsyncDatabaseSessionManager, barber_id: int) -> int:
+    '''
+    Another barber with a user of their own, whose user_id is 100 + barber_id.
+    '''
+    user_id = 100 + barber_id
+    async with manager.session() as db:
+        db.add(User(user_id=user_id, kc_id=f"kc-barber-{barber_id}", firstName="Barber", lastName=str(barber_id),
+                    email=f"barber{barber_id}@example.com", password="x", phoneNumber=f"555{user_id:07d}", is_admin=False))
+        await db.flush()
+        db.add(Barber(barber_id=barber_id, user_id=user_id))
+        await db.commit()
+    return user_id
+
+
+async def add_schedule(
+    manager: AsyncDatabaseSessionManager,
+    barber_id: int,
+    day: date = SCHEDULE_DATE,
+    slots: tuple = (),
+    intervals: tuple = (),
+    is_working: bool = True,
+) -> tuple[int, list[int]]:
+    '''
+    A schedule for the barber's day with slot rows given as (start, end, is_available,
+    is_booked) and working intervals given as (start, end, slot_minutes).
+    Returns the schedule_id and the slot ids in the order given.
+    '''
+    async with manager.session() as db:
+        schedule = Schedule(barber_id=barber_id, date=day, is_working=is_working)
+        db.add(schedule)
+        await db.flush()
+        rows = [
+            TimeSlot(schedule_id=schedule.schedule_id, start_time=start, end_time=end, is_available=is_available, is_booked=is_booked)
+            for start, end, is_available, is_booked in slots
+        ]
+        db.add_all(rows)
+        db.add_all(
+            ScheduleInterval(schedule_id=schedule.schedule_id, start_time=start, end_time=end, slot_minutes=slot_minutes)
+            for start, end, slot_minutes in intervals
+        )
+        await db.flush()
+        schedule_id, slot_ids = schedule.schedule_id, [row.slot_id for row in rows]
+        await db.commit()
+        return schedule_id, slot_ids
@@ -0,0 +1,86 @@
+import asyncio
+
+from sqlalchemy.future import select
+
+from conftest import BARBER_ID, CLIENT_USER_ID, OTHER_CLIENT_USER_ID, SERVICE_ID, auth_headers, seed_shop
+from modules.user.models import NotificationOutbox, Service
+
+'''
+Who may book a batch of appointments, and what the summary email lists.
+'''
+
+
+def batch_for(user_id: int, slot_ids: list[int]) -> dict:
+    return {
+        "user_id": user_id,
+        "barber_id": BARBER_ID,
+        "status": "confirmed",
+        "service_id": [SERVICE_ID],
+        "items": [{"time_slot": [slot_id]} for slot_id in slot_ids],
+    }
+
+
+def test_batch_booking_requires_a_caller(db_manager, client):
+    slot_ids = asyncio.run(seed_shop(db_manager))
+
+    response = client.post("/api/v1/appointments/batch", json=batch_for(CLIENT_USER_ID, slot_ids[:2]))
+
+    assert response.status_code in (401, 403)
+
+
+def test_clients_batch_book_only_for_themselves(db_manager, client):
+    slot_ids = asyncio.run(seed_shop(db_manager))
+    headers = auth_headers("kc-client", "client")
+
+    denied = client.post(
+        "/api/v1/appointments/batch", json=batch_for(OTHER_CLIENT_USER_ID, slot_ids[:2]), headers=headers
+    )
+    allowed = client.post(
+        "/api/v1/appointments/batch", json=batch_for(CLIENT_USER_ID, slot_ids[:2]), headers=headers
+    )
+
+    assert denied.status_code == 403
+    assert allowed.status_code == 200
+    assert allowed.json()["booked"] == 2
+
+
+def test_barbers_batch_book_for_clients(db_manager, client):
+    slot_ids = asyncio.run(seed_shop(db_manager))
+
+    response = client.post(
+        "/api/v1/appointments/batch",
+        json=batch_for(OTHER_CLIENT_USER_ID, slot_ids[:2]),
+        headers=auth_headers("kc-barber", "barber"),
+    )
+
+    assert response.status_code == 200
+    assert response.json()["booked"] == 2
+
+
+def test_summary_email_lists_only_booked_services(db_manager, client):
+    slot_ids = asyncio.run(seed_shop(db_manager))
+
+    async def add_service():
+        async with db_manager.session() as db:
+            db.add(Service(service_id=2, name="Beard", duration=30, price=15.0, category="Hair",
+                           description="Beard trim", popularity_score=1))
+            await db.commit()
+
+    async def outbox_bodies():
+        async with db_manager.session() as db:
+            result = await db.execute(select(NotificationOutbox.body))
+            return result.scalars().all()
+
+    asyncio.run(add_service())
+    batch = batch_for(CLIENT_USER_ID, slot_ids[:1])
+    # The second item asks for a slot the first one already takes
+    batch["items"].append({"time_slot": [slot_ids[0]], "service_id": [2]})
+    batch["all_or_nothing"] = False
+
+    response = client.post("/api/v1/appointments/batch", json=batch, headers=auth_headers("kc-client", "client"))
+
+    assert response.status_code == 200
+    assert (response.json()["booked"], response.json()["failed"]) == (1, 1)
+    bodies = asyncio.run(outbox_bodies())
+    assert len(bodies) == 2
+    assert all("Cut" in body and "Beard" not in body for body in bodies)
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from conftest import BARBER_ID, CLIENT_USER_ID, SERVICE_ID, seed_shop
+from modules.appointment_schema import AppointmentCreate, AppointmentStatus
+from modules.user.models import Appointment, Appointment_TimeSlot, TimeSlot
+from operations.appointment_operations import AppointmentOperations
+
+'''
+Bookings racing for the same slot.
+'''
+
+CONCURRENT_BOOKINGS = 200
+
+
+def booking(slot_ids: list[int]) -> AppointmentCreate:
+    return AppointmentCreate(
+        user_id=CLIENT_USER_ID,
+        barber_id=BARBER_ID,
+        status=AppointmentStatus.confirmed,
+        time_slot=slot_ids,
+        service_id=[SERVICE_ID],
+    )
+
+
+def test_concurrent_bookings_of_one_slot_book_it_once(db_manager):
+    async def run():
+        slot_ids = await seed_shop(db_manager)
+
+        # Every request gets its own session, as every HTTP request does
+        async def book():
+            async with db_manager.session() as db:
+                return await AppointmentOperations(db).create_appointment(booking([slot_ids[0]]))
+
+        outcomes = await asyncio.gather(
+            *[book() for _ in range(CONCURRENT_BOOKINGS)], return_exceptions=True
+        )
+
+        async with db_manager.session() as db:
+            links = await db.execute(
+                select(func.count()).select_from(Appointment_TimeSlot).filter(
+                    Appointment_TimeSlot.active_slot_id == slot_ids[0]
+                )
+            )
+            appointments = await db.execute(select(func.count()).select_from(Appointment))
+            slot = await db.execute(select(TimeSlot.is_booked).filter(TimeSlot.slot_id == slot_ids[0]))
+            return outcomes, links.scalar(), appointments.scalar(), slot.scalar()
+
+    outcomes, active_links, appointment_count, is_booked = asyncio.run(run())
+
+    booked = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+    failed = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    assert len(booked) == 1
+    assert len(failed) == CONCURRENT_BOOKINGS - 1
+    assert all(isinstance(error, HTTPException) and error.status_code == 409 for error in failed)
+    assert active_links == 1
+    assert appointment_count == 1
+    assert is_booked is True
+
+
+def test_reservation_rejects_slot_booked_after_the_check(db_manager):
+    async def run():
+        slot_ids = await seed_shop(db_manager)
+        async with db_manager.session() as db:
+            operations = AppointmentOperations(db)
+            slots_by_id = await operations._get_slots(slot_ids[:2])
+            assert operations._check_slots(slot_ids[:2], slots_by_id, BARBER_ID) is None
+            # End the read so the other request can write, SQLite serializes transactions
+            await db.rollback()
+
+            # Another request books the second slot between the check and the reservation
+            async with db_manager.session() as other_db:
+                await AppointmentOperations(other_db).create_appointment(booking([slot_ids[1]]))
+
+            with pytest.raises(HTTPException) as raised:
+                await operations._reserve(
+                    CLIENT_USER_ID, BARBER_ID, AppointmentStatus.confirmed,
+                    [slots_by_id[slot_id] for slot_id in slot_ids[:2]], [SERVICE_ID],
+                )
+            await db.rollback()
+            assert raised.value.status_code == 409
+
+        async with db_manager.session() as db:
+            result = await db.execute(select(TimeSlot.slot_id, TimeSlot.is_booked).filter(TimeSlot.slot_id.in_(slot_ids[:2])))
+            return dict(result.all()), slot_ids
+
+    booked, slot_ids = asyncio.run(run())
+    # The first slot was not left booked by the failed reservation
+    assert booked == {slot_ids[0]: False, slot_ids[1]: True}
@@ -0,0 +1,50 @@
+import asyncio
+
+from sqlalchemy import update
+
+from conftest import BARBER_ID, CLIENT_USER_ID, SERVICE_ID, seed_shop
+from modules.appointment_schema import AppointmentUpdate
+from modules.user.models import Appointment, AppointmentService, AppointmentStatus
+from operations.appointment_operations import AppointmentOperations
+
+'''
+Reading appointments whose date was never recorded.
+'''
+
+
+async def add_undated_appointment(db_manager) -> int:
+    await seed_shop(db_manager)
+    async with db_manager.session() as db:
+        appointment = Appointment(user_id=CLIENT_USER_ID, barber_id=BARBER_ID, status=AppointmentStatus.completed)
+        db.add(appointment)
+        await db.flush()
+        appointment_id = appointment.appointment_id
+        db.add(AppointmentService(appointment_id=appointment_id, service_id=SERVICE_ID))
+        # The ORM would fill in the column default, so the date is cleared like the backfill left it
+        await db.execute(
+            update(Appointment).where(Appointment.appointment_id == appointment_id).values(appointment_date=None)
+        )
+        await db.commit()
+        return appointment_id
+
+
+def test_undated_appointments_are_listed_and_updated(db_manager):
+    async def run():
+        appointment_id = await add_undated_appointment(db_manager)
+        async with db_manager.session() as db:
+            listed, next_cursor = await AppointmentOperations(db).get_all_appointments(
+                limit=10, is_barber=False, user_id=CLIENT_USER_ID
+            )
+        async with db_manager.session() as db:
+            updated = await AppointmentOperations(db).update_appointment(
+                appointment_id, AppointmentUpdate(service_id=[SERVICE_ID])
+            )
+        return appointment_id, listed, next_cursor, updated
+
+    appointment_id, listed, next_cursor, updated = asyncio.run(run())
+
+    assert [(appointment.appointment_id, appointment.appointment_date) for appointment in listed] == [
+        (appointment_id, None)
+    ]
+    assert next_cursor is None
+    assert updated.appointment_date is None
@@ -0,0 +1,210 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.future import select
+
+from conftest import BARBER_ID, CLIENT_USER_ID, OTHER_CLIENT_USER_ID, SERVICE_ID, seed_shop
+from modules.appointment_schema import AppointmentCreate, AppointmentStatus, AppointmentUpdate
+from modules.user.models import Appointment, AppointmentService, Appointment_TimeSlot, Service, TimeSlot
+from operations.appointment_operations import AppointmentOperations
+
+'''
+Reschedules, updates of canceled appointments and cancellations through an update.
+'''
+
+
+async def book(db_manager, user_id: int, slot_ids: list[int]) -> int:
+    async with db_manager.session() as db:
+        appointment = await AppointmentOperations(db).create_appointment(
+            AppointmentCreate(
+                user_id=user_id,
+                barber_id=BARBER_ID,
+                status=AppointmentStatus.confirmed,
+                time_slot=slot_ids,
+                service_id=[SERVICE_ID],
+            )
+        )
+        return appointment.appointment_id
+
+
+async def update(db_manager, appointment_id: int, **changes):
+    async with db_manager.session() as db:
+        return await AppointmentOperations(db).update_appointment(appointment_id, AppointmentUpdate(**changes))
+
+
+async def cancel(db_manager, appointment_id: int) -> bool:
+    async with db_manager.session() as db:
+        return await AppointmentOperations(db).cancel_appointment(appointment_id)
+
+
+# The slot's booked flag and the appointments holding it
+async def slot_state(db_manager, slot_id: int) -> tuple[bool, list[int]]:
+    async with db_manager.session() as db:
+        slot = await db.execute(select(TimeSlot.is_booked).filter(TimeSlot.slot_id == slot_id))
+        holders = await db.execute(
+            select(Appointment_TimeSlot.appointment_id).filter(Appointment_TimeSlot.active_slot_id == slot_id)
+        )
+        return slot.scalar(), list(holders.scalars().all())
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"time_slot": "rebooked"},
+        {"time_slot": "free"},
+        {"status": AppointmentStatus.confirmed},
+    ],
+)
+def test_canceled_appointment_cant_take_back_a_rebooked_slot(db_manager, changes):
+    async def run():
+        slot_ids = await seed_shop(db_manager)
+        first = await book(db_manager, CLIENT_USER_ID, [slot_ids[0]])
+        assert await cancel(db_manager, first)
+        second = await book(db_manager, OTHER_CLIENT_USER_ID, [slot_ids[0]])
+
+        requested = dict(changes)
+        if requested.get("time_slot") == "rebooked":
+            requested["time_slot"] = [slot_ids[0]]
+        elif requested.get("time_slot") == "free":
+            requested["time_slot"] = [slot_ids[1]]
+        with pytest.raises(HTTPException) as raised:
+            await update(db_manager, first, **requested)
+
+        return raised.value.status_code, second, await slot_state(db_manager, slot_ids[0]), await slot_state(db_manager, slot_ids[1])
+
+    status_code, second, rebooked_slot, free_slot = asyncio.run(run())
+
+    assert status_code == 409
+    assert rebooked_slot == (True, [second])
+    assert free_slot == (False, [])
+
+
+def test_canceled_appointment_keeps_other_fields_editable(db_manager):
+    async def run():
+        slot_ids = await seed_shop(db_manager)
+        first = await book(db_manager, CLIENT_USER_ID, [slot_ids[0]])
+        assert await cancel(db_manager, first)
+        second = await book(db_manager, OTHER_CLIENT_USER_ID, [slot_ids[0]])
+        updated = await update(db_manager, first, service_id=[SERVICE_ID], status=AppointmentStatus.canceled)
+        return updated, second, await slot_state(db_manager, slot_ids[0])
+
+    updated, second, slot = asyncio.run(run())
+
+    assert updated.status == AppointmentStatus.canceled
+    assert slot == (True, [second])
+
+
+def test_canceling_through_an_update_releases_the_slots(db_manager):
+    async def run():
+        slot_ids = await seed_shop(db_manager)
+        first = await book(db_manager, CLIENT_USER_ID, slot_ids[:2])
+        updated = await update(db_manager, first, status=AppointmentStatus.canceled)
+        released = [await slot_state(db_manager, slot_id) for slot_id in slot_ids[:2]]
+
+        # The slots can be booked again and cancelling once more changes nothing
+        second = await book(db_manager, OTHER_CLIENT_USER_ID, slot_ids[:2])
+        assert await cancel(db_manager, first)
+        async with db_manager.session() as db:
+            status = await db.execute(select(Appointment.status).filter(Appointment.appointment_id == first))
+        return updated, released, second, status.scalar(), [await slot_state(db_manager, slot_id) for slot_id in slot_ids[:2]]
+
+    updated, released, second, status, rebooked = asyncio.run(run())
+
+    assert updated.status == AppointmentStatus.canceled
+    assert all(not slot.is_booked for slot in updated.time_slots)
+    assert released == [(False, []), (False, [])]
+    assert status.value == "canceled"
+    assert rebooked == [(True, [second]), (True, [second])]
+
+
+def test_canceling_with_new_slots_is_rejected(db_manager):
+    async def run():
+        slot_ids = await seed_shop(db_manager)
+        first = await book(db_manager, CLIENT_USER_ID, [slot_ids[0]])
+        with pytest.raises(HTTPException) as raised:
+            await update(db_manager, first, status=AppointmentStatus.canceled, time_slot=[slot_ids[1]])
+        return raised.value.status_code, await slot_state(db_manager, slot_ids[0]), await slot_state(db_manager, slot_ids[1]), first
+
+    status_code, held, untouched, first = asyncio.run(run())
+
+    assert status_code == 400
+    assert held == (True, [first])
+    assert untouched == (False, [])
+
+
+# The statements that change rows of `table`
+def writes(statements: list[str], table: str) -> list[str]:
+    return [
+        statement for statement in statements
+        if statement.startswith((f"UPDATE {table} ", f"INSERT INTO {table} ", f"DELETE FROM {table} "))
+    ]
+
+
+def test_reschedule_frees_the_old_slots_and_reserves_only_the_new_ones(db_manager, statements):
+    async def run():
+        slot_ids = await seed_shop(db_manager)
+        first = await book(db_manager, CLIENT_USER_ID, slot_ids[:2])
+        statements.clear()
+        updated = await update(db_manager, first, time_slot=slot_ids[1:3])
+        return slot_ids, first, updated, [await slot_state(db_manager, slot_id) for slot_id in slot_ids[:3]]
+
+    slot_ids, first, updated, slots = asyncio.run(run())
+
+    assert [slot.slot_id for slot in updated.time_slots] == slot_ids[1:3]
+    assert all(slot.is_booked for slot in updated.time_slots)
+    assert slots == [(False, []), (True, [first]), (True, [first])]
+    # Only the added slot is claimed and only the dropped one released, the kept one isn't touched
+    slot_writes = writes(statements, "time_slots")
+    assert len(slot_writes) == 2
+    assert all("slot_id IN (?)" in statement for statement in slot_writes)
+    link_writes = writes(statements, "appointment_time_slots")
+    assert [statement.split(" ")[0] for statement in link_writes] == ["INSERT", "DELETE"]
+
+
+def test_reschedule_onto_a_taken_slot_is_rejected(db_manager):
+    async def run():
+        slot_ids = await seed_shop(db_manager)
+        first = await book(db_manager, CLIENT_USER_ID, [slot_ids[0]])
+        second = await book(db_manager, OTHER_CLIENT_USER_ID, [slot_ids[2]])
+        with pytest.raises(HTTPException) as raised:
+            await update(db_manager, first, time_slot=[slot_ids[1], slot_ids[2]])
+        states = [await slot_state(db_manager, slot_id) for slot_id in slot_ids[:3]]
+        return raised.value.status_code, first, second, states
+
+    status_code, first, second, states = asyncio.run(run())
+
+    assert status_code == 409
+    # Nothing of the rejected reschedule was kept
+    assert states == [(True, [first]), (False, []), (True, [second])]
+
+
+def test_service_changes_write_only_the_changed_links(db_manager, statements):
+    async def run():
+        slot_ids = await seed_shop(db_manager)
+        async with db_manager.session() as db:
+            db.add_all([
+                Service(service_id=2, name="Beard", duration=15, price=10.0, category="Hair", description="Beard trim", popularity_score=1),
+                Service(service_id=3, name="Wash", duration=15, price=5.0, category="Hair", description="Hair wash", popularity_score=1),
+            ])
+            await db.commit()
+        first = await book(db_manager, CLIENT_USER_ID, [slot_ids[0]])
+        await update(db_manager, first, service_id=[SERVICE_ID, 2])
+        statements.clear()
+        updated = await update(db_manager, first, service_id=[2, 3])
+        async with db_manager.session() as db:
+            links = await db.execute(
+                select(AppointmentService.service_id).filter(AppointmentService.appointment_id == first)
+            )
+            return updated, sorted(links.scalars().all())
+
+    updated, service_ids = asyncio.run(run())
+
+    assert [service.service_id for service in updated.services] == [2, 3]
+    assert service_ids == [2, 3]
+    service_writes = writes(statements, "appointment_service")
+    assert len(service_writes) == 2
+    assert service_writes[0].startswith("INSERT") and service_writes[1].startswith("DELETE")
+    assert "service_id IN (?)" in service_writes[1]
+    # The slots weren't part of the update
+    assert writes(statements, "time_slots") == writes(statements, "appointment_time_slots") == []
@@ -0,0 +1,159 @@
+import asyncio
+from datetime import time, timedelta
+
+import pytest
+
+from conftest import BARBER_ID, CLIENT_USER_ID, SCHEDULE_DATE, SERVICE_ID, add_barber, add_schedule, seed_shop
+from modules.appointment_schema import AppointmentCreate, AppointmentStatus, AppointmentUpdate
+from modules.availability.availability_index import availability_index
+from modules.schedule_schema import ScheduleUpdate
+from modules.user.models import Service
+from operations.appointment_operations import AppointmentOperations
+from operations.availability_operations import AvailabilityOperations
+from operations.schedule_operations import ScheduleOperations
+
+'''
+The opening search and the updates that bookings and schedule edits make to the
+availability index. Every search after the first runs against the index it left behind.
+On SCHEDULE_DATE barber 1 has six 30 minute slots from 09:00 and barber 2 four.
+'''
+
+OTHER_BARBER_ID = 2
+HOUR_SERVICE_ID = 2
+THREE_QUARTER_SERVICE_ID = 3
+NEXT_DAY = SCHEDULE_DATE + timedelta(days=1)
+
+
+@pytest.fixture
+def shop(db_manager):
+    async def seed():
+        slot_ids = await seed_shop(db_manager, slot_count=6)
+        await add_barber(db_manager, OTHER_BARBER_ID)
+        await add_schedule(db_manager, OTHER_BARBER_ID, slots=tuple(
+            (time(9 + index // 2, 30 * (index % 2)), time(9 + (index + 1) // 2, 30 * ((index + 1) % 2)), True, False)
+            for index in range(4)
+        ))
+        async with db_manager.session() as db:
+            db.add_all([
+                Service(service_id=HOUR_SERVICE_ID, name="Cut and wash", duration=60, price=30.0,
+                        category="Hair", description="Haircut and wash", popularity_score=1),
+                Service(service_id=THREE_QUARTER_SERVICE_ID, name="Beard", duration=45, price=25.0,
+                        category="Hair", description="Beard trim", popularity_score=1),
+            ])
+            await db.commit()
+        return slot_ids
+
+    return asyncio.run(seed())
+
+
+def search(db_manager, service_id: int = SERVICE_ID, barber_id: int = None, limit: int = 100, to_date=SCHEDULE_DATE):
+    async def run():
+        async with db_manager.session() as db:
+            return await AvailabilityOperations(db).find_openings(service_id, SCHEDULE_DATE, to_date, barber_id, limit)
+
+    return asyncio.run(run())
+
+
+def starts(openings, barber_id: int = BARBER_ID) -> list[str]:
+    return [opening.start_time.strftime("%H:%M") for opening in openings if opening.barber_id == barber_id]
+
+
+def book(db_manager, slot_ids: list[int]) -> int:
+    async def run():
+        async with db_manager.session() as db:
+            appointment = await AppointmentOperations(db).create_appointment(
+                AppointmentCreate(user_id=CLIENT_USER_ID, barber_id=BARBER_ID, status=AppointmentStatus.confirmed,
+                                  time_slot=slot_ids, service_id=[SERVICE_ID])
+            )
+            return appointment.appointment_id
+
+    return asyncio.run(run())
+
+
+def update_schedule(db_manager, **changes):
+    async def run():
+        async with db_manager.session() as db:
+            return await ScheduleOperations(db).update_schedule(1, ScheduleUpdate(**changes))
+
+    return asyncio.run(run())
+
+
+def test_openings_for_services_spanning_several_slots(shop, db_manager):
+    slot_ids = shop
+    hour = search(db_manager, HOUR_SERVICE_ID, BARBER_ID)
+    assert starts(hour) == ["09:00", "09:30", "10:00", "10:30", "11:00"]
+    assert [opening.end_time for opening in hour][-1] == time(12)
+    assert hour[0].time_slot == slot_ids[0:2]
+
+    # 45 minutes take two half-hour slots
+    three_quarters = search(db_manager, THREE_QUARTER_SERVICE_ID, BARBER_ID)
+    assert starts(three_quarters) == starts(hour)
+    assert all(len(opening.time_slot) == 2 for opening in three_quarters)
+
+
+def test_limit_and_barber_id(shop, db_manager):
+    openings = search(db_manager, limit=3)
+    # Ordered by date, start time and barber
+    assert [(opening.barber_id, opening.start_time) for opening in openings] == [
+        (BARBER_ID, time(9)), (OTHER_BARBER_ID, time(9)), (BARBER_ID, time(9, 30))
+    ]
+    assert starts(search(db_manager, barber_id=OTHER_BARBER_ID), OTHER_BARBER_ID) == ["09:00", "09:30", "10:00", "10:30"]
+    assert {opening.barber_id for opening in search(db_manager, barber_id=OTHER_BARBER_ID)} == {OTHER_BARBER_ID}
+
+
+def test_booking_and_cancelling_update_the_index(shop, db_manager):
+    slot_ids = shop
+    assert starts(search(db_manager, HOUR_SERVICE_ID)) == ["09:00", "09:30", "10:00", "10:30", "11:00"]
+
+    appointment_id = book(db_manager, [slot_ids[2]])
+    assert availability_index.get(BARBER_ID, SCHEDULE_DATE) is not None
+    assert starts(search(db_manager, HOUR_SERVICE_ID)) == ["09:00", "10:30", "11:00"]
+    # The other barber's day is untouched
+    assert starts(search(db_manager, HOUR_SERVICE_ID), OTHER_BARBER_ID) == ["09:00", "09:30", "10:00"]
+
+    async def cancel():
+        async with db_manager.session() as db:
+            return await AppointmentOperations(db).cancel_appointment(appointment_id)
+
+    assert asyncio.run(cancel())
+    assert starts(search(db_manager, HOUR_SERVICE_ID)) == ["09:00", "09:30", "10:00", "10:30", "11:00"]
+
+
+def test_rescheduling_moves_the_opening(shop, db_manager):
+    slot_ids = shop
+    search(db_manager)
+    appointment_id = book(db_manager, [slot_ids[2]])
+    assert starts(search(db_manager)) == ["09:00", "09:30", "10:30", "11:00", "11:30"]
+
+    async def reschedule():
+        async with db_manager.session() as db:
+            return await AppointmentOperations(db).update_appointment(appointment_id, AppointmentUpdate(time_slot=[slot_ids[5]]))
+
+    asyncio.run(reschedule())
+    assert starts(search(db_manager)) == ["09:00", "09:30", "10:00", "10:30", "11:00"]
+
+
+def test_schedule_edits_update_the_index(shop, db_manager):
+    slot_ids = shop
+    search(db_manager, to_date=NEXT_DAY)
+
+    update_schedule(db_manager, time_slots=[{"slot_id": slot_ids[0], "is_available": False}])
+    assert starts(search(db_manager, to_date=NEXT_DAY)) == ["09:30", "10:00", "10:30", "11:00", "11:30"]
+
+    # A new slot after the others extends the day
+    update_schedule(db_manager, time_slots=[{"slot_id": 0, "start_time": "12:00", "end_time": "12:30"}])
+    assert starts(search(db_manager, HOUR_SERVICE_ID, to_date=NEXT_DAY))[-1] == "11:30"
+
+
+def test_working_toggles_and_date_moves_update_the_index(shop, db_manager):
+    search(db_manager, to_date=NEXT_DAY)
+
+    update_schedule(db_manager, is_working=False)
+    assert starts(search(db_manager, to_date=NEXT_DAY)) == []
+    update_schedule(db_manager, is_working=True)
+    assert len(starts(search(db_manager, to_date=NEXT_DAY))) == 6
+
+    update_schedule(db_manager, date=NEXT_DAY)
+    openings = search(db_manager, to_date=NEXT_DAY)
+    assert {opening.date for opening in openings if opening.barber_id == BARBER_ID} == {NEXT_DAY}
+    assert len(starts(openings)) == 6
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import time
+
+import pytest
+from sqlalchemy import update
+
+from conftest import SCHEDULE_DATE, add_barber, add_schedule, auth_headers, seed_shop
+from modules.user.models import Service, TimeSlot
+
+'''
+Barbers working on a date with their free slots, as listed by GET /api/v1/barbers.
+'''
+
+NINETY_MINUTE_SERVICE_ID = 2
+TWO_HOUR_SERVICE_ID = 3
+
+
+def slot(hour: int, minute: int, is_available: bool = True, is_booked: bool = False, minutes: int = 30) -> tuple:
+    end = hour * 60 + minute + minutes
+    return (time(hour, minute), time(end // 60, end % 60), is_available, is_booked)
+
+
+@pytest.fixture
+def listing(db_manager, client):
+    '''
+    On SCHEDULE_DATE, barber 1 has four free slots from 09:00. Barber 2 has free slots at
+    09:00 and 09:30, a booked one at 10:00, a free one at 10:30 and an unavailable one at
+    11:00. Barber 3's day is an interval from 09:00 to 12:00 whose 10:00 slot is a booked
+    row. Barber 4 isn't working that day and barber 5 has no schedule.
+    '''
+    async def seed():
+        slot_ids = await seed_shop(db_manager)
+        for barber_id in (2, 3, 4, 5):
+            await add_barber(db_manager, barber_id)
+        await add_schedule(db_manager, 2, slots=(
+            slot(9, 0), slot(9, 30), slot(10, 0, is_booked=True), slot(10, 30), slot(11, 0, is_available=False)
+        ))
+        await add_schedule(db_manager, 3, slots=(slot(10, 0, is_booked=True),), intervals=((time(9), time(12), 30),))
+        await add_schedule(db_manager, 4, slots=(slot(9, 0), slot(9, 30)), is_working=False)
+        async with db_manager.session() as db:
+            db.add_all([
+                Service(service_id=NINETY_MINUTE_SERVICE_ID, name="Cut and beard", duration=90, price=40.0,
+                        category="Hair", description="Haircut and beard trim", popularity_score=1),
+                Service(service_id=TWO_HOUR_SERVICE_ID, name="Colour", duration=120, price=80.0,
+                        category="Hair", description="Colouring", popularity_score=1),
+            ])
+            await db.commit()
+        return slot_ids
+
+    slot_ids = asyncio.run(seed())
+    return client, auth_headers("kc-client"), slot_ids
+
+
+def listed(client, headers, **params) -> list[tuple[int, int]]:
+    response = client.get("/api/v1/barbers", params={"schedule_date": SCHEDULE_DATE.isoformat(), **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [(barber["barber_id"], barber["free_slots"]) for barber in response.json()]
+
+
+def test_lists_working_barbers_with_their_free_slots(listing):
+    client, headers, _ = listing
+    # Barber 3's booked row takes the place of the derived 10:00 slot
+    assert listed(client, headers) == [(1, 4), (2, 3), (3, 5)]
+
+
+def test_min_free_slots(listing):
+    client, headers, _ = listing
+    assert listed(client, headers, min_free_slots=4) == [(1, 4), (3, 5)]
+    assert listed(client, headers, min_free_slots=5) == [(3, 5)]
+    assert listed(client, headers, min_free_slots=6) == []
+
+
+def test_service_needs_a_long_enough_run_of_free_slots(listing):
+    client, headers, _ = listing
+    # Barber 2's longest run is an hour, barber 3 has 10:30-12:00 after the booked slot
+    assert listed(client, headers, service_id=NINETY_MINUTE_SERVICE_ID) == [(1, 4), (3, 5)]
+    assert listed(client, headers, service_id=TWO_HOUR_SERVICE_ID) == [(1, 4)]
+    assert listed(client, headers, service_id=TWO_HOUR_SERVICE_ID, min_free_slots=5) == []
+
+
+def test_a_booked_slot_splits_a_run(listing, db_manager):
+    client, headers, slot_ids = listing
+
+    async def book_second_slot():
+        async with db_manager.session() as db:
+            await db.execute(update(TimeSlot).where(TimeSlot.slot_id == slot_ids[1]).values(is_booked=True))
+            await db.commit()
+
+    asyncio.run(book_second_slot())
+    # 09:00 and 10:00-11:00 are left, neither covers 90 minutes
+    assert listed(client, headers) == [(1, 3), (2, 3), (3, 5)]
+    assert listed(client, headers, service_id=NINETY_MINUTE_SERVICE_ID) == [(3, 5)]
+
+
+def test_pages(listing):
+    client, headers, _ = listing
+    assert listed(client, headers, limit=2, page=1) == [(1, 4), (2, 3)]
+    assert listed(client, headers, limit=2, page=2) == [(3, 5)]
+    assert listed(client, headers, limit=2, page=3) == []
+    # Filters apply before paging
+    assert listed(client, headers, limit=1, page=2, min_free_slots=4) == [(3, 5)]
+
+
+def test_unknown_service_is_rejected(listing):
+    client, headers, _ = listing
+    response = client.get(
+        "/api/v1/barbers", params={"schedule_date": SCHEDULE_DATE.isoformat(), "service_id": 99}, headers=headers
+    )
+    assert response.status_code == 400
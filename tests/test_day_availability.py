@@ -0,0 +1,97 @@
+from datetime import time
+
+from modules.availability.availability_index import DayAvailability, runs_of
+from modules.schedule_intervals import DerivedSlot
+
+'''
+The bitmaps a barber-day is packed into and the bitwise search for free runs.
+'''
+
+
+def day(*slots: tuple) -> DayAvailability:
+    '''
+    A day of (slot_id, start, end[, is_available, is_booked]) slots, times as (hour, minute).
+    '''
+    return DayAvailability(
+        DerivedSlot(slot_id, time(*start), time(*end), *flags) for slot_id, start, end, *flags in slots
+    )
+
+
+def openings(availability: DayAvailability, duration: int, not_before: int = 0) -> list[list[int]]:
+    return [
+        list(availability.slot_ids[first:last + 1]) for first, last in availability.openings(duration, not_before)
+    ]
+
+
+def test_runs_of():
+    assert runs_of(0b0111_0110, 1) == 0b0111_0110
+    assert runs_of(0b0111_0110, 2) == 0b0011_0010
+    assert runs_of(0b0111_0110, 3) == 0b0001_0000
+    assert runs_of(0b0111_0110, 4) == 0
+    # Lengths that aren't powers of two
+    assert runs_of((1 << 7) - 1, 5) == 0b111
+    assert runs_of(0, 3) == 0
+
+
+def test_bitmaps_of_a_half_hour_day():
+    availability = day(
+        (1, (9, 0), (9, 30)),
+        (2, (9, 30), (10, 0), True, True),
+        (3, (10, 0), (10, 30), False, False),
+        (4, (11, 0), (11, 30)),
+    )
+    assert availability.unit == 30
+    assert availability.working == 0b10111 << 18
+    assert availability.slot_starts == (1 << 18) | (1 << 19) | (1 << 20) | (1 << 22)
+    assert availability.available == 0b10011 << 18
+    assert availability.booked == 1 << 19
+    assert availability.free == (1 << 18) | (1 << 22)
+
+
+def test_booked_and_unavailable_slots_split_runs():
+    availability = day(
+        (1, (9, 0), (9, 30)),
+        (2, (9, 30), (10, 0)),
+        (3, (10, 0), (10, 30), True, True),
+        (4, (10, 30), (11, 0)),
+        (5, (11, 0), (11, 30), False, False),
+        (6, (11, 30), (12, 0)),
+        (7, (12, 0), (12, 30)),
+    )
+    assert openings(availability, 30) == [[1], [2], [4], [6], [7]]
+    assert openings(availability, 60) == [[1, 2], [6, 7]]
+    assert openings(availability, 90) == []
+
+    availability.set_free([3], True)
+    assert openings(availability, 90) == [[1, 2, 3], [2, 3, 4]]
+    availability.set_free([2], False)
+    assert openings(availability, 60) == [[3, 4], [6, 7]]
+    # Unknown ids are ignored
+    availability.set_free([99], False)
+    assert openings(availability, 60) == [[3, 4], [6, 7]]
+
+
+def test_runs_at_the_edges_of_the_day():
+    # Slots must end after they start, so the last one of a day ends before midnight
+    availability = day((1, (0, 0), (0, 30)), (2, (0, 30), (1, 0)), (3, (22, 30), (23, 0)), (4, (23, 0), (23, 30)))
+    assert availability.working & 1
+    assert availability.working.bit_length() == 47
+    assert openings(availability, 60) == [[1, 2], [3, 4]]
+    # No run crosses the gap between 01:00 and 22:30
+    assert openings(availability, 90) == []
+    assert openings(availability, 30, not_before=22 * 60 + 45) == [[4]]
+
+
+def test_slots_that_are_not_half_hours():
+    # 20 minute slots share a 20 minute unit
+    twenty = day((1, (9, 0), (9, 20)), (2, (9, 20), (9, 40)), (3, (9, 40), (10, 0)))
+    assert twenty.unit == 20
+    assert openings(twenty, 40) == [[1, 2], [2, 3]]
+    assert openings(twenty, 45) == [[1, 2, 3]]
+
+    # 15 and 45 minute slots mix on a 15 minute unit, runs only start where a slot does
+    mixed = day((1, (9, 0), (9, 45)), (2, (9, 45), (10, 0)), (3, (10, 0), (10, 45)))
+    assert mixed.unit == 15
+    assert openings(mixed, 60) == [[1, 2], [2, 3]]
+    assert openings(mixed, 15) == [[1], [2], [3]]
+    assert openings(mixed, 105) == [[1, 2, 3]]
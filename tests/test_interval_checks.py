@@ -0,0 +1,115 @@
+import asyncio
+from datetime import time, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from conftest import BARBER_ID, SCHEDULE_DATE, auth_headers, seed_shop
+from modules.interval_checks import find_interval_problem
+from modules.schedule_schema import ScheduleUpdate
+from modules.user.models import Schedule, TimeSlot
+from operations.schedule_operations import ScheduleOperations
+
+'''
+Overlap checks of slots and their use when schedules are created and updated.
+'''
+
+
+def t(hour: int, minute: int = 0) -> time:
+    return time(hour, minute)
+
+
+def test_touching_intervals_are_accepted():
+    assert find_interval_problem({1: [(t(10), t(11)), (t(9), t(10)), (t(11), t(11, 30))]}) is None
+
+
+def test_a_long_interval_containing_later_ones_is_rejected():
+    # Both later intervals lie inside the long one, the first of them is reported
+    problem = find_interval_problem({1: [(t(9), t(12)), (t(10), t(10, 30)), (t(11), t(11, 30))]})
+    assert problem == "Time slots must not overlap: 09:00-12:00 and 10:00-10:30"
+
+
+def test_empty_or_reversed_intervals_are_rejected():
+    assert find_interval_problem({1: [(t(9), t(9))]}) == "end_time must be after start_time: 09:00-09:00"
+    assert find_interval_problem({1: [(t(10), t(9))]}) == "end_time must be after start_time: 10:00-09:00"
+
+
+def test_groups_are_checked_separately():
+    assert find_interval_problem({1: [(t(9), t(10))], 2: [(t(9), t(10))]}) is None
+    problem = find_interval_problem({1: [(t(9), t(10))], 2: [(t(9), t(10)), (t(9, 30), t(10, 30))]}, name="Windows")
+    assert problem == "Windows must not overlap: 09:00-10:00 and 09:30-10:30"
+
+
+def update(db_manager, time_slots: list[dict]):
+    async def run():
+        async with db_manager.session() as db:
+            return await ScheduleOperations(db).update_schedule(1, ScheduleUpdate(time_slots=time_slots))
+
+    return asyncio.run(run())
+
+
+async def slot_times(db_manager) -> list[tuple]:
+    async with db_manager.session() as db:
+        result = await db.execute(
+            select(TimeSlot.start_time, TimeSlot.end_time).filter(TimeSlot.schedule_id == 1).order_by(TimeSlot.start_time)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+def test_update_rejects_slots_overlapping_existing_ones(db_manager):
+    slot_ids = asyncio.run(seed_shop(db_manager))
+    before = asyncio.run(slot_times(db_manager))
+
+    # A new slot across two existing ones
+    with pytest.raises(HTTPException) as error:
+        update(db_manager, [{"slot_id": 0, "start_time": "09:15", "end_time": "09:45"}])
+    assert error.value.status_code == 400
+    assert "09:00-09:30 and 09:15-09:45" in error.value.detail
+
+    # An existing slot moved onto its neighbour
+    with pytest.raises(HTTPException) as error:
+        update(db_manager, [{"slot_id": slot_ids[0], "start_time": "09:00", "end_time": "10:00"}])
+    assert error.value.status_code == 400
+    assert asyncio.run(slot_times(db_manager)) == before
+
+    # Touching the last slot is fine
+    update(db_manager, [{"slot_id": 0, "start_time": "11:00", "end_time": "11:30"}])
+    assert asyncio.run(slot_times(db_manager)) == before + [(t(11), t(11, 30))]
+
+
+def test_bulk_create_rejects_the_request_over_one_bad_day(db_manager, client):
+    asyncio.run(seed_shop(db_manager))
+    headers = auth_headers("kc-barber", "barber")
+
+    def day(offset: int, slots: list[tuple[str, str]]) -> dict:
+        return {
+            "barber_id": BARBER_ID,
+            "date": (SCHEDULE_DATE + timedelta(days=offset)).isoformat(),
+            "time_slots": [{"start_time": start, "end_time": end} for start, end in slots],
+        }
+
+    response = client.post(
+        "/api/v1/schedules/bulk",
+        json=[
+            day(1, [("09:00", "09:30"), ("09:30", "10:00")]),
+            day(2, [("09:00", "10:00"), ("09:30", "10:30")]),
+            day(3, [("09:00", "09:30")]),
+        ],
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Time slots must not overlap: 09:00-10:00 and 09:30-10:30"
+
+    async def schedule_count():
+        async with db_manager.session() as db:
+            result = await db.execute(select(func.count(Schedule.schedule_id)))
+            return result.scalar()
+
+    # Nothing of the request was created
+    assert asyncio.run(schedule_count()) == 1
+
+    response = client.post("/api/v1/schedules/bulk", json=[day(1, [("09:00", "09:30")]), day(3, [("09:00", "09:30")])], headers=headers)
+    assert response.status_code == 200
+    assert asyncio.run(schedule_count()) == 3
@@ -0,0 +1,119 @@
+import asyncio
+import socket
+from email import message_from_bytes
+
+import pytest
+from fastapi_mail import ConnectionConfig, FastMail
+from sqlalchemy.future import select
+
+from conftest import BARBER_ID, CLIENT_USER_ID, SERVICE_ID, seed_shop
+from modules.appointment_schema import AppointmentCreate, AppointmentStatus
+from modules.email.email_operations import email_operations
+from modules.user.models import NotificationOutbox, OutboxStatus
+from operations.appointment_operations import AppointmentOperations
+import workers.notification_worker as notification_module
+from workers.notification_worker import NotificationWorker
+
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+'''
+Delivery of queued emails to a local SMTP server.
+'''
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, message_from_bytes(envelope.content)))
+        return "250 Message accepted for delivery"
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+@pytest.fixture
+def mail_to(monkeypatch):
+    '''
+    Point the shared email sender at an SMTP port.
+    '''
+    def point_at(port: int):
+        monkeypatch.setattr(
+            email_operations,
+            "fast_mail",
+            FastMail(
+                ConnectionConfig(
+                    MAIL_USERNAME="",
+                    MAIL_PASSWORD="",
+                    MAIL_FROM="shop@example.com",
+                    MAIL_PORT=port,
+                    MAIL_SERVER="127.0.0.1",
+                    MAIL_STARTTLS=False,
+                    MAIL_SSL_TLS=False,
+                    USE_CREDENTIALS=False,
+                    VALIDATE_CERTS=False,
+                )
+            ),
+        )
+
+    return point_at
+
+
+async def book_and_deliver(db_manager, worker: NotificationWorker) -> list:
+    slot_ids = await seed_shop(db_manager)
+    async with db_manager.session() as db:
+        await AppointmentOperations(db).create_appointment(
+            AppointmentCreate(
+                user_id=CLIENT_USER_ID,
+                barber_id=BARBER_ID,
+                status=AppointmentStatus.confirmed,
+                time_slot=slot_ids[:1],
+                service_id=[SERVICE_ID],
+            )
+        )
+    await worker.run_once()
+    async with db_manager.session() as db:
+        result = await db.execute(select(NotificationOutbox).order_by(NotificationOutbox.notification_id))
+        return [(entry.recipient, entry.status, entry.attempts, entry.last_error) for entry in result.scalars().all()]
+
+
+def test_booking_emails_are_delivered_over_smtp(db_manager, smtp_server, mail_to, monkeypatch):
+    controller, handler = smtp_server
+    mail_to(controller.port)
+    monkeypatch.setattr(notification_module, "async_session_manager", db_manager)
+    worker = NotificationWorker(batch_size=20, max_attempts=3, max_concurrency=2)
+
+    outbox = asyncio.run(book_and_deliver(db_manager, worker))
+
+    # Nothing is sent while booking, the worker delivers both emails in one batch
+    assert [(recipient, status, attempts) for recipient, status, attempts, _ in outbox] == [
+        ("ada@example.com", OutboxStatus.done, 1),
+        ("cy@example.com", OutboxStatus.done, 1),
+    ]
+    assert sorted(recipients[0] for recipients, _ in handler.messages) == ["ada@example.com", "cy@example.com"]
+    assert all(message["From"] == "shop@example.com" for _, message in handler.messages)
+
+
+def test_failed_delivery_is_retried_later(db_manager, mail_to, monkeypatch):
+    # No SMTP server listens on the port
+    mail_to(free_port())
+    monkeypatch.setattr(notification_module, "async_session_manager", db_manager)
+    worker = NotificationWorker(batch_size=20, max_attempts=3, max_concurrency=2)
+
+    outbox = asyncio.run(book_and_deliver(db_manager, worker))
+
+    assert [(status, attempts) for _, status, attempts, _ in outbox] == [(OutboxStatus.pending, 1)] * 2
+    assert all(last_error for _, _, _, last_error in outbox)
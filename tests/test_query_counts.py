@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from conftest import (
+    BARBER_ID,
+    BARBER_USER_ID,
+    CLIENT_USER_ID,
+    OTHER_CLIENT_USER_ID,
+    SCHEDULE_DATE,
+    SERVICE_ID,
+    auth_headers,
+    seed_shop,
+)
+
+'''
+Statements each endpoint runs.
+Every relationship is lazy="raise", so these requests also fail if a code path walks a
+relationship its loader profile doesn't load. The caller's identity is resolved before
+counting, it is cached for later requests. The counts are those of the SQLite test database.
+'''
+
+
+def booking(slot_ids: list[int]) -> dict:
+    return {
+        "user_id": CLIENT_USER_ID,
+        "barber_id": BARBER_ID,
+        "status": "confirmed",
+        "time_slot": slot_ids,
+        "service_id": [SERVICE_ID],
+    }
+
+
+@pytest.fixture
+def shop(db_manager, client):
+    slot_ids = asyncio.run(seed_shop(db_manager))
+    headers = auth_headers("kc-barber", "barber", "admin")
+    # Resolves and caches the caller's identity
+    assert client.get("/api/v1/appointments/upcoming", headers=headers).status_code == 200
+    return client, headers, slot_ids
+
+
+def count(statements: list, response, expected_status: int = 200) -> int:
+    assert response.status_code == expected_status, response.text
+    counted = len(statements)
+    statements.clear()
+    return counted
+
+
+def test_barber_reads(shop, statements):
+    client, headers, _ = shop
+    statements.clear()
+
+    assert count(statements, client.get(f"/api/v1/barbers/{BARBER_ID}")) == 1
+    assert count(statements, client.get(f"/api/v1/barbers/user/{BARBER_USER_ID}")) == 1
+    assert count(statements, client.get("/api/v1/barbers", headers=headers)) == 1
+
+
+def test_schedule_reads_and_update(shop, statements):
+    client, headers, slot_ids = shop
+    statements.clear()
+
+    assert count(statements, client.get("/api/v1/schedules/1")) == 3
+    # Served from the schedule cache
+    assert count(statements, client.get("/api/v1/schedules/1")) == 0
+    assert count(statements, client.get(f"/api/v1/schedules?schedule_date={SCHEDULE_DATE}", headers=headers)) == 1
+    assert count(
+        statements,
+        client.put(
+            "/api/v1/schedules/1",
+            json={"time_slots": [{"slot_id": slot_ids[0], "is_available": False}]},
+            headers=headers,
+        ),
+    ) == 7
+
+
+def test_appointment_lifecycle(shop, statements):
+    client, headers, slot_ids = shop
+    statements.clear()
+
+    # Four lookups, the reservation, the inserts incl. two queued emails, then the response read
+    created = client.post("/api/v1/appointments", json=booking(slot_ids[:2]))
+    assert count(statements, created) == 13
+    appointment_id = created.json()["appointment_id"]
+
+    assert count(statements, client.get(f"/api/v1/appointments/{appointment_id}", headers=headers)) == 3
+    assert count(
+        statements, client.get(f"/api/v1/appointments?user_id={CLIENT_USER_ID}", headers=headers)
+    ) == 3
+    assert count(
+        statements, client.get("/api/v1/appointments/upcoming?is_barber=true", headers=headers)
+    ) == 3
+    assert count(
+        statements,
+        client.put(f"/api/v1/appointments/{appointment_id}", json={"time_slot": slot_ids[1:3]}, headers=headers),
+    ) == 8
+    assert count(statements, client.delete(f"/api/v1/appointments/{appointment_id}", headers=headers)) == 6
+
+
+def test_user_and_thread_endpoints(shop, statements):
+    client, headers, _ = shop
+    statements.clear()
+
+    assert count(statements, client.get(f"/api/v1/users/{CLIENT_USER_ID}", headers=headers)) == 1
+    assert count(
+        statements,
+        client.post("/api/v1/threads", json={"receivingUser": CLIENT_USER_ID, "sendingUser": OTHER_CLIENT_USER_ID}),
+    ) == 4
+    assert count(statements, client.get(f"/api/v1/threads/{CLIENT_USER_ID}")) == 3
+    assert count(statements, client.get("/api/v1/services", headers=headers)) == 1
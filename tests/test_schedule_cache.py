@@ -0,0 +1,78 @@
+import asyncio
+
+import json
+
+from conftest import BARBER_ID, BARBER_USER_ID, CLIENT_USER_ID, SCHEDULE_DATE, SERVICE_ID, auth_headers, seed_shop
+from modules.appointment_schema import AppointmentCreate, AppointmentStatus
+from modules.schedule_cache import get_day_schedule_id, get_schedule_json
+from operations.appointment_operations import AppointmentOperations
+from operations.schedule_operations import ScheduleOperations
+from operations.user_operations import UserOperations
+
+'''
+Cached schedule responses going stale when their slots or the barber they embed change.
+'''
+
+
+def test_updating_the_barbers_user_refreshes_cached_schedules(db_manager, client):
+    asyncio.run(seed_shop(db_manager))
+    headers = auth_headers("kc-barber", "barber", "admin")
+    assert client.get("/api/v1/schedules/1").json()["barber"]["user"]["firstName"] == "Cy"
+
+    response = client.put(f"/api/v1/users/{BARBER_USER_ID}", json={"firstName": "Cyrus"}, headers=headers)
+    assert response.status_code == 200
+
+    assert client.get("/api/v1/schedules/1").json()["barber"]["user"]["firstName"] == "Cyrus"
+
+
+def test_deleting_the_barbers_user_drops_cached_schedules(db_manager, client):
+    asyncio.run(seed_shop(db_manager))
+    headers = auth_headers("kc-barber", "barber", "admin")
+    response = client.get(
+        "/api/v1/schedules", params={"barber_id": BARBER_ID, "schedule_date": SCHEDULE_DATE.isoformat()}, headers=headers
+    )
+    assert response.status_code == 200
+    assert get_schedule_json(1) is not None
+    assert get_day_schedule_id(BARBER_ID, SCHEDULE_DATE) == 1
+
+    async def delete_barber_user():
+        async with db_manager.session() as db:
+            return await UserOperations(db).delete_user(BARBER_USER_ID)
+
+    assert asyncio.run(delete_barber_user())
+    assert get_schedule_json(1) is None
+    assert get_day_schedule_id(BARBER_ID, SCHEDULE_DATE) is None
+
+
+def test_a_read_that_races_a_booking_is_not_cached(db_manager, client):
+    slot_ids = asyncio.run(seed_shop(db_manager))
+
+    async def scenario():
+        # The reader's objects must survive ending its transaction early
+        reader = db_manager._sessionmaker(expire_on_commit=False)
+        load = reader.execute
+
+        async def load_then_book(*args, **kwargs):
+            result = await load(*args, **kwargs)
+            # SQLite serializes transactions in the tests, the booking needs the reader's to end
+            await reader.commit()
+            async with db_manager.session() as db:
+                await AppointmentOperations(db).create_appointment(
+                    AppointmentCreate(user_id=CLIENT_USER_ID, barber_id=BARBER_ID, status=AppointmentStatus.confirmed,
+                                      time_slot=[slot_ids[0]], service_id=[SERVICE_ID])
+                )
+            return result
+
+        reader.execute = load_then_book
+        try:
+            return await ScheduleOperations(reader).get_schedule_json(1)
+        finally:
+            await reader.close()
+
+    # The reader answers with what it loaded before the booking committed
+    stale = json.loads(asyncio.run(scenario()))
+    assert stale["time_slots"][0]["is_booked"] is False
+    assert get_schedule_json(1) is None
+
+    fresh = client.get("/api/v1/schedules/1").json()
+    assert fresh["time_slots"][0]["is_booked"] is True
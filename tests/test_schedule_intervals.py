@@ -0,0 +1,179 @@
+import asyncio
+from datetime import time
+
+import pytest
+from sqlalchemy.future import select
+
+from conftest import (
+    BARBER_ID,
+    CLIENT_USER_ID,
+    SCHEDULE_DATE,
+    SERVICE_ID,
+    add_barber,
+    add_schedule,
+    auth_headers,
+    seed_shop,
+)
+from modules.schedule_intervals import derived_slot_id
+from modules.user.models import ScheduleInterval, TimeSlot
+from operations.schedule_interval_operations import ScheduleIntervalOperations
+
+'''
+Schedules stored as working intervals, whose slots are derived until they are booked.
+Barber 1's day is stored as slot rows and barber 2's as an interval with the same slots.
+'''
+
+INTERVAL_BARBER_ID = 2
+
+
+def booking(barber_id: int, slot_ids: list[int]) -> dict:
+    return {
+        "user_id": CLIENT_USER_ID,
+        "barber_id": barber_id,
+        "status": "confirmed",
+        "time_slot": slot_ids,
+        "service_id": [SERVICE_ID],
+    }
+
+
+def minute(hour: int, minutes: int = 0) -> int:
+    return hour * 60 + minutes
+
+
+@pytest.fixture
+def days(db_manager, client):
+    async def seed():
+        slot_ids = await seed_shop(db_manager)
+        await add_barber(db_manager, INTERVAL_BARBER_ID)
+        schedule_id, _ = await add_schedule(db_manager, INTERVAL_BARBER_ID, intervals=((time(9), time(11), 30),))
+        return slot_ids, schedule_id
+
+    slot_ids, schedule_id = asyncio.run(seed())
+    return client, auth_headers("kc-client"), slot_ids, schedule_id
+
+
+def slots_of(client, schedule_id: int) -> list[tuple]:
+    response = client.get(f"/api/v1/schedules/{schedule_id}")
+    assert response.status_code == 200
+    return [
+        (slot["slot_id"], slot["start_time"], slot["end_time"], slot["is_available"], slot["is_booked"])
+        for slot in response.json()["time_slots"]
+    ]
+
+
+async def slot_rows(db_manager, schedule_id: int) -> list[tuple]:
+    async with db_manager.session() as db:
+        result = await db.execute(
+            select(TimeSlot.start_time, TimeSlot.is_booked)
+            .filter(TimeSlot.schedule_id == schedule_id)
+            .order_by(TimeSlot.start_time)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+def test_booking_a_derived_slot_gives_it_a_row(days, db_manager):
+    client, _, _, schedule_id = days
+    derived = derived_slot_id(schedule_id, minute(9, 30))
+
+    response = client.post("/api/v1/appointments", json=booking(INTERVAL_BARBER_ID, [derived]))
+    assert response.status_code == 200, response.text
+    assert asyncio.run(slot_rows(db_manager, schedule_id)) == [(time(9, 30), True)]
+
+    slots = slots_of(client, schedule_id)
+    assert [slot[0] < 0 for slot in slots] == [True, False, True, True]
+    assert slots[1][1:] == ("09:30:00", "10:00:00", True, True)
+    assert response.json()["time_slots"][0]["slot_id"] == slots[1][0]
+
+    # The derived id now stands for the booked row
+    response = client.post("/api/v1/appointments", json=booking(INTERVAL_BARBER_ID, [derived]))
+    assert response.status_code == 409
+
+
+def test_invalid_and_foreign_derived_ids_are_rejected(days, db_manager):
+    client, _, _, schedule_id = days
+    # Not on a slot boundary of the interval, and past its end
+    for start in (minute(9, 15), minute(11)):
+        response = client.post("/api/v1/appointments", json=booking(INTERVAL_BARBER_ID, [derived_slot_id(schedule_id, start)]))
+        assert response.status_code == 400
+
+    # A slot of barber 2's schedule booked with barber 1
+    response = client.post("/api/v1/appointments", json=booking(BARBER_ID, [derived_slot_id(schedule_id, minute(9))]))
+    assert response.status_code == 400
+    # The row the rejected booking materialized was rolled back
+    assert asyncio.run(slot_rows(db_manager, schedule_id)) == []
+
+
+def test_a_row_shadows_the_derived_slot_at_its_minute(days, db_manager):
+    client, headers, _, schedule_id = days
+
+    async def close_half_past_nine():
+        async with db_manager.session() as db:
+            db.add(TimeSlot(schedule_id=schedule_id, start_time=time(9, 30), end_time=time(10), is_available=False, is_booked=False))
+            await db.commit()
+
+    asyncio.run(close_half_past_nine())
+    slots = slots_of(client, schedule_id)
+    assert [slot[1] for slot in slots] == ["09:00:00", "09:30:00", "10:00:00", "10:30:00"]
+    assert slots[1][0] > 0 and slots[1][3] is False
+
+    response = client.get(
+        "/api/v1/availability",
+        params={"service_id": SERVICE_ID, "from": SCHEDULE_DATE.isoformat(), "to": SCHEDULE_DATE.isoformat(),
+                "barber_id": INTERVAL_BARBER_ID},
+        headers=headers,
+    )
+    assert [opening["start_time"] for opening in response.json()] == ["09:00:00", "10:00:00", "10:30:00"]
+
+
+def test_compaction_keeps_linked_and_booked_slots_as_rows(db_manager, client):
+    slot_ids = asyncio.run(seed_shop(db_manager, slot_count=6))
+    headers = auth_headers("kc-barber", "barber", "admin")
+
+    # 09:30 was booked and canceled, so it stays linked; 10:30 is booked
+    canceled = client.post("/api/v1/appointments", json=booking(BARBER_ID, [slot_ids[1]])).json()["appointment_id"]
+    assert client.delete(f"/api/v1/appointments/{canceled}", headers=headers).status_code == 200
+    assert client.post("/api/v1/appointments", json=booking(BARBER_ID, [slot_ids[3]])).status_code == 200
+    before = [slot[1:] for slot in slots_of(client, 1)]
+
+    async def compact():
+        async with db_manager.session() as db:
+            return await ScheduleIntervalOperations(db).compact_schedules(SCHEDULE_DATE, SCHEDULE_DATE)
+
+    # Only 11:00 and 11:30 form a run of free, unlinked slots; 09:00 and 10:00 are on their own
+    result = asyncio.run(compact())
+    assert (result.schedules_compacted, result.time_slots_removed, result.intervals_created) == (1, 2, 1)
+    assert asyncio.run(slot_rows(db_manager, 1)) == [
+        (time(9), False), (time(9, 30), False), (time(10), False), (time(10, 30), True)
+    ]
+    assert [slot[1:] for slot in slots_of(client, 1)] == before
+
+    async def intervals():
+        async with db_manager.session() as db:
+            result = await db.execute(select(ScheduleInterval.start_time, ScheduleInterval.end_time, ScheduleInterval.slot_minutes))
+            return [tuple(row) for row in result.all()]
+
+    assert asyncio.run(intervals()) == [(time(11), time(12), 30)]
+
+
+def test_rows_and_intervals_days_read_the_same(days):
+    client, headers, _, schedule_id = days
+    assert [slot[1:] for slot in slots_of(client, 1)] == [slot[1:] for slot in slots_of(client, schedule_id)]
+
+    grid = client.get(
+        "/api/v1/schedules/grid", params={"from": SCHEDULE_DATE.isoformat(), "to": SCHEDULE_DATE.isoformat()}, headers=headers
+    ).json()
+    assert grid["barbers"] == [BARBER_ID, INTERVAL_BARBER_ID]
+    for bitmap in ("slots", "slot_starts", "available", "booked"):
+        assert grid[bitmap][0] == grid[bitmap][1]
+
+    def openings(barber_id: int) -> list[tuple]:
+        response = client.get(
+            "/api/v1/availability",
+            params={"service_id": SERVICE_ID, "from": SCHEDULE_DATE.isoformat(), "to": SCHEDULE_DATE.isoformat(),
+                    "barber_id": barber_id},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        return [(opening["start_time"], opening["end_time"]) for opening in response.json()]
+
+    assert openings(BARBER_ID) == openings(INTERVAL_BARBER_ID) != []
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from jwcrypto import jwk, jwt
+from jwcrypto.common import JWException
+
+import auth.token_verifier as verifier_module
+from auth.service import AuthService
+from auth.token_verifier import JWKSTokenVerifier, UnknownSigningKeyError
+
+'''
+Local verification of access tokens against the realm's signing keys, and the key set
+refresh after a rotation. The realm's certs endpoint is served from memory.
+'''
+
+SERVER_URL = "http://keycloak.local"
+REALM = "test"
+ISSUER = f"{SERVER_URL}/realms/{REALM}"
+AUDIENCE = "test-api"
+
+
+def signing_key(kid: str) -> jwk.JWK:
+    return jwk.JWK.generate(kty="RSA", size=2048, kid=kid, use="sig", alg="RS256")
+
+
+def sign(key: jwk.JWK, **claims) -> str:
+    now = int(time.time())
+    token = jwt.JWT(
+        header={"alg": "RS256", "kid": key.key_id, "typ": "JWT"},
+        claims={
+            "iss": ISSUER,
+            "aud": AUDIENCE,
+            "sub": str(uuid.uuid4()),
+            "preferred_username": "ada",
+            "email": "ada@example.com",
+            "given_name": "Ada",
+            "family_name": "Client",
+            "iat": now,
+            "exp": now + 300,
+            "realm_access": {"roles": ["client"]},
+            **claims,
+        },
+    )
+    token.make_signed_token(key)
+    return token.serialize()
+
+
+class Realm:
+    '''
+    The certs endpoint of a realm, publishing the public half of `keys`.
+    '''
+
+    def __init__(self, *keys: jwk.JWK):
+        self.keys = list(keys)
+        self.fetches = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.fetches += 1
+        return httpx.Response(200, json={"keys": [json.loads(key.export_public()) for key in self.keys]})
+
+
+@pytest.fixture
+def realm(monkeypatch) -> Realm:
+    realm = Realm(signing_key("first"))
+    client = httpx.AsyncClient
+
+    def realm_client(**kwargs):
+        return client(transport=httpx.MockTransport(realm.handle), **kwargs)
+
+    monkeypatch.setattr(verifier_module.httpx, "AsyncClient", realm_client)
+    return realm
+
+
+@pytest.fixture
+def verifier(realm, monkeypatch) -> JWKSTokenVerifier:
+    verifier = JWKSTokenVerifier(SERVER_URL, REALM, [AUDIENCE], min_refresh_interval=30)
+    asyncio.run(verifier.refresh())
+    monkeypatch.setattr(AuthService, "token_verifier", verifier)
+    return verifier
+
+
+def test_verifies_a_token_of_the_realm(realm, verifier):
+    claims = verifier.verify(sign(realm.keys[0]))
+    assert claims["preferred_username"] == "ada"
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"iss": "http://keycloak.local/realms/other"},
+        {"exp": int(time.time()) - 60},
+    ],
+)
+def test_rejects_a_bad_issuer_or_an_expired_token(realm, verifier, claims):
+    with pytest.raises(JWException):
+        verifier.verify(sign(realm.keys[0], **claims))
+
+
+def test_checks_the_audience_and_authorized_party(realm, verifier):
+    with pytest.raises(ValueError):
+        verifier.verify(sign(realm.keys[0], aud="other-api"))
+    with pytest.raises(ValueError):
+        verifier.verify(sign(realm.keys[0], aud=["other-api", "account"], azp="other-client"))
+
+    # Keycloak names the client the token was issued to in azp
+    assert verifier.verify(sign(realm.keys[0], aud="account", azp=AUDIENCE))
+    assert verifier.verify(sign(realm.keys[0], aud=["account", AUDIENCE]))
+
+
+def test_rejects_a_token_signed_with_another_key_under_a_known_kid(realm, verifier):
+    with pytest.raises(JWException):
+        verifier.verify(sign(signing_key(realm.keys[0].key_id)))
+
+
+def test_unknown_key_is_reported_without_fetching(realm, verifier):
+    with pytest.raises(UnknownSigningKeyError):
+        verifier.verify(sign(signing_key("second")))
+    assert realm.fetches == 1
+
+
+def test_a_rotated_key_is_fetched_once_and_the_token_accepted(realm, verifier):
+    verifier._last_refresh -= verifier.min_refresh_interval
+    rotated = signing_key("second")
+    realm.keys.append(rotated)
+
+    async def verify_both():
+        # Requests arriving together share the refresh
+        return await asyncio.gather(
+            AuthService.verify_token(sign(rotated)), AuthService.verify_token(sign(rotated, preferred_username="bob"))
+        )
+
+    users = asyncio.run(verify_both())
+    assert [user.username for user in users] == ["ada", "bob"]
+    assert realm.fetches == 2
+
+
+def test_unknown_keys_refresh_at_most_once_per_interval(realm, verifier):
+    # The key set was just loaded, so a token of a key the realm doesn't publish can't force a fetch
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(AuthService.verify_token(sign(signing_key("forged"))))
+    assert error.value.status_code == 401
+    assert realm.fetches == 1
+
+    verifier._last_refresh -= verifier.min_refresh_interval
+    with pytest.raises(HTTPException):
+        asyncio.run(AuthService.verify_token(sign(signing_key("forged"))))
+    with pytest.raises(HTTPException):
+        asyncio.run(AuthService.verify_token(sign(signing_key("forged"))))
+    assert realm.fetches == 2
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import time
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from conftest import BARBER_ID, SCHEDULE_DATE, seed_shop
+from core.config import MAX_SCHEDULE_HORIZON_WEEKS, Settings
+from modules.user.models import Schedule, ScheduleTemplate
+import workers.schedule_horizon_worker as horizon_module
+from workers.periodic_worker import PeriodicWorker
+from workers.schedule_horizon_worker import ScheduleHorizonWorker
+
+'''
+The background worker loop and the rolling schedule generation.
+'''
+
+
+class CountingWorker(PeriodicWorker):
+    def __init__(self, interval: float, backlog: int = 0):
+        super().__init__("counting", interval)
+        self.runs = 0
+        self.backlog = backlog
+
+    async def run_once(self) -> bool:
+        self.runs += 1
+        if self.backlog:
+            self.backlog -= 1
+            return True
+        return False
+
+
+def test_periodic_worker_runs_again_without_sleeping_while_work_is_waiting():
+    async def scenario():
+        worker = CountingWorker(interval=60, backlog=3)
+        await worker.start()
+        await asyncio.sleep(0.05)
+        await worker.stop()
+        return worker.runs
+
+    # Three rounds with more work, then one that finds nothing and sleeps
+    assert asyncio.run(scenario()) == 4
+
+
+def test_periodic_worker_wakes_before_its_interval():
+    async def scenario():
+        worker = CountingWorker(interval=60)
+        await worker.start()
+        await asyncio.sleep(0.05)
+        worker.wake()
+        await asyncio.sleep(0.05)
+        await worker.stop()
+        return worker.runs
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_settings_reject_a_schedule_horizon_past_a_year(monkeypatch):
+    monkeypatch.setenv("SCHEDULE_HORIZON_WEEKS", str(MAX_SCHEDULE_HORIZON_WEEKS + 1))
+    with pytest.raises(EnvironmentError):
+        Settings()
+
+    monkeypatch.setenv("SCHEDULE_HORIZON_WEEKS", str(MAX_SCHEDULE_HORIZON_WEEKS))
+    Settings()
+
+
+def test_horizon_worker_generates_the_longest_allowed_horizon(db_manager, monkeypatch):
+    monkeypatch.setattr(horizon_module, "async_session_manager", db_manager)
+
+    async def scenario():
+        await seed_shop(db_manager)
+        async with db_manager.session() as db:
+            db.add_all(
+                [
+                    ScheduleTemplate(barber_id=BARBER_ID, weekday=weekday, start_time=time(9), end_time=time(12), slot_minutes=30)
+                    for weekday in range(7)
+                ]
+            )
+            await db.commit()
+
+        worker = ScheduleHorizonWorker(weeks=MAX_SCHEDULE_HORIZON_WEEKS, interval=60)
+        assert await worker.run_once() is False
+
+        async with db_manager.session() as db:
+            result = await db.execute(
+                select(func.count(Schedule.schedule_id)).filter(
+                    Schedule.barber_id == BARBER_ID, Schedule.date != SCHEDULE_DATE
+                )
+            )
+            return result.scalar_one()
+
+    assert asyncio.run(scenario()) == MAX_SCHEDULE_HORIZON_WEEKS * 7